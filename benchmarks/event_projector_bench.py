@@ -0,0 +1,111 @@
+"""SSE 事件投影微基准
+
+对比黑名单 filter_event + AgentCore SDK 序列化与白名单投影 + 预编码，
+输出每事件字节数和每事件耗时（微秒）。
+
+用法:
+    python benchmarks/event_projector_bench.py [--events 20000]
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from costq_agents.agent.event_projector import (  # noqa: E402
+    SSEPassthroughApp,
+    filter_event,
+    orjson,
+    project_and_encode,
+)
+
+
+class _FakeAgent:
+    """模拟 Strands Agent（不可 JSON 序列化）"""
+
+    def __init__(self) -> None:
+        self.messages = [
+            {"role": "user", "content": [{"text": "查询上个月 EC2 成本" * 20}]}
+            for _ in range(50)
+        ]
+
+
+def _build_stream(count: int) -> list[dict]:
+    """构造一次流式响应：文本增量为主，夹带工具调用与消息"""
+    agent = _FakeAgent()
+    cycle_id = str(uuid.uuid4())
+    context = {
+        "agent": agent,
+        "request_state": {},
+        "event_loop_cycle_id": cycle_id,
+        "event_loop_cycle_trace": object(),
+        "event_loop_cycle_span": object(),
+    }
+    events: list[dict] = []
+    for i in range(count):
+        if i % 200 == 0:
+            events.append(
+                {
+                    "event": {
+                        "contentBlockStart": {
+                            "start": {
+                                "toolUse": {"toolUseId": f"t{i}", "name": "get_cost_and_usage"}
+                            },
+                            "contentBlockIndex": 1,
+                        }
+                    }
+                }
+            )
+        elif i % 200 == 100:
+            events.append(
+                {
+                    "message": {
+                        "role": "user",
+                        "content": [
+                            {"toolResult": {"toolUseId": f"t{i}", "content": [{"text": "{}" * 50}]}}
+                        ],
+                    }
+                }
+            )
+        elif i % 2 == 0:
+            delta = {"delta": {"text": "成本"}, "contentBlockIndex": 0}
+            events.append({"event": {"contentBlockDelta": delta}})
+        else:
+            events.append({"data": "成本", "delta": {"text": "成本"}, **context})
+    return events
+
+
+def _run(name: str, events: list[dict], convert) -> None:
+    total_bytes = 0
+    emitted = 0
+    start = time.perf_counter()
+    for event in events:
+        frame = convert(event)
+        if frame is not None:
+            total_bytes += len(frame)
+            emitted += 1
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<28} emitted={emitted:>6}  "
+        f"bytes/event={total_bytes / len(events):>8.1f}  "
+        f"us/event={elapsed / len(events) * 1e6:>7.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    events = _build_stream(args.events)
+    app = SSEPassthroughApp()
+    print(f"encoder: {'orjson' if orjson is not None else 'json'}, events: {len(events)}")
+    _run("filter_event + SDK json", events, lambda e: app._convert_to_sse(filter_event(e)))
+    _run("project_and_encode", events, project_and_encode)
+
+
+if __name__ == "__main__":
+    main()
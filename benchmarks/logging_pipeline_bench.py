@@ -0,0 +1,128 @@
+"""日志管道微基准
+
+模拟一次 invoke 的日志量（普通 info + 工具调用/结果 + 长间隔警告），对比：
+
+    baseline   StreamHandler 同步写出、文本格式、extra 在调用方即时构建、完整 json.dumps 后截断
+    pipeline   QueueHandler/QueueListener、JsonFormatter、log_event 惰性 payload、有界预览
+    sampled    pipeline + 工具日志 20% / 长间隔警告 10% 采样
+
+输出调用方（事件循环线程）上每次 invoke 的日志耗时，以及包含后台线程写完的总耗时。
+
+用法:
+    python benchmarks/logging_pipeline_bench.py [--invocations 200]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from costq_agents.agent.stream_telemetry import bounded_json_preview  # noqa: E402
+from costq_agents.utils.logging_pipeline import (  # noqa: E402
+    configure_logging,
+    log_event,
+    shutdown_logging,
+)
+
+INFO_LOGS = 40
+TOOL_CALLS = 10
+LONG_INTERVALS = 5
+SAMPLE_RATES = {"tool_result": 0.2, "tool_call_start": 0.2, "long_interval": 0.1}
+
+logger = logging.getLogger("bench.invoke")
+TOOL_RESULT = {
+    "rows": [{"service": "Amazon EC2", "cost": i * 1.5, "unit": "USD"} for i in range(2000)]
+}
+
+
+def invoke_baseline() -> None:
+    for i in range(INFO_LOGS):
+        logger.info(f"步骤 {i} 完成", extra={"step": i, "duration_seconds": round(i * 0.01, 2)})
+    for i in range(TOOL_CALLS):
+        logger.info(
+            "🔧 TOOL CALL START - get_cost",
+            extra={"tool_id": f"t{i}", "tool_input": json.dumps({"granularity": "MONTHLY"})},
+        )
+        logger.info(
+            "✅ TOOL RESULT - success",
+            extra={
+                "tool_id": f"t{i}",
+                "tool_result": json.dumps(TOOL_RESULT, ensure_ascii=False)[:500],
+            },
+        )
+    for i in range(LONG_INTERVALS):
+        logger.warning("⏱️ 长间隔事件检测", extra={"interval_seconds": 6.2, "event_count": i})
+
+
+def invoke_pipeline() -> None:
+    for i in range(INFO_LOGS):
+        logger.info("步骤 %s 完成", i, extra={"step": i, "duration_seconds": round(i * 0.01, 2)})
+    for i in range(TOOL_CALLS):
+        log_event(
+            logger,
+            logging.INFO,
+            "🔧 TOOL CALL START - get_cost",
+            "tool_call_start",
+            lambda: {
+                "tool_id": f"t{i}",
+                "tool_input": bounded_json_preview({"granularity": "MONTHLY"}),
+            },
+        )
+        log_event(
+            logger,
+            logging.INFO,
+            "✅ TOOL RESULT - success",
+            "tool_result",
+            lambda: {"tool_id": f"t{i}", "tool_result": bounded_json_preview(TOOL_RESULT)},
+        )
+    for i in range(LONG_INTERVALS):
+        log_event(
+            logger,
+            logging.WARNING,
+            "⏱️ 长间隔事件检测",
+            "long_interval",
+            lambda: {"interval_seconds": 6.2, "event_count": i},
+        )
+
+
+def _measure(name: str, invoke, invocations: int, drain) -> None:
+    start = time.perf_counter()
+    for _ in range(invocations):
+        invoke()
+    caller = time.perf_counter() - start
+    drain()
+    total = time.perf_counter() - start
+    print(
+        f"{name:<10} caller_us/invoke={caller / invocations * 1e6:>9.1f}  "
+        f"total_us/invoke={total / invocations * 1e6:>9.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--invocations", type=int, default=200)
+    args = parser.parse_args()
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.setLevel(logging.INFO)
+    with open(os.devnull, "w") as devnull:
+        sink = logging.StreamHandler(devnull)
+        sink.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+        root.addHandler(sink)
+        _measure("baseline", invoke_baseline, args.invocations, lambda: None)
+
+        configure_logging(level="INFO")
+        _measure("pipeline", invoke_pipeline, args.invocations, shutdown_logging)
+
+        configure_logging(level="INFO", sample_rates=SAMPLE_RATES)
+        _measure("sampled", invoke_pipeline, args.invocations, shutdown_logging)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""toolResult 清除微基准
+
+对比 deepcopy + 逐结果 json.dumps（旧实现）与写时复制重建，消息包含大型合成
+Cost Explorer 结果（按行数放大）以及需要共享的文本 / 图片块。
+
+用法:
+    python benchmarks/strip_tool_results_bench.py [--rows 1000 10000 50000] [--repeat 20]
+"""
+
+import argparse
+import copy
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from costq_agents.agent.filtered_session_manager import (  # noqa: E402
+    TOOL_RESULT_STRIPPED,
+    FilteredMemorySessionManager,
+)
+
+
+def legacy_strip(message: dict) -> dict:
+    """旧实现：deepcopy 整条消息，并为日志序列化每个原始结果"""
+    filtered = copy.deepcopy(message)
+    for block in filtered.get("content", []):
+        if not isinstance(block, dict) or "toolResult" not in block:
+            continue
+        tool_result = block["toolResult"]
+        len(json.dumps(tool_result.get("content", []), ensure_ascii=False))
+        tool_result["content"] = [{"text": TOOL_RESULT_STRIPPED}]
+    return filtered
+
+
+def build_message(rows: int) -> dict:
+    """构造含两个大型工具结果的用户消息"""
+    result_rows = [
+        {
+            "TimePeriod": {"Start": "2026-09-01", "End": "2026-10-01"},
+            "Groups": [
+                {
+                    "Keys": [f"service-{i}"],
+                    "Metrics": {"UnblendedCost": {"Amount": f"{i * 1.37:.2f}", "Unit": "USD"}},
+                }
+            ],
+        }
+        for i in range(rows)
+    ]
+    return {
+        "role": "user",
+        "content": [
+            {"text": "上个月成本明细"},
+            {
+                "toolResult": {
+                    "toolUseId": "t1",
+                    "status": "success",
+                    "content": [{"json": {"ResultsByTime": result_rows}}],
+                }
+            },
+            {
+                "toolResult": {
+                    "toolUseId": "t2",
+                    "status": "success",
+                    "content": [{"text": json.dumps(result_rows)}],
+                }
+            },
+            {"image": {"format": "png", "source": {"bytes": b"\x89PNG" * 1024}}},
+        ],
+    }
+
+
+def _time(func, message: dict, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(message)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # 生产环境日志级别为 INFO：写时复制路径不计算大小
+    logging.getLogger("costq_agents.agent.filtered_session_manager").setLevel(logging.INFO)
+    for rows in args.rows:
+        message = build_message(rows)
+        payload_mb = len(json.dumps(message["content"][2]["toolResult"]["content"])) * 2 / 1e6
+        legacy_ms = _time(legacy_strip, message, args.repeat)
+        cow_ms = _time(FilteredMemorySessionManager._strip_tool_results, message, args.repeat)
+        print(
+            f"rows={rows:>6} (~{payload_mb:6.1f} MB)  "
+            f"deepcopy={legacy_ms:>9.3f} ms  copy_on_write={cow_ms:>7.4f} ms  "
+            f"speedup={legacy_ms / cow_ms:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""会话亲和的 Agent 缓存（microVM 内多轮对话复用）
+
+AgentCore Runtime 按 runtimeSessionId 把同一会话路由到同一个 microVM。以前每轮对话
+都重建完整的 Agent 栈：Agent、FilteredMemorySessionManager（从 AgentCore Memory
+重新加载短期历史）、SlidingWindowConversationManager 和工具注册表。
+
+AgentCache 缓存上一轮结束后的 Agent：
+
+    - 键：(session_id, user_id, model_id, prompt_version, tool_catalog_hash)
+      提示词或工具定义变化时自然失效
+    - checkout() 取出即独占（同一会话的并发请求未命中，各自新建），流式成功结束后
+      checkin() 放回；执行失败或客户端断开的 Agent 不放回
+    - 空闲 TTL + 条目数上限 + 消息体积上限（估算），超出时按 LRU 淘汰
+    - 命中后只需重新绑定本次请求的工具（MCP 客户端按请求租用），跳过历史加载
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from costq_agents.utils.messages import estimate_messages_bytes
+
+logger = logging.getLogger(__name__)
+
+# 缓存键：(session_id, user_id, model_id, prompt_version, tool_catalog_hash)
+AgentCacheKey = tuple[str, str, str, str, str]
+
+
+def tool_catalog_hash(tools: list[Any]) -> str:
+    """计算工具列表的内容哈希（工具名、描述、输入 schema；与顺序无关）
+
+    Args:
+        tools: Strands 工具列表（AgentTool）
+
+    Returns:
+        str: 16 位十六进制哈希
+    """
+    payload = sorted(
+        json.dumps(getattr(tool, "tool_spec", None) or repr(tool), sort_keys=True, default=str)
+        for tool in tools
+    )
+    return hashlib.sha256("\n".join(payload).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class _CachedAgent:
+    """缓存条目"""
+
+    agent: Any
+    size_bytes: int
+    last_used: float
+
+
+class AgentCache:
+    """Agent LRU 缓存（线程安全）
+
+    Attributes:
+        max_entries: 最大条目数
+        max_bytes: 所有缓存 Agent 的消息体积上限（估算）
+        idle_ttl_seconds: 空闲有效期（秒）
+
+    Examples:
+        >>> cache = get_agent_cache()
+        >>> agent = cache.checkout(key)
+        >>> if agent is None:
+        ...     agent = manager.create_agent_with_memory(...)
+        >>> # 流式执行成功后
+        >>> cache.checkin(key, agent)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 32,
+        max_bytes: int = 64 * 1024 * 1024,
+        idle_ttl_seconds: float = 900.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """初始化缓存
+
+        Args:
+            max_entries: 最大条目数
+            max_bytes: 所有缓存 Agent 的消息体积上限（估算）
+            idle_ttl_seconds: 空闲有效期（秒）
+            clock: 单调时钟（测试时可注入）
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[AgentCacheKey, _CachedAgent] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "oversized": 0}
+
+    def checkout(self, key: AgentCacheKey) -> Any | None:
+        """取出缓存的 Agent（取出后由调用方独占，用完调用 checkin 放回）
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Agent | None: 未命中或已过期时返回 None
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.size_bytes
+                if now - entry.last_used < self.idle_ttl_seconds:
+                    self._stats["hits"] += 1
+                    return entry.agent
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return None
+
+    def checkin(self, key: AgentCacheKey, agent: Any) -> None:
+        """放回 Agent（仅在本轮成功结束后调用）
+
+        Args:
+            key: 缓存键
+            agent: Agent 实例
+        """
+        size = estimate_messages_bytes(getattr(agent, "messages", None))
+        now = self._clock()
+        with self._lock:
+            if size > self.max_bytes:
+                self._stats["oversized"] += 1
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size_bytes
+            self._entries[key] = _CachedAgent(agent=agent, size_bytes=size, last_used=now)
+            self._bytes += size
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """清理过期条目，再按 LRU 淘汰到容量以内（需持有锁）"""
+        for key in [
+            key
+            for key, entry in self._entries.items()
+            if now - entry.last_used >= self.idle_ttl_seconds
+        ]:
+            self._bytes -= self._entries.pop(key).size_bytes
+            self._stats["expired"] += 1
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size_bytes
+            self._stats["evictions"] += 1
+
+    def invalidate_session(self, session_id: str) -> None:
+        """清除某个会话的全部缓存 Agent"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == session_id]:
+                self._bytes -= self._entries.pop(key).size_bytes
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        """获取缓存统计（含命中率、条目数、估算体积）"""
+        with self._lock:
+            stats: dict[str, Any] = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# 全局单例
+_agent_cache: AgentCache | None = None
+_agent_cache_lock = threading.Lock()
+
+
+def get_agent_cache() -> AgentCache:
+    """获取全局 Agent 缓存"""
+    global _agent_cache
+
+    if _agent_cache is None:
+        with _agent_cache_lock:
+            if _agent_cache is None:
+                from costq_agents.config.settings import settings
+
+                _agent_cache = AgentCache(
+                    max_entries=settings.AGENT_CACHE_MAX_ENTRIES,
+                    max_bytes=settings.AGENT_CACHE_MAX_BYTES,
+                    idle_ttl_seconds=settings.AGENT_CACHE_IDLE_TTL_SECONDS,
+                )
+
+    return _agent_cache
@@ -0,0 +1,236 @@
+"""附件摄入：有界、分块、离开事件循环解码
+
+invoke() 以前在事件循环上同步 base64 解码全部图片和文档，没有大小限制，且 base64
+字符串和解码后的字节在整个请求期间同时存活。一个大 Excel 上传会卡住同一 microVM
+上所有并发流。
+
+ingest_attachments()（经 run_blocking("cpu", ...) 在工作线程中调用）：
+
+    - 解码前按 base64 长度估算字节数，执行单文件 / 总量预算，超出的文件跳过
+    - 按块解码（块长度为 4 的倍数）到按估算大小预分配的缓冲区，不整体复制 base64
+      字符串，也不拼接解码块（峰值约为 base64 字符串 + 解码结果各一份）
+    - 从 payload 条目中取出（pop）base64_data，解码完成后源字符串即可回收
+    - 返回 Converse 内容块，并统计解码耗时与附件缓冲区峰值（按大小估算，非实测）
+    - 可选：CSV / XLSX 在本地生成摘要（见 spreadsheet_digest），以文本块代替原文件；
+      条目带 include_original=true 时摘要之后再附上原文件
+"""
+
+import binascii
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from costq_agents.agent.spreadsheet_digest import (
+    SPREADSHEET_FORMATS,
+    digest_spreadsheet,
+    digest_to_text,
+)
+
+logger = logging.getLogger(__name__)
+
+# 默认解码块长度（base64 字符数，必须为 4 的倍数）
+DEFAULT_CHUNK_CHARS = 1024 * 1024
+
+_DOCUMENT_FORMATS = {
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+    "application/vnd.ms-excel": "xls",
+    "application/pdf": "pdf",
+    "text/csv": "csv",
+    "text/html": "html",
+    "application/msword": "doc",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "text/markdown": "md",
+    "text/plain": "txt",
+}
+
+_WHITESPACE = str.maketrans("", "", " \t\r\n")
+
+
+def mime_to_document_format(mime_type: str) -> str:
+    """将 MIME 类型映射为 Bedrock Converse API document format
+
+    Bedrock 允许的 format 枚举值: docx, csv, html, txt, pdf, md, doc, xlsx, xls
+
+    Raises:
+        ValueError: 当 mime_type 不在白名单内时抛出，由调用方决定是否跳过该文件
+    """
+    result = _DOCUMENT_FORMATS.get(mime_type)
+    if result is None:
+        raise ValueError(
+            f"不支持的文档 MIME 类型: {mime_type}，Bedrock 支持: {list(_DOCUMENT_FORMATS.values())}"
+        )
+    return result
+
+
+def sanitize_document_name(file_name: str) -> str:
+    """清洗文件名以符合 Bedrock API 要求：仅 [a-zA-Z0-9_-]，最长 200 字符"""
+    name = file_name.rsplit(".", 1)[0] if "." in file_name else file_name
+    name = name.replace(" ", "_")
+    name = re.sub(r"[^a-zA-Z0-9_-]", "", name)
+    if not name:
+        name = "document"
+    return name[:200]
+
+
+def estimate_decoded_size(b64_data: str) -> int:
+    """按 base64 长度估算解码后的字节数（不解码，不复制字符串）"""
+    padding = 2 if b64_data.endswith("==") else 1 if b64_data.endswith("=") else 0
+    return max(0, len(b64_data) * 3 // 4 - padding)
+
+
+def decode_base64_chunked(b64_data: str, chunk_chars: int = DEFAULT_CHUNK_CHARS) -> bytearray:
+    """分块解码 base64 到预分配缓冲区
+
+    Args:
+        b64_data: base64 字符串（允许包含换行等空白）
+        chunk_chars: 每块字符数（向下取整为 4 的倍数）
+
+    Returns:
+        bytearray: 解码结果（bytes-like，Converse API 与附件存储均可直接使用）
+
+    Raises:
+        binascii.Error: base64 格式错误
+
+    Notes:
+        每块解码后写入按 estimate_decoded_size() 预分配的缓冲区，任一时刻只多出一个
+        解码块；最后按实际长度截断（无效字符被忽略时实际长度小于估算）
+    """
+    if any(c in b64_data for c in " \t\r\n"):
+        # 带换行的 base64 需先去空白才能按 4 字符对齐分块
+        b64_data = b64_data.translate(_WHITESPACE)
+    chunk_chars = max(4, chunk_chars - chunk_chars % 4)
+    buffer = bytearray(estimate_decoded_size(b64_data))
+    length = 0
+    with memoryview(buffer) as view:
+        for start in range(0, len(b64_data), chunk_chars):
+            chunk = binascii.a2b_base64(b64_data[start : start + chunk_chars])
+            end = length + len(chunk)
+            if end > len(view):
+                raise binascii.Error("base64 解码长度超过估算大小（填充位置错误）")
+            view[length:end] = chunk
+            length = end
+    del buffer[length:]
+    return buffer
+
+
+@dataclass
+class AttachmentIngestResult:
+    """摄入结果
+
+    Attributes:
+        blocks: Converse 内容块（image / document）
+        skipped: 跳过的文件 [{"file_name", "reason"}]
+        stats: files / total_bytes / decode_seconds / estimated_peak_bytes / digested
+    """
+
+    blocks: list[dict[str, Any]] = field(default_factory=list)
+    skipped: list[dict[str, str]] = field(default_factory=list)
+    stats: dict[str, Any] = field(default_factory=dict)
+
+
+def ingest_attachments(
+    images: list[dict] | None,
+    files: list[dict] | None,
+    max_file_bytes: int,
+    max_total_bytes: int,
+    chunk_chars: int = DEFAULT_CHUNK_CHARS,
+    digest_spreadsheets: bool = False,
+    digest_max_rows: int = 1_000_000,
+) -> AttachmentIngestResult:
+    """校验预算并解码附件（阻塞，需在工作线程中调用）
+
+    Args:
+        images: payload["images"]（条目中的 base64_data 会被取出）
+        files: payload["files"]（同上）
+        max_file_bytes: 单个文件解码后的字节上限
+        max_total_bytes: 本次请求所有附件的字节上限
+        chunk_chars: 解码块长度（base64 字符数）
+        digest_spreadsheets: 是否把 CSV / XLSX 替换为本地摘要
+        digest_max_rows: 摘要最多读取的数据行数
+
+    Returns:
+        AttachmentIngestResult: 内容块、跳过的文件与统计
+
+    Notes:
+        - 单个文件失败（超预算、格式不支持、base64 错误）只跳过该文件
+        - 摘要失败时回退为发送原文件
+        - estimated_peak_bytes 为附件缓冲区峰值估算（非实测）：已解码字节 + 当前文件的
+          base64 字符串 + 预分配的解码缓冲区
+    """
+    result = AttachmentIngestResult()
+    start = time.perf_counter()
+    total_bytes = 0
+    peak = 0
+    digested = 0
+    digest_seconds = 0.0
+
+    items = [("image", item) for item in images or []] + [
+        ("document", item) for item in files or []
+    ]
+    for kind, item in items:
+        file_name = item.get("file_name") or kind
+        mime_type = item.get("mime_type") or (
+            "image/jpeg" if kind == "image" else "application/octet-stream"
+        )
+        # 取出 base64 源：payload 不再持有引用，本函数返回后即可回收
+        b64_data = item.pop("base64_data", "") or ""
+        try:
+            if kind == "document":
+                body: dict[str, Any] = {
+                    "format": mime_to_document_format(mime_type),
+                    "name": sanitize_document_name(file_name),
+                }
+            else:
+                body = {"format": mime_type.split("/")[-1]}
+
+            estimated = estimate_decoded_size(b64_data)
+            if estimated > max_file_bytes:
+                raise ValueError(f"文件超过单文件上限 {max_file_bytes} 字节（约 {estimated} 字节）")
+            if total_bytes + estimated > max_total_bytes:
+                raise ValueError(f"附件总量超过上限 {max_total_bytes} 字节")
+
+            peak = max(peak, total_bytes + len(b64_data) + estimated)
+            data = decode_base64_chunked(b64_data, chunk_chars)
+        except Exception as e:
+            result.skipped.append({"file_name": file_name, "reason": str(e)})
+            logger.warning(
+                "⚠️ 附件处理失败，跳过该文件",
+                extra={"file_name": file_name, "attachment_kind": kind, "error": str(e)},
+            )
+            continue
+        finally:
+            del b64_data
+
+        total_bytes += len(data)
+        if digest_spreadsheets and kind == "document" and body["format"] in SPREADSHEET_FORMATS:
+            digest_start = time.perf_counter()
+            try:
+                digest = digest_spreadsheet(data, body["format"], file_name, digest_max_rows)
+            except Exception as e:
+                logger.warning(
+                    "⚠️ 表格摘要失败，发送原文件",
+                    extra={"file_name": file_name, "error_type": type(e).__name__, "error": str(e)},
+                )
+            else:
+                result.blocks.append({"text": digest_to_text(digest)})
+                digested += 1
+                if not item.get("include_original"):
+                    continue
+            finally:
+                digest_seconds += time.perf_counter() - digest_start
+
+        body["source"] = {"bytes": data}
+        result.blocks.append({kind: body})
+
+    result.stats = {
+        "files": len(result.blocks),
+        "skipped": len(result.skipped),
+        "total_bytes": total_bytes,
+        "decode_seconds": round(time.perf_counter() - start, 4),
+        "estimated_peak_bytes": peak,
+        "digested": digested,
+        "digest_seconds": round(digest_seconds, 4),
+    }
+    return result
@@ -0,0 +1,226 @@
+"""内容寻址的附件存储
+
+invoke() 把 payload 中的图片 / 文档 base64 解码为原始字节放进用户消息。
+FilteredMemorySessionManager 以前只清除 toolResult，这些字节会随消息写入
+AgentCore Memory（超出 conversational 限制后以 blob 写入），之后每轮都被重新加载并
+再次发送给模型。
+
+    - 附件字节按 SHA-256 存入本地有界 LRU（同一内容只存一份）
+    - dehydrate_message() 把 image / document 块替换为只含哈希引用的文本块
+      （写时复制，其它内容块共享）
+    - 持久化前、以及本轮结束后的 agent.messages 都使用引用
+    - 调用模型前 dehydrate_history() 保证历史轮次只带引用，只有本轮用户消息携带字节，
+      不会每轮重新发送之前上传的附件
+    - rehydrate_message() 把引用还原为 image / document 块（只用于显式引用的附件）；
+      字节已被淘汰（或会话被路由到其它 microVM）时保留引用文本
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# 附件类型（Bedrock Converse 内容块 key）
+ATTACHMENT_KINDS = ("image", "document")
+
+# 引用文本块格式（语言无关，模型可见）
+ATTACHMENT_REF_FORMAT = "[attachment {kind} format={format} name={name} sha256={digest}]"
+_ATTACHMENT_REF = re.compile(
+    r"\[attachment (image|document) format=(\S*) name=(\S*) sha256=([0-9a-f]{64})\]"
+)
+
+
+class AttachmentStore:
+    """按 SHA-256 寻址的附件字节缓存（有界 LRU，线程安全）
+
+    Attributes:
+        max_bytes: 缓存字节上限
+
+    Examples:
+        >>> store = get_attachment_store()
+        >>> digest = store.put(image_bytes)
+        >>> store.get(digest) == image_bytes
+        True
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024) -> None:
+        """初始化存储
+
+        Args:
+            max_bytes: 缓存字节上限（超出时按 LRU 淘汰）
+        """
+        self.max_bytes = max_bytes
+        self._blobs: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"puts": 0, "dedup_hits": 0, "evictions": 0, "hits": 0, "misses": 0}
+
+    def put(self, data: bytes) -> str:
+        """存入字节（相同内容只存一份）
+
+        Args:
+            data: 附件字节
+
+        Returns:
+            str: SHA-256 十六进制摘要
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._stats["puts"] += 1
+            if digest in self._blobs:
+                self._blobs.move_to_end(digest)
+                self._stats["dedup_hits"] += 1
+                return digest
+            if len(data) > self.max_bytes:
+                return digest
+            self._blobs[digest] = bytes(data)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._blobs.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats["evictions"] += 1
+        return digest
+
+    def get(self, digest: str) -> bytes | None:
+        """按摘要取回字节（已淘汰时返回 None）"""
+        with self._lock:
+            data = self._blobs.get(digest)
+            if data is None:
+                self._stats["misses"] += 1
+                return None
+            self._blobs.move_to_end(digest)
+            self._stats["hits"] += 1
+            return data
+
+    def stats(self) -> dict[str, int]:
+        """获取统计（条目数、字节数、去重命中、淘汰次数）"""
+        with self._lock:
+            return {**self._stats, "entries": len(self._blobs), "bytes": self._bytes}
+
+
+def _attachment_bytes(block: Any) -> tuple[str, dict, bytes] | None:
+    """提取附件块的 (kind, 块内容, 字节)；非附件块返回 None"""
+    if not isinstance(block, dict):
+        return None
+    for kind in ATTACHMENT_KINDS:
+        body = block.get(kind)
+        if isinstance(body, dict):
+            data = body.get("source", {}).get("bytes")
+            if isinstance(data, (bytes, bytearray)):
+                return kind, body, data
+    return None
+
+
+def dehydrate_message(message: dict, store: "AttachmentStore | None" = None) -> dict:
+    """把消息中的图片 / 文档字节替换为哈希引用（写时复制）
+
+    如果消息不包含附件字节，直接返回原始 message（零开销）。
+
+    Args:
+        message: Strands Message
+        store: 附件存储（默认全局实例）
+
+    Returns:
+        dict: 替换后的消息（只为 message 和 content 列表分配新对象）
+    """
+    content = message.get("content")
+    if not content or not any(_attachment_bytes(block) for block in content):
+        return message
+
+    store = store or get_attachment_store()
+    new_content = []
+    for block in content:
+        attachment = _attachment_bytes(block)
+        if attachment is None:
+            new_content.append(block)
+            continue
+        kind, body, data = attachment
+        digest = store.put(data)
+        new_content.append(
+            {
+                "text": ATTACHMENT_REF_FORMAT.format(
+                    kind=kind,
+                    format=body.get("format", ""),
+                    name=body.get("name", ""),
+                    digest=digest,
+                )
+            }
+        )
+    return {**message, "content": new_content}
+
+
+def rehydrate_message(message: dict, store: "AttachmentStore | None" = None) -> dict:
+    """把消息中的哈希引用还原为图片 / 文档块（写时复制，dehydrate_message 的逆操作）
+
+    如果消息不包含可还原的引用，直接返回原始 message（零开销）。
+
+    Args:
+        message: Strands Message
+        store: 附件存储（默认全局实例）
+
+    Returns:
+        dict: 还原后的消息；字节已不在存储中的引用保持文本块
+    """
+    content = message.get("content")
+    if not content:
+        return message
+
+    store = store or get_attachment_store()
+    new_content = None
+    for index, block in enumerate(content):
+        text = block.get("text") if isinstance(block, dict) else None
+        match = _ATTACHMENT_REF.fullmatch(text) if isinstance(text, str) else None
+        if match is None:
+            continue
+        kind, doc_format, name, digest = match.groups()
+        data = store.get(digest)
+        if data is None:
+            continue
+        body: dict[str, Any] = {"format": doc_format, "source": {"bytes": data}}
+        if kind == "document":
+            body["name"] = name
+        if new_content is None:
+            new_content = list(content)
+        new_content[index] = {kind: body}
+    if new_content is None:
+        return message
+    return {**message, "content": new_content}
+
+
+def dehydrate_history(messages: list[dict], store: "AttachmentStore | None" = None) -> list[dict]:
+    """把历史消息中的附件字节全部替换为哈希引用
+
+    在追加本轮用户消息之前调用：之前轮次的附件只以引用文本出现在上下文中，
+    只有本轮用户消息携带字节。不包含附件字节的消息原样返回（零开销）。
+
+    Args:
+        messages: agent.messages
+        store: 附件存储（默认全局实例）
+
+    Returns:
+        list[dict]: 替换后的消息列表
+    """
+    return [dehydrate_message(message, store) for message in messages]
+
+
+# 全局单例
+_attachment_store: AttachmentStore | None = None
+_attachment_store_lock = threading.Lock()
+
+
+def get_attachment_store() -> AttachmentStore:
+    """获取全局附件存储"""
+    global _attachment_store
+
+    if _attachment_store is None:
+        with _attachment_store_lock:
+            if _attachment_store is None:
+                from costq_agents.config.settings import settings
+
+                _attachment_store = AttachmentStore(max_bytes=settings.ATTACHMENT_STORE_MAX_BYTES)
+
+    return _attachment_store
@@ -0,0 +1,186 @@
+"""SSE 事件投影 - 白名单字段 + 预编码字节
+
+Strands 每个流式事件都携带 agent / request_state / trace 等运行时对象，
+filter_event() 以黑名单方式逐事件复制字典，AgentCore SDK 再对结果做 json.dumps
+（失败时还会走 convert_complex_objects 的慢路径）。
+
+这里改为投影：只保留前端消费的字段，并直接编码成 SSE 帧字节：
+
+    - event.contentBlockDelta         文本 / 工具参数 / 推理增量
+    - event.contentBlockStart.toolUse 工具调用开始（仅 toolUseId + name）
+    - message                         完整消息（工具结果等）
+    - result                          stop_reason + metrics
+                                      （accumulated_usage / accumulated_metrics）
+
+其它 Strands 事件（init_event_loop、data/delta 重复文本等）不再下发。
+编码优先使用 orjson（未安装时回退标准库 json），SSEPassthroughApp 识别
+SSEFrame 后直接写出，不再二次序列化。
+"""
+
+import json
+import logging
+from typing import Any
+
+from bedrock_agentcore import BedrockAgentCoreApp
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 依赖缺失时回退标准库
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+
+# 黑名单（filter_event 使用）
+_REMOVE_FIELDS = frozenset(
+    {
+        "agent",
+        "request_state",
+        "event_loop_cycle_trace",
+        "event_loop_cycle_span",
+        "model",
+        "messages",
+        "system_prompt",
+        "tool_config",
+        "event_loop_cycle_id",
+    }
+)
+
+
+class SSEFrame(bytes):
+    """已编码完成的 SSE 帧（data: <json>\\n\\n）"""
+
+    __slots__ = ()
+
+
+def _default(obj: Any) -> Any:
+    """非 JSON 原生类型的回退（bytes 附件、datetime 等）"""
+    if isinstance(obj, (bytes, bytearray)):
+        return f"<{len(obj)} bytes>"
+    return str(obj)
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """标准库序列化（紧凑分隔符，保留非 ASCII 字符）"""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode(
+        "utf-8"
+    )
+
+
+if orjson is not None:
+
+    def dumps(obj: Any) -> bytes:
+        """序列化为 UTF-8 JSON 字节（orjson，非字符串键等情况回退标准库）"""
+        try:
+            return orjson.dumps(obj, default=_default)
+        except TypeError:
+            return _json_dumps(obj)
+
+else:
+    dumps = _json_dumps
+
+
+def encode_sse(obj: Any) -> SSEFrame:
+    """编码为 SSE 帧
+
+    Args:
+        obj: 可 JSON 序列化的对象
+
+    Returns:
+        SSEFrame: data: <json>\\n\\n
+    """
+    return SSEFrame(_SSE_PREFIX + dumps(obj) + _SSE_SUFFIX)
+
+
+def _project_result(result: Any) -> dict[str, Any]:
+    """AgentResult → stop_reason + 汇总指标"""
+    projected: dict[str, Any] = {"stop_reason": getattr(result, "stop_reason", None)}
+    metrics = getattr(result, "metrics", None)
+    if metrics is not None:
+        projected["metrics"] = {
+            "accumulated_usage": getattr(metrics, "accumulated_usage", None),
+            "accumulated_metrics": getattr(metrics, "accumulated_metrics", None),
+        }
+    return projected
+
+
+def project_event(event: dict) -> dict | None:
+    """提取前端消费的字段
+
+    Args:
+        event: 原始 Strands 事件
+
+    Returns:
+        dict | None: 投影后的事件；不含任何白名单字段时返回 None（不下发）
+    """
+    projected: dict[str, Any] = {}
+
+    stream_event = event.get("event")
+    if stream_event:
+        if "contentBlockDelta" in stream_event:
+            projected["event"] = {"contentBlockDelta": stream_event["contentBlockDelta"]}
+        elif "contentBlockStart" in stream_event:
+            tool_use = stream_event["contentBlockStart"].get("start", {}).get("toolUse")
+            if tool_use:
+                projected["event"] = {
+                    "contentBlockStart": {
+                        "start": {
+                            "toolUse": {
+                                "toolUseId": tool_use.get("toolUseId"),
+                                "name": tool_use.get("name"),
+                            }
+                        }
+                    }
+                }
+
+    if "message" in event:
+        projected["message"] = event["message"]
+
+    if "result" in event:
+        projected["result"] = _project_result(event["result"])
+
+    return projected or None
+
+
+def project_and_encode(event: dict) -> SSEFrame | None:
+    """投影并编码 Strands 事件
+
+    Args:
+        event: 原始 Strands 事件
+
+    Returns:
+        SSEFrame | None: 编码后的 SSE 帧；无需下发时返回 None
+    """
+    projected = project_event(event)
+    if projected is None:
+        return None
+    return encode_sse(projected)
+
+
+def filter_event(event: dict) -> dict:
+    """
+    过滤SSE事件冗余字段（黑名单），避免触发100MB Runtime限制
+
+    SSE_EVENT_PROJECTION_ENABLED=false 时使用，保留全部未知字段。
+
+    Args:
+        event: 原始Strands事件
+
+    Returns:
+        过滤后的事件（移除了冗余大字段）
+    """
+    return {k: v for k, v in event.items() if k not in _REMOVE_FIELDS}
+
+
+class SSEPassthroughApp(BedrockAgentCoreApp):
+    """识别 SSEFrame 的 AgentCore App
+
+    SSEFrame 直接写出；其它对象仍走 SDK 的安全序列化。
+    """
+
+    def _convert_to_sse(self, obj: Any) -> bytes:
+        if isinstance(obj, SSEFrame):
+            return obj
+        return super()._convert_to_sse(obj)
@@ -1,23 +1,35 @@
 """过滤工具返回结果的 SessionManager。
 
 在消息持久化到 AgentCore Memory 之前，清除 toolResult 的返回内容，
-仅保留 toolUseId 和 status 以便追踪。
+仅保留 toolUseId 和 status 以便追踪；图片 / 文档字节替换为内容哈希引用
+（见 attachment_store）。
 运行时上下文（agent.messages）不受影响。
+
+长期记忆检索按 namespace 并发并带短期缓存（见 memory_retrieval）。
+Agent 初始化时只从最新一端加载最近的短期历史窗口（见 memory_history）。
+可选写后模式（MEMORY_WRITE_BEHIND_ENABLED）：消息在后台按会话顺序批量写入。
 """
 
-import copy
 import json
 import logging
-from typing import TYPE_CHECKING, Any
+import time
+from datetime import datetime
+from typing import Any
 
+from bedrock_agentcore.memory.integrations.strands.config import PersistenceMode
 from bedrock_agentcore.memory.integrations.strands.session_manager import (
     AgentCoreMemorySessionManager,
 )
+from strands.agent.agent import Agent
+from strands.hooks import AfterInvocationEvent, HookRegistry, MessageAddedEvent
 from strands.types.content import Message
+from strands.types.session import SessionMessage
 from typing_extensions import override
 
-if TYPE_CHECKING:
-    from strands.agent.agent import Agent
+from costq_agents.agent.attachment_store import dehydrate_message
+from costq_agents.agent.memory_history import load_recent_messages, trim_history
+from costq_agents.agent.memory_retrieval import get_memory_retriever
+from costq_agents.agent.memory_write_behind import MemoryWriteBehind, PendingEvent, build_payload
 
 logger = logging.getLogger(__name__)
 
@@ -26,13 +38,253 @@ TOOL_RESULT_STRIPPED = "TOOL_RESULT_STRIPPED"
 
 
 class FilteredMemorySessionManager(AgentCoreMemorySessionManager):
-    """在持久化前清除工具返回结果的 SessionManager。"""
+    """在持久化前清除工具返回结果的 SessionManager。
+
+    write_behind=True 时消息写入交给 MemoryWriteBehind 在后台批量完成，
+    append_message() 只做本地转换后入队。
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        write_behind: bool = False,
+        history_max_messages: int | None = None,
+        history_token_budget: int | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self._history_max_messages = history_max_messages
+        self._history_token_budget = history_token_budget
+        self._write_behind: MemoryWriteBehind | None = None
+        if write_behind:
+            from costq_agents.config.settings import settings
+
+            self._write_behind = MemoryWriteBehind(
+                send=self._send_pending_events,
+                max_batch=settings.MEMORY_WRITE_BEHIND_MAX_BATCH,
+                linger_seconds=settings.MEMORY_WRITE_BEHIND_LINGER_MS / 1000,
+                max_retries=settings.MEMORY_WRITE_BEHIND_MAX_RETRIES,
+            )
+
+    @override
+    def append_message(self, message: Message, agent: Agent, **kwargs: Any) -> None:
+        """追加消息到会话，持久化前清除工具返回结果和附件字节。"""
+        filtered = dehydrate_message(self._strip_tool_results(message))
+        if self._write_behind is None:
+            super().append_message(filtered, agent, **kwargs)
+            return
+
+        session_message = SessionMessage.from_message(filtered, 0)
+        if self._enqueue(session_message, kwargs.get("metadata")):
+            # 与 SDK 批量模式一致：eventId 尚未分配
+            self._latest_agent_message[agent.agent_id] = SessionMessage.from_message(
+                filtered, None
+            )
+
+    @override
+    def update_message(
+        self, session_id: str, agent_id: str, session_message: SessionMessage, **kwargs: Any
+    ) -> None:
+        """更新消息（guardrail 脱敏），写后模式下改写仍在队列中的消息
+
+        写后队列中的消息没有 eventId，SDK 只在自己的批量缓冲中查找，会静默跳过；
+        这里按 append_message() 相同的转换重建 payload 并原位替换。
+        """
+        if (
+            self._write_behind is None
+            or session_message.message_id is not None
+            or session_id != self.config.session_id
+        ):
+            super().update_message(session_id, agent_id, session_message, **kwargs)
+            return
+
+        # 只持久化脱敏后的内容，原文不写入 Memory
+        redacted = session_message.to_message()
+        filtered = SessionMessage(
+            message=dehydrate_message(self._strip_tool_results(redacted)),
+            message_id=0,
+            created_at=session_message.created_at,
+        )
+        messages = self.converter.message_to_payload(filtered)
+        if not messages:
+            return
+        is_blob = self.converter.exceeds_conversational_limit(messages[0])
+        role = redacted["role"]
+        if not self._write_behind.replace_latest(role, build_payload(messages, is_blob)):
+            # 已被取走发送（尚无 eventId 可删除）或已写入失败
+            logger.warning(
+                "⚠️ 待更新消息已不在写后队列中，跳过更新",
+                extra={"session_id": session_id, "agent_id": agent_id, "role": role},
+            )
+
+    def _enqueue(self, session_message: SessionMessage, metadata: Any) -> bool:
+        """本地转换消息并入队（时间戳在入队时分配，保证会话内顺序）"""
+        messages = self.converter.message_to_payload(session_message)
+        if not messages or self.persistence_mode is PersistenceMode.NONE:
+            return False
+        is_blob = self.converter.exceeds_conversational_limit(messages[0])
+        created_at = datetime.fromisoformat(session_message.created_at.replace("Z", "+00:00"))
+        self._write_behind.submit(
+            PendingEvent(
+                payload=build_payload(messages, is_blob),
+                timestamp=self._get_monotonic_timestamp(created_at),
+                metadata=self._build_metadata(per_call_metadata=metadata),
+                enqueued_at=time.monotonic(),
+            )
+        )
+        return True
+
+    def _send_pending_events(self, batch: list[PendingEvent]) -> None:
+        """把一批消息写为一个 Memory 事件（后台线程调用）"""
+        create_event_kwargs: dict[str, Any] = {
+            "memoryId": self.config.memory_id,
+            "actorId": self.config.actor_id,
+            "sessionId": self.config.session_id,
+            "payload": [entry for event in batch for entry in event.payload],
+            "eventTimestamp": batch[-1].timestamp,
+        }
+        if batch[0].metadata:
+            create_event_kwargs["metadata"] = batch[0].metadata
+        self.memory_client.gmdp_client.create_event(**create_event_kwargs)
+
+    @override
+    def list_messages(
+        self,
+        session_id: str,
+        agent_id: str,
+        limit: int | None = None,
+        offset: int = 0,
+        **kwargs: Any,
+    ) -> list[SessionMessage]:
+        """加载会话消息；未指定 limit 时（Agent 初始化）只加载最近的历史窗口
+
+        Notes:
+            - 未读完整个会话时无法确定 offset（被 ConversationManager 移除的前缀）的
+              位置，直接取尾部窗口；窗口不超过 ConversationManager 的保留范围
+            - 加载失败时与 SDK 一致返回空列表
+        """
+        if (
+            limit is not None
+            or not self._history_max_messages
+            or session_id != self.config.session_id
+        ):
+            return super().list_messages(session_id, agent_id, limit, offset, **kwargs)
+
+        def list_page(next_token: str | None) -> dict[str, Any]:
+            params: dict[str, Any] = {
+                "memoryId": self.config.memory_id,
+                "actorId": self.config.actor_id,
+                "sessionId": session_id,
+                "maxResults": min(100, self._history_max_messages),
+                "includePayloads": True,
+            }
+            if next_token:
+                params["nextToken"] = next_token
+            return self.memory_client.gmdp_client.list_events(**params)
+
+        budget = self._history_token_budget or 0
+        try:
+            messages, exhausted = load_recent_messages(
+                list_page,
+                self.converter.events_to_messages,
+                self._history_max_messages,
+                budget or float("inf"),
+            )
+        except Exception as e:
+            logger.error(
+                "短期历史加载失败",
+                extra={"error_type": type(e).__name__, "error": str(e)},
+            )
+            return []
+        if self.config.filter_restored_tool_context:
+            messages = self._filter_restored_tool_context(messages)
+        if exhausted:
+            messages = messages[offset:]
+        return trim_history(messages, self._history_max_messages, budget or float("inf"))
 
     @override
-    def append_message(self, message: Message, agent: "Agent", **kwargs: Any) -> None:
-        """追加消息到会话，持久化前清除工具返回结果。"""
-        filtered = self._strip_tool_results(message)
-        super().append_message(filtered, agent, **kwargs)
+    def register_hooks(self, registry: HookRegistry, **kwargs: Any) -> None:
+        """注册 hooks；写后模式下每轮结束时结束凑批等待（不阻塞 Agent）"""
+        super().register_hooks(registry, **kwargs)
+        if self._write_behind is not None:
+            registry.add_callback(
+                AfterInvocationEvent, lambda event: self._write_behind.request_flush()
+            )
+
+    @override
+    def retrieve_customer_context(self, event: MessageAddedEvent) -> None:
+        """检索长期记忆并注入最后一条用户消息
+
+        各 namespace 经共享线程池并发检索，结果按 (actor_id, namespace, 查询指纹)
+        短期缓存，并按配置顺序拼接（注入内容稳定）。
+        """
+        if not isinstance(event.agent, Agent) or not self.config.retrieval_config:
+            return super().retrieve_customer_context(event)
+
+        messages = event.agent.messages
+        if not messages or messages[-1].get("role") != "user":
+            return None
+        content = messages[-1].get("content")
+        if not content or "text" not in content[0]:
+            return None
+
+        user_query = content[0]["text"]
+        namespaces = [
+            (
+                namespace.format(
+                    actorId=self.config.actor_id,
+                    sessionId=self.config.session_id,
+                    memoryStrategyId=retrieval_config.strategy_id or "",
+                ),
+                retrieval_config.top_k,
+                retrieval_config.relevance_score,
+            )
+            for namespace, retrieval_config in self.config.retrieval_config.items()
+        ]
+
+        def fetch(namespace_path: str, top_k: int) -> list[Any]:
+            return self.memory_client.retrieve_memories(
+                memory_id=self.config.memory_id,
+                namespace_path=namespace_path,
+                query=user_query,
+                top_k=top_k,
+            )
+
+        retriever = get_memory_retriever()
+        try:
+            all_context = retriever.retrieve(self.config.actor_id, user_query, namespaces, fetch)
+            # 前置插入，用户查询保持在最后
+            if all_context:
+                context_text = "\n".join(all_context)
+                tag = self.config.context_tag
+                content.insert(0, {"text": f"<{tag}>{context_text}</{tag}>"})
+                logger.info(
+                    "检索到长期记忆上下文",
+                    extra={"items": len(all_context), "cache": retriever.cache.stats()},
+                )
+        except Exception as e:
+            logger.error(
+                "长期记忆检索失败",
+                extra={"error_type": type(e).__name__, "error": str(e)},
+            )
+        return None
+
+    def flush_pending(self, timeout: float | None = None) -> bool:
+        """等待写后队列写完（流结束时调用）
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            bool: 是否写完（未启用写后模式时恒为 True）
+        """
+        if self._write_behind is None:
+            return True
+        return self._write_behind.flush(timeout)
+
+    def pending_write_count(self) -> int:
+        """写后队列中未写入的消息数"""
+        return self._write_behind.depth() if self._write_behind is not None else 0
 
     @staticmethod
     def _strip_tool_results(message: Message) -> Message:
@@ -40,6 +292,10 @@ class FilteredMemorySessionManager(AgentCoreMemorySessionManager):
 
         如果消息不包含 toolResult，直接返回原始 message（零开销）。
         遇到非法结构时静默跳过，不抛异常。
+
+        写时复制：只为 message、content 列表和被清除的 toolResult 块分配新对象，
+        其它内容块与原消息共享（下游只读取 message，不会修改）。
+        原始结果大小仅在 DEBUG 日志启用时计算。
         """
         content = message.get("content", [])
         if not content:
@@ -52,33 +308,32 @@ class FilteredMemorySessionManager(AgentCoreMemorySessionManager):
         if not has_tool_result:
             return message
 
-        filtered = copy.deepcopy(message)
-        for block in filtered.get("content", []):
-            if not isinstance(block, dict) or "toolResult" not in block:
-                continue
-
-            tool_result = block.get("toolResult")
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        new_content = []
+        for block in content:
+            tool_result = block.get("toolResult") if isinstance(block, dict) else None
             if not isinstance(tool_result, dict):
+                new_content.append(block)
                 continue
 
-            tool_use_id = tool_result.get("toolUseId", "unknown")
-
-            original_content = tool_result.get("content", [])
-            try:
-                original_size = len(json.dumps(original_content, ensure_ascii=False))
-            except (TypeError, ValueError):
-                original_size = -1
-
             # 每次构造新 list，避免可变对象共享
-            tool_result["content"] = [{"text": TOOL_RESULT_STRIPPED}]
-
-            logger.debug(
-                "清除 toolResult 返回内容",
-                extra={
-                    "tool_use_id": tool_use_id,
-                    "original_size": original_size,
-                    "status": tool_result.get("status", "unknown"),
-                },
-            )
+            stripped = {**tool_result, "content": [{"text": TOOL_RESULT_STRIPPED}]}
+            new_content.append({**block, "toolResult": stripped})
+
+            if debug_enabled:
+                try:
+                    original_size = len(
+                        json.dumps(tool_result.get("content", []), ensure_ascii=False)
+                    )
+                except (TypeError, ValueError):
+                    original_size = -1
+                logger.debug(
+                    "清除 toolResult 返回内容",
+                    extra={
+                        "tool_use_id": tool_result.get("toolUseId", "unknown"),
+                        "original_size": original_size,
+                        "status": tool_result.get("status", "unknown"),
+                    },
+                )
 
-        return filtered
+        return {**message, "content": new_content}
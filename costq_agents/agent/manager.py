@@ -1,14 +1,17 @@
 """Agent管理器 - 简化版（无缓存）
 
 完全对齐AgentCore Runtime部署标准，移除复杂的TTL缓存和并发控制逻辑。
+BedrockModel 按 (model_id, region, cache_config) 注册，跨请求共享。
 """
 
 import logging
 import os
+import threading
 from typing import Any
 
 from strands import Agent
 from strands.models import BedrockModel
+from strands.tools.registry import ToolRegistry
 from strands_tools.calculator import calculator  # 计算器工具（SymPy 底层）
 
 from costq_agents.config.settings import settings
@@ -19,19 +22,38 @@ logger = logging.getLogger(__name__)
 # 环境判断（用于日志风格）
 IS_PRODUCTION = os.getenv("ENVIRONMENT") == "production"
 
+# BedrockModel 注册表：(model_id, region, cache_config) -> BedrockModel
+# 跨请求、跨提示词类型共享（BedrockModel 不持有 system_prompt，botocore client 线程安全）
+_bedrock_models: dict[tuple, BedrockModel] = {}
+_bedrock_models_lock = threading.Lock()
+_bedrock_model_stats = {"hits": 0, "misses": 0}
+
+
+def get_bedrock_model_registry_stats() -> dict[str, int]:
+    """获取 BedrockModel 注册表统计（hits / misses / size）"""
+    with _bedrock_models_lock:
+        return {**_bedrock_model_stats, "size": len(_bedrock_models)}
+
+
+def clear_bedrock_model_registry() -> None:
+    """清空 BedrockModel 注册表（配置变更或测试时使用）"""
+    with _bedrock_models_lock:
+        _bedrock_models.clear()
+        _bedrock_model_stats.update(hits=0, misses=0)
+
 
 class AgentManager:
     """Agent管理器（简化版）
 
     设计理念：
-        1. 单例BedrockModel（复用LLM连接，减少内存占用）
-        2. 无状态Agent创建（每次创建新实例，AgentCore Runtime在microVM内复用）
+        1. 共享BedrockModel（按 model_id/region/cache_config 注册，跨请求复用LLM连接）
+        2. 无状态Agent创建（每次创建新实例；对话 Agent 的跨轮复用由 agent_cache 负责）
         3. 无TTL缓存（避免内存泄漏，简化生命周期管理）
 
     Attributes:
         system_prompt: 系统提示词
         model_id: Bedrock模型ID
-        bedrock_model: 单例BedrockModel实例
+        bedrock_model: 共享的BedrockModel实例
 
     Examples:
         >>> manager = AgentManager(
@@ -58,8 +80,8 @@ class AgentManager:
         self.system_prompt = system_prompt
         self.model_id = model_id or settings.BEDROCK_MODEL_ID
 
-        # 单例BedrockModel
-        self.bedrock_model = self._create_bedrock_model()
+        # 共享BedrockModel（注册表命中时不再创建 boto3 Session / botocore client）
+        self.bedrock_model = self._get_or_create_bedrock_model()
 
         if IS_PRODUCTION:
             logger.info("AgentManager初始化完成", extra={"model_id": self.model_id})
@@ -86,9 +108,9 @@ class AgentManager:
         prompt_id = parts[-2].split("/")[-1]
         version = parts[-1]
 
-        import boto3
+        from costq_agents.utils.aws_client_factory import get_aws_client_factory
 
-        client = boto3.client(
+        client = get_aws_client_factory().get_client(
             "bedrock-agent",
             region_name=settings.BEDROCK_PROMPT_REGION,
         )
@@ -116,7 +138,68 @@ class AgentManager:
 
         return prompt_text
 
-    def _create_bedrock_model(self) -> BedrockModel:
+    @staticmethod
+    def _build_cache_config() -> dict[str, Any]:
+        """构建 Prompt Caching 配置（BEDROCK_ENABLE_PROMPT_CACHING 关闭时为空）"""
+        cache_config: dict[str, Any] = {}
+        if settings.BEDROCK_ENABLE_PROMPT_CACHING:
+            from strands.models.model import CacheConfig
+
+            cache_config = {
+                # system prompt 缓存（cache_prompt 虽已 deprecated，但 cache_config
+                # 的 auto 策略只处理 messages，不会自动给 system 加 cachePoint）
+                "cache_prompt": settings.BEDROCK_CACHE_PROMPT,
+                # 工具定义缓存
+                "cache_tools": settings.BEDROCK_CACHE_TOOLS,
+                # ✅ 启用 messages 自动缓存（历史对话 + tool results）
+                # SDK 会在最后一条 user message 末尾注入 cachePoint，
+                # 使上一轮的 tool result 在下一轮享受 0.1x cache read
+                "cache_config": CacheConfig(strategy="auto"),
+            }
+        return cache_config
+
+    def _get_or_create_bedrock_model(self) -> BedrockModel:
+        """从注册表获取 BedrockModel，未命中时创建并注册
+
+        Returns:
+            BedrockModel: 按 (model_id, region, cache_config) 共享的模型实例
+
+        Raises:
+            ValueError: 如果Bedrock配置无效
+
+        Notes:
+            - CacheConfig 是可变 dataclass，注册表键使用其 repr
+            - 创建在锁内完成，并发请求不会为同一个键重复创建 botocore client
+        """
+        cache_config = self._build_cache_config()
+        key = (
+            self.model_id,
+            settings.bedrock_region,
+            tuple(sorted((name, repr(value)) for name, value in cache_config.items())),
+        )
+
+        with _bedrock_models_lock:
+            model = _bedrock_models.get(key)
+            if model is not None:
+                _bedrock_model_stats["hits"] += 1
+                logger.debug("♻️ 复用共享 BedrockModel", extra={"model_id": self.model_id})
+                return model
+
+            _bedrock_model_stats["misses"] += 1
+            model = self._create_bedrock_model(cache_config)
+            _bedrock_models[key] = model
+
+        logger.info(
+            "✅ BedrockModel 已创建并注册",
+            extra={
+                "model_id": self.model_id,
+                "region": settings.bedrock_region,
+                "registry_size": len(_bedrock_models),
+            },
+        )
+        return model
+
+    def _create_bedrock_model(self, cache_config: dict[str, Any] | None = None) -> BedrockModel:
         """创建BedrockModel实例
 
         根据环境自动选择凭证方式：
@@ -129,26 +212,18 @@ class AgentManager:
         Raises:
             ValueError: 如果Bedrock配置无效
 
+        Args:
+            cache_config: Prompt Caching 配置（None=按当前配置构建）
+
         Notes:
             - Prompt Caching可通过环境变量BEDROCK_ENABLE_PROMPT_CACHING控制
             - 本地环境需要配置AWS_PROFILE环境变量
+            - 请通过 _get_or_create_bedrock_model 获取共享实例
         """
         # Prompt Caching配置
-        cache_config: dict[str, Any] = {}
-        if settings.BEDROCK_ENABLE_PROMPT_CACHING:
-            from strands.models.model import CacheConfig
-
-            cache_config = {
-                # system prompt 缓存（cache_prompt 虽已 deprecated，但 cache_config
-                # 的 auto 策略只处理 messages，不会自动给 system 加 cachePoint）
-                "cache_prompt": settings.BEDROCK_CACHE_PROMPT,
-                # 工具定义缓存
-                "cache_tools": settings.BEDROCK_CACHE_TOOLS,
-                # ✅ 启用 messages 自动缓存（历史对话 + tool results）
-                # SDK 会在最后一条 user message 末尾注入 cachePoint，
-                # 使上一轮的 tool result 在下一轮享受 0.1x cache read
-                "cache_config": CacheConfig(strategy="auto"),
-            }
+        if cache_config is None:
+            cache_config = self._build_cache_config()
+        if cache_config:
             if not IS_PRODUCTION:
                 logger.info(f"✅ Bedrock Prompt Caching已启用: {cache_config}")
 
@@ -313,6 +388,25 @@ class AgentManager:
 
         return agent
 
+    def rebind_tools(self, agent: Agent, tools: list[Any]) -> Agent:
+        """为缓存复用的 Agent 绑定本次请求的工具
+
+        MCP 客户端按请求租用，缓存的 Agent 仍引用上一轮的工具实例；对话状态、
+        SessionManager 和 ConversationManager 保持不变。
+
+        Args:
+            agent: 缓存取出的 Agent
+            tools: 本次请求的工具列表（不含 calculator）
+
+        Returns:
+            Agent: 同一个 Agent 实例
+        """
+        registry = ToolRegistry()
+        registry.process_tools([calculator] + tools)
+        registry.initialize_tools()
+        agent.tool_registry = registry
+        return agent
+
     def create_agent_with_memory(
         self,
         tools: list[Any],
@@ -418,11 +512,12 @@ class AgentManager:
         # 2. SessionManager（负责Memory持久化）
         # 注意：Memory 资源在 AWS_REGION (ap-northeast-1)，不是 bedrock_region (us-west-2)
 
-        # 检查当前 AWS credentials
-        import boto3
+        # 检查当前 AWS credentials（身份按进程缓存，不再每次调用 STS）
+        from costq_agents.utils.aws_client_factory import get_aws_client_factory
         try:
-            sts_client = boto3.client('sts', region_name=settings.AWS_REGION)
-            caller_identity = sts_client.get_caller_identity()
+            caller_identity = get_aws_client_factory().get_caller_identity(
+                region_name=settings.AWS_REGION
+            )
             current_role_arn = caller_identity.get('Arn', 'Unknown')
             current_account = caller_identity.get('Account', 'Unknown')
         except Exception as e:
@@ -458,6 +553,14 @@ class AgentManager:
             session_manager = FilteredMemorySessionManager(
                 agentcore_memory_config=agentcore_memory_config,
                 region_name=settings.AWS_REGION,
+                write_behind=settings.MEMORY_WRITE_BEHIND_ENABLED,
+                # 只加载最近的历史窗口（与下方 SlidingWindow 的 window_size 对齐）
+                history_max_messages=(
+                    min(settings.MEMORY_HISTORY_MAX_MESSAGES, window_size)
+                    if settings.MEMORY_HISTORY_MAX_MESSAGES
+                    else None
+                ),
+                history_token_budget=settings.MEMORY_HISTORY_TOKEN_BUDGET or None,
             )
 
             has_retrieval = agentcore_memory_config.retrieval_config is not None
@@ -468,6 +571,7 @@ class AgentManager:
                     "user_preferences_top_k": 5,
                     "semantic_memories_top_k": 3,
                     "tool_result_filtering": True,
+                    "write_behind": settings.MEMORY_WRITE_BEHIND_ENABLED,
                 }
             )
 
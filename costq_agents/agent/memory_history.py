@@ -0,0 +1,110 @@
+"""短期历史窗口加载
+
+SDK 的 list_messages() 在 Agent 初始化时一次拉取整个会话（最多 10000 个事件，每页
+100 个），全部转换为消息后再交给 SlidingWindowConversationManager 裁剪到 40 条。
+长会话的恢复时间和内存随会话长度线性增长。
+
+load_recent_messages() 从最新一端分页读取：
+
+    - ListEvents 按时间倒序返回，每页转换后前插，累计到消息数或 Token 预算即停止
+    - trim_history() 从尾部截取窗口，并保证窗口以普通用户消息开头
+      （不会以孤立的 toolResult 开头）
+"""
+
+import logging
+from collections.abc import Callable
+from typing import Any
+
+from strands.types.session import SessionMessage
+
+from costq_agents.utils.messages import estimate_messages_bytes
+
+logger = logging.getLogger(__name__)
+
+# 粗略估算：每 Token 约 4 个字符
+CHARS_PER_TOKEN = 4
+
+
+def estimate_message_tokens(message: Any) -> int:
+    """估算单条消息的 Token 数"""
+    return estimate_messages_bytes(message) // CHARS_PER_TOKEN + 1
+
+
+def _starts_turn(message: dict) -> bool:
+    """是否为可作为历史起点的用户消息（不含 toolResult）"""
+    return message.get("role") == "user" and not any(
+        isinstance(block, dict) and "toolResult" in block for block in message.get("content", [])
+    )
+
+
+def trim_history(
+    messages: list[SessionMessage], max_messages: int, max_tokens: float
+) -> list[SessionMessage]:
+    """从尾部截取不超过消息数和 Token 预算的历史
+
+    Args:
+        messages: 按时间正序的消息
+        max_messages: 最大消息数
+        max_tokens: Token 预算（inf=不限制）
+
+    Returns:
+        list[SessionMessage]: 尾部窗口（以普通用户消息开头，可能为空）
+    """
+    start = len(messages)
+    tokens = 0
+    while start > 0 and len(messages) - start < max_messages:
+        cost = estimate_message_tokens(messages[start - 1].message)
+        if tokens + cost > max_tokens:
+            break
+        tokens += cost
+        start -= 1
+    while start < len(messages) and not _starts_turn(messages[start].message):
+        start += 1
+    return messages[start:]
+
+
+def load_recent_messages(
+    list_page: Callable[[str | None], dict[str, Any]],
+    to_messages: Callable[[list[dict[str, Any]]], list[SessionMessage]],
+    max_messages: int,
+    max_tokens: float,
+) -> tuple[list[SessionMessage], bool]:
+    """从最新一端分页读取会话消息，达到消息数或 Token 预算即停止
+
+    Args:
+        list_page: 读取一页事件 (next_token) -> ListEvents 响应
+        to_messages: 事件转消息（converter.events_to_messages，输入为倒序事件）
+        max_messages: 最大消息数
+        max_tokens: Token 预算（inf=不限制）
+
+    Returns:
+        tuple: (按时间正序的消息, 是否已读完整个会话)
+    """
+    collected: list[SessionMessage] = []
+    tokens = 0
+    pages = 0
+    next_token: str | None = None
+    while True:
+        response = list_page(next_token)
+        pages += 1
+        page_messages = to_messages(response.get("events", []))
+        collected[:0] = page_messages
+        tokens += sum(estimate_message_tokens(m.message) for m in page_messages)
+        next_token = response.get("nextToken")
+        if not next_token:
+            exhausted = True
+            break
+        if len(collected) >= max_messages or tokens >= max_tokens:
+            exhausted = False
+            break
+
+    logger.info(
+        "📜 短期历史窗口加载完成",
+        extra={
+            "pages": pages,
+            "messages_loaded": len(collected),
+            "estimated_tokens": tokens,
+            "exhausted": exhausted,
+        },
+    )
+    return collected, exhausted
@@ -0,0 +1,249 @@
+"""长期记忆检索：多 namespace 并发 + 按 actor 的 TTL 缓存
+
+每轮用户消息都会检索偏好（top_k=5）和语义（top_k=3）两个 namespace。
+SDK 每次检索都新建线程池，并按完成顺序拼接结果（顺序不稳定会破坏 Prompt 缓存前缀）。
+
+    - 共享的 memory_retrieval 线程池并发检索各 namespace，结果按配置顺序拼接
+    - 结果按 (actor_id, namespace, 查询指纹) 缓存，短 TTL 内相同查询直接命中
+    - 每个 namespace 一个 span（cache.hit、耗时），命中率见 stats()
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Executor
+from typing import Any
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+
+from costq_agents.utils.executors import BoundedExecutor, get_executor
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+# 缓存键：(actor_id, namespace, 查询指纹)
+RetrievalKey = tuple[str, str, str]
+
+
+def query_fingerprint(query: str, top_k: int, relevance_score: float | None) -> str:
+    """查询指纹（查询文本 + 检索参数）"""
+    raw = f"{top_k}|{relevance_score}|{query.strip()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class RetrievalCache:
+    """有界 LRU + TTL 检索结果缓存（线程安全）
+
+    Attributes:
+        max_entries: 最大条目数
+        ttl_seconds: 条目有效期（秒）
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 120.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """初始化缓存
+
+        Args:
+            max_entries: 最大条目数
+            ttl_seconds: 条目有效期（秒）
+            clock: 单调时钟（测试时可注入）
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[RetrievalKey, tuple[float, list[str]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: RetrievalKey) -> list[str] | None:
+        """读取缓存（过期视为未命中）"""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key: RetrievalKey, items: list[str]) -> None:
+        """写入缓存"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (self._clock(), items)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate_actor(self, actor_id: str) -> None:
+        """清除某个 actor 的全部缓存（长期记忆更新后使用）"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == actor_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """获取缓存统计（含命中率）"""
+        with self._lock:
+            stats: dict[str, Any] = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+def extract_context_items(memories: list[Any], relevance_score: float | None) -> list[str]:
+    """从 retrieve_memories 结果中提取文本（与 SDK 过滤规则一致）"""
+    if relevance_score:
+        memories = [m for m in memories if m.get("score", 0.0) >= relevance_score]
+    items = []
+    for memory in memories:
+        if isinstance(memory, dict):
+            content = memory.get("content", {})
+            if isinstance(content, dict):
+                text = content.get("text", "").strip()
+                if text:
+                    items.append(text)
+    return items
+
+
+class MemoryRetriever:
+    """多 namespace 并发检索器
+
+    Examples:
+        >>> retriever = get_memory_retriever()
+        >>> items = retriever.retrieve(
+        ...     actor_id, query,
+        ...     [(namespace, top_k, relevance_score)],
+        ...     fetch=lambda namespace, top_k: client.retrieve_memories(...),
+        ... )
+    """
+
+    def __init__(self, cache: RetrievalCache, executor: Executor | BoundedExecutor) -> None:
+        """初始化检索器
+
+        Args:
+            cache: 结果缓存
+            executor: 并发检索线程池（独立于调用方所在线程池，避免互相等待）
+        """
+        self.cache = cache
+        self._executor = executor
+
+    def _retrieve_one(
+        self,
+        parent: otel_context.Context,
+        actor_id: str,
+        query: str,
+        namespace: str,
+        top_k: int,
+        relevance_score: float | None,
+        fetch: Callable[[str, int], list[Any]],
+    ) -> list[str]:
+        """检索单个 namespace（先查缓存）"""
+        key = (actor_id, namespace, query_fingerprint(query, top_k, relevance_score))
+        with tracer.start_as_current_span(
+            "costq_agents.memory.retrieve", context=parent
+        ) as span:
+            span.set_attribute("memory.namespace", namespace)
+            span.set_attribute("memory.top_k", top_k)
+            start = time.monotonic()
+            items = self.cache.get(key)
+            span.set_attribute("cache.hit", items is not None)
+            if items is None:
+                items = extract_context_items(fetch(namespace, top_k), relevance_score)
+                self.cache.put(key, items)
+            span.set_attribute("memory.items", len(items))
+            span.set_attribute("memory.latency_ms", round((time.monotonic() - start) * 1000, 1))
+        return items
+
+    def retrieve(
+        self,
+        actor_id: str,
+        query: str,
+        namespaces: list[tuple[str, int, float | None]],
+        fetch: Callable[[str, int], list[Any]],
+    ) -> list[str]:
+        """并发检索所有 namespace，结果按 namespaces 顺序拼接
+
+        Args:
+            actor_id: actor（用户）ID
+            query: 查询文本
+            namespaces: [(已解析的 namespace, top_k, relevance_score)]
+            fetch: 实际检索函数 (namespace, top_k) -> memories
+
+        Returns:
+            list[str]: 上下文文本（单个 namespace 失败时跳过）
+        """
+        parent = otel_context.get_current()
+        futures = [
+            (
+                namespace,
+                self._executor.submit(
+                    self._retrieve_one,
+                    parent,
+                    actor_id,
+                    query,
+                    namespace,
+                    top_k,
+                    relevance_score,
+                    fetch,
+                ),
+            )
+            for namespace, top_k, relevance_score in namespaces
+        ]
+        all_items: list[str] = []
+        for namespace, future in futures:
+            try:
+                all_items.extend(future.result())
+            except Exception as e:
+                logger.error(
+                    "❌ 长期记忆检索失败",
+                    extra={
+                        "namespace": namespace,
+                        "error_type": type(e).__name__,
+                        "error": str(e),
+                    },
+                )
+        return all_items
+
+
+# 全局单例
+_memory_retriever: MemoryRetriever | None = None
+_memory_retriever_lock = threading.Lock()
+
+
+def get_memory_retriever() -> MemoryRetriever:
+    """获取全局长期记忆检索器"""
+    global _memory_retriever
+
+    if _memory_retriever is None:
+        with _memory_retriever_lock:
+            if _memory_retriever is None:
+                from costq_agents.config.settings import settings
+
+                _memory_retriever = MemoryRetriever(
+                    cache=RetrievalCache(
+                        max_entries=settings.MEMORY_RETRIEVAL_CACHE_MAX_ENTRIES,
+                        ttl_seconds=settings.MEMORY_RETRIEVAL_CACHE_TTL_SECONDS,
+                    ),
+                    executor=get_executor(
+                        "memory_retrieval", settings.MEMORY_RETRIEVAL_WORKERS
+                    ),
+                )
+
+    return _memory_retriever
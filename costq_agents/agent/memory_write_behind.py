@@ -0,0 +1,353 @@
+"""AgentCore Memory 写后（write-behind）持久化
+
+FilteredMemorySessionManager.append_message() 原本同步调用 create_event，每条消息
+都在 Agent 事件循环的关键路径上等待一次 Memory API 往返。MemoryWriteBehind 把写入
+移到后台：
+
+    - 调用方只做本地转换（payload、单调时间戳、metadata）后入队，立即返回
+    - 共享线程池中每个会话同一时刻只有一个 drain 任务，按入队顺序发送（会话内有序）
+    - 连续且 metadata 相同的消息合并为一次 create_event（最多 max_batch 条）
+    - 失败按指数退避重试；重试耗尽后该批放回队首，会话暂停发送（stalled），
+      下次入队或 flush 时从该批重新开始。不会越过失败的消息发送后续消息，否则持久化
+      历史中间出现缺口（孤立的 toolUse / toolResult 会导致重新加载的对话被 Bedrock 拒绝）
+    - 尚未发送的消息可以原位替换（guardrail 脱敏：队列中的消息还没有 eventId）
+    - 流结束（flush）和进程退出（atexit）时写完剩余消息
+    - 导出队列深度、flush 次数与耗时
+"""
+
+import atexit
+import json
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from costq_agents.utils.executors import ExecutorSaturatedError, get_executor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingEvent:
+    """待写入的单条消息（已转换为 Memory payload）"""
+
+    payload: list[dict[str, Any]]
+    timestamp: datetime
+    metadata: dict[str, Any] | None
+    enqueued_at: float
+
+
+class _WriteBehindMetrics:
+    """全局写后指标（线程安全）"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "flushed_events": 0,
+            "flushed_messages": 0,
+            "retries": 0,
+            "failed_messages": 0,
+            "flush_seconds_total": 0.0,
+            "flush_seconds_max": 0.0,
+            "queue_wait_seconds_max": 0.0,
+        }
+
+    def add(self, **deltas: float) -> None:
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    def observe_flush(self, seconds: float, queue_wait_seconds: float) -> None:
+        with self._lock:
+            self._stats["flush_seconds_total"] += seconds
+            self._stats["flush_seconds_max"] = max(self._stats["flush_seconds_max"], seconds)
+            self._stats["queue_wait_seconds_max"] = max(
+                self._stats["queue_wait_seconds_max"], queue_wait_seconds
+            )
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._stats)
+
+
+_metrics = _WriteBehindMetrics()
+_writers: "weakref.WeakSet[MemoryWriteBehind]" = weakref.WeakSet()
+
+
+def _submit_to_shared_pool(task: Callable[[], None]) -> Any:
+    """提交 drain 任务到共享的 memory_write 线程池"""
+    from costq_agents.config.settings import settings
+
+    return get_executor("memory_write", settings.MEMORY_WRITE_BEHIND_WORKERS).submit(task)
+
+
+class MemoryWriteBehind:
+    """单个会话的写后队列
+
+    Examples:
+        >>> writer = MemoryWriteBehind(send=send_batch, max_batch=20)
+        >>> writer.submit(pending_event)
+        >>> writer.flush(timeout=5.0)
+    """
+
+    def __init__(
+        self,
+        send: Callable[[list[PendingEvent]], Any],
+        max_batch: int = 20,
+        linger_seconds: float = 0.2,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.2,
+        submit_task: Callable[[Callable[[], None]], Any] | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """初始化写后队列
+
+        Args:
+            send: 发送一批消息（一次 create_event），失败时抛异常
+            max_batch: 单次 create_event 的最大消息数
+            linger_seconds: 首条消息入队后等待凑批的时间（flush 请求会提前结束等待）
+            max_retries: 失败重试次数
+            backoff_seconds: 首次重试退避（秒），之后指数增长并加抖动
+            submit_task: 提交 drain 任务的函数（默认共享线程池，测试时可注入）
+            sleep: 退避等待函数（测试时可注入）
+        """
+        self._send = send
+        self.max_batch = max_batch
+        self.linger_seconds = linger_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._submit_task = submit_task or _submit_to_shared_pool
+        self._sleep = sleep
+        self._pending: deque[PendingEvent] = deque()
+        self._lock = threading.Lock()
+        self._draining = False
+        # 队首批次重试耗尽，暂停发送直到下次入队或 flush
+        self._stalled = False
+        self._flush_requested = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        _writers.add(self)
+
+    def submit(self, event: PendingEvent) -> None:
+        """入队（不阻塞），必要时调度 drain 任务"""
+        with self._lock:
+            self._pending.append(event)
+            self._idle.clear()
+        _metrics.add(enqueued=1)
+        self._schedule_drain()
+
+    def _schedule_drain(self) -> None:
+        """有待写消息且没有 drain 任务时调度一个"""
+        with self._lock:
+            if self._draining or not self._pending:
+                return
+            self._draining = True
+            self._idle.clear()
+        try:
+            self._submit_task(self._drain)
+        except ExecutorSaturatedError:
+            # 线程池已满：退化为同步写入，保证消息不滞留
+            logger.warning("⚠️ Memory 写入线程池已满，同步写入", extra={"depth": self.depth()})
+            self.request_flush()
+            self._drain()
+
+    def replace_latest(self, role: str, payload: list[dict[str, Any]]) -> bool:
+        """替换队列中最近一条指定角色消息的 payload（时间戳和 metadata 不变）
+
+        与 SDK 批量缓冲的 _update_buffered_message 一致按角色匹配最近一条。
+
+        Args:
+            role: 消息角色（user / assistant）
+            payload: 新的 payload 条目
+
+        Returns:
+            bool: 是否找到并替换（已被 drain 取走发送的消息无法替换）
+        """
+        with self._lock:
+            for event in reversed(self._pending):
+                if payload_role(event.payload) == role:
+                    event.payload = payload
+                    return True
+        return False
+
+    def request_flush(self) -> None:
+        """结束凑批等待，尽快发送（不阻塞）"""
+        self._flush_requested.set()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """等待已入队消息全部写完
+
+        Args:
+            timeout: 最长等待时间（秒），None=一直等待
+
+        Returns:
+            bool: 是否在超时前写完（会话暂停发送时返回 False）
+        """
+        self.request_flush()
+        # 暂停的会话：从失败的队首批次重新尝试
+        self._schedule_drain()
+        return self._idle.wait(timeout) and not self.stalled
+
+    def depth(self) -> int:
+        """当前未写入的消息数"""
+        with self._lock:
+            return len(self._pending)
+
+    @property
+    def stalled(self) -> bool:
+        """队首批次重试耗尽、会话暂停发送（持久化历史落后于内存中的对话）"""
+        with self._lock:
+            return self._stalled
+
+    def _next_batch(self) -> list[PendingEvent]:
+        """取出队首连续、metadata 相同的最多 max_batch 条消息"""
+        with self._lock:
+            if not self._pending:
+                self._draining = False
+                self._flush_requested.clear()
+                self._idle.set()
+                return []
+            batch = [self._pending.popleft()]
+            while (
+                self._pending
+                and len(batch) < self.max_batch
+                and self._pending[0].metadata == batch[0].metadata
+            ):
+                batch.append(self._pending.popleft())
+            return batch
+
+    def _drain(self) -> None:
+        """发送队列中的全部消息（同一会话同一时刻只有一个 drain）"""
+        if self.linger_seconds > 0:
+            self._flush_requested.wait(self.linger_seconds)
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            if self._send_with_retry(batch):
+                with self._lock:
+                    self._stalled = False
+                continue
+            # 放回队首并暂停：后续消息不能越过缺口发送
+            with self._lock:
+                self._pending.extendleft(reversed(batch))
+                self._stalled = True
+                self._draining = False
+                self._flush_requested.clear()
+                self._idle.set()
+            return
+
+    def _send_with_retry(self, batch: list[PendingEvent]) -> bool:
+        """发送一批，失败时指数退避重试
+
+        Returns:
+            bool: 是否发送成功（False=重试耗尽）
+        """
+        queue_wait = time.monotonic() - batch[0].enqueued_at
+        for attempt in range(self.max_retries + 1):
+            start = time.monotonic()
+            try:
+                self._send(batch)
+            except Exception as e:
+                if attempt < self.max_retries:
+                    _metrics.add(retries=1)
+                    delay = self.backoff_seconds * (2**attempt) * (1 + random.random() * 0.5)
+                    logger.warning(
+                        "⚠️ Memory 写入失败，退避重试",
+                        extra={
+                            "attempt": attempt + 1,
+                            "delay_seconds": round(delay, 3),
+                            "messages": len(batch),
+                            "error_type": type(e).__name__,
+                            "error": str(e),
+                        },
+                    )
+                    self._sleep(delay)
+                    continue
+                _metrics.add(failed_messages=len(batch))
+                logger.error(
+                    "❌ Memory 写入重试耗尽，本批放回队首，暂停该会话写入",
+                    extra={
+                        "messages": len(batch),
+                        "depth": self.depth() + len(batch),
+                        "error_type": type(e).__name__,
+                        "error": str(e),
+                    },
+                )
+                return False
+            duration = time.monotonic() - start
+            _metrics.add(flushed_events=1, flushed_messages=len(batch))
+            _metrics.observe_flush(duration, queue_wait)
+            logger.debug(
+                "Memory 批量写入完成",
+                extra={"messages": len(batch), "duration_seconds": round(duration, 3)},
+            )
+            return True
+        return False
+
+
+def build_payload(messages: list[Any], is_blob: bool) -> list[dict[str, Any]]:
+    """把转换器输出转为 create_event payload（与 SDK 批量写入格式一致）
+
+    Args:
+        messages: converter.message_to_payload() 的返回值
+        is_blob: 是否超出 conversational 限制（以 blob 写入）
+
+    Returns:
+        list[dict]: payload 条目
+    """
+    if is_blob:
+        return [{"blob": json.dumps(message)} for message in messages]
+    return [
+        {"conversational": {"content": {"text": text}, "role": role.upper()}}
+        for text, role in messages
+    ]
+
+
+def payload_role(payload: list[dict[str, Any]]) -> str | None:
+    """读取 build_payload() 输出中的消息角色（小写）"""
+    if not payload:
+        return None
+    entry = payload[0]
+    if "conversational" in entry:
+        return entry["conversational"]["role"].lower()
+    return json.loads(entry["blob"])[1]
+
+
+def get_write_behind_stats() -> dict[str, Any]:
+    """获取写后指标（含当前总队列深度、活跃会话数和暂停发送的会话数）"""
+    writers = list(_writers)
+    stats: dict[str, Any] = _metrics.snapshot()
+    stats["queue_depth"] = sum(writer.depth() for writer in writers)
+    stats["writers"] = len(writers)
+    stats["stalled_writers"] = sum(writer.stalled for writer in writers)
+    return stats
+
+
+def flush_all(timeout: float = 10.0) -> bool:
+    """写完所有会话的剩余消息（进程退出时调用）
+
+    Args:
+        timeout: 总等待时间（秒）
+
+    Returns:
+        bool: 是否全部写完
+    """
+    deadline = time.monotonic() + timeout
+    done = True
+    for writer in list(_writers):
+        remaining = max(0.0, deadline - time.monotonic())
+        done = writer.flush(remaining) and done
+    if not done:
+        logger.warning("⚠️ 退出时仍有 Memory 消息未写入", extra=get_write_behind_stats())
+    return done
+
+
+atexit.register(flush_all)
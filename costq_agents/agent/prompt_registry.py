@@ -0,0 +1,366 @@
+"""Bedrock Prompt 注册表 - 进程内版本化缓存
+
+按 (prompt_id, version) 缓存 Bedrock Prompt Management 的提示词文本，
+避免每次请求都调用 bedrock-agent:GetPrompt。
+
+缓存策略：
+    1. TTL 内：直接返回缓存（命中）
+    2. TTL 过期但未超过最大陈旧时间：返回旧值，同时后台刷新（stale-while-revalidate）
+    3. 超过最大陈旧时间或从未加载：同步加载（未命中）；同一 key 的并发未命中
+       （预热线程与请求、并发请求）只调用一次 GetPrompt，其余等待同一结果
+    4. 后台刷新失败：保留旧值，下次访问再重试
+
+事件循环上使用 aget() / aget_version()：命中直接返回，未命中经 run_blocking("aws", ...)
+在线程池中加载。
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from costq_agents.utils.executors import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+def parse_prompt_arn(prompt_arn: str) -> tuple[str, str]:
+    """解析 Prompt ARN，返回 (prompt_id, version)
+
+    Args:
+        prompt_arn: Prompt ARN（例如：arn:aws:bedrock:...:prompt/xxx:1）
+
+    Returns:
+        tuple[str, str]: (prompt_id, version)
+
+    Raises:
+        ValueError: ARN 为空或格式无效
+    """
+    if not prompt_arn:
+        raise ValueError("prompt_arn不能为空")
+
+    parts = prompt_arn.split(":")
+    if len(parts) < 7:
+        raise ValueError(f"无效的 Prompt ARN 格式: {prompt_arn}")
+
+    return parts[-2].split("/")[-1], parts[-1]
+
+
+@dataclass
+class _PromptEntry:
+    """缓存条目"""
+
+    text: str
+    content_hash: str
+    loaded_at: float
+
+
+class PromptRegistry:
+    """Bedrock Prompt 注册表（进程级缓存）
+
+    Attributes:
+        ttl_seconds: 缓存新鲜期（秒），期内直接命中
+        max_stale_seconds: 最大陈旧期（秒），超过后必须同步加载
+
+    Examples:
+        >>> registry = PromptRegistry(loader=AgentManager.load_bedrock_prompt)
+        >>> registry.warm_up([settings.DIALOG_AWS_PROMPT_ARN])
+        >>> prompt = registry.get(settings.DIALOG_AWS_PROMPT_ARN)
+        >>> registry.stats()
+        {'hits': 1, 'misses': 0, ...}
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], str],
+        ttl_seconds: float = 3600.0,
+        max_stale_seconds: float = 86400.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """初始化注册表
+
+        Args:
+            loader: 加载函数，接收 Prompt ARN 返回提示词文本
+            ttl_seconds: 缓存新鲜期（秒）
+            max_stale_seconds: 最大陈旧期（秒），必须不小于 ttl_seconds
+            clock: 单调时钟（测试时可注入）
+        """
+        self._loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max(max_stale_seconds, ttl_seconds)
+        self._clock = clock
+
+        self._entries: dict[tuple[str, str], _PromptEntry] = {}
+        self._lock = threading.Lock()
+        # 正在后台刷新的 key（每个 key 最多一个刷新线程）
+        self._refreshing: set[tuple[str, str]] = set()
+        # 正在同步加载的 key（未命中单飞：后到者等待同一个 Future）
+        self._inflight: dict[tuple[str, str], Future] = {}
+
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._refreshes = 0
+        self._refresh_failures = 0
+
+    def get(self, prompt_arn: str) -> str:
+        """获取提示词文本（带缓存）
+
+        Args:
+            prompt_arn: Prompt ARN
+
+        Returns:
+            str: 提示词文本
+
+        Raises:
+            ValueError: ARN 无效，或首次加载失败
+        """
+        key = parse_prompt_arn(prompt_arn)
+        text = self._lookup(key, prompt_arn)
+        if text is not None:
+            return text
+        return self._load_once(key, prompt_arn).text
+
+    async def aget(self, prompt_arn: str) -> str:
+        """获取提示词文本（事件循环版本，未命中时在 "aws" 线程池中加载）
+
+        Args:
+            prompt_arn: Prompt ARN
+
+        Returns:
+            str: 提示词文本
+
+        Raises:
+            ValueError: ARN 无效，或首次加载失败
+        """
+        key = parse_prompt_arn(prompt_arn)
+        text = self._lookup(key, prompt_arn)
+        if text is not None:
+            return text
+        entry = await run_blocking("aws", self._load_once, key, prompt_arn)
+        return entry.text
+
+    def get_version(self, prompt_arn: str) -> str:
+        """获取提示词版本标识（ARN 版本号 + 内容哈希）
+
+        用于需要感知提示词变化的缓存键（例如 Agent 缓存）。
+
+        Args:
+            prompt_arn: Prompt ARN
+
+        Returns:
+            str: 版本标识，格式 "{version}:{content_hash}"
+        """
+        key = parse_prompt_arn(prompt_arn)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            self.get(prompt_arn)
+            with self._lock:
+                entry = self._entries[key]
+        return f"{key[1]}:{entry.content_hash}"
+
+    async def aget_version(self, prompt_arn: str) -> str:
+        """获取提示词版本标识（事件循环版本，见 get_version）"""
+        key = parse_prompt_arn(prompt_arn)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            await self.aget(prompt_arn)
+            with self._lock:
+                entry = self._entries[key]
+        return f"{key[1]}:{entry.content_hash}"
+
+    def warm_up(self, prompt_arns: Iterable[str], block: bool = False) -> None:
+        """预热缓存（容器启动时调用）
+
+        Args:
+            prompt_arns: 需要预热的 Prompt ARN 列表（空值自动跳过）
+            block: 是否阻塞等待预热完成（默认在后台线程执行）
+        """
+        arns = [arn for arn in prompt_arns if arn]
+        if not arns:
+            return
+
+        def _warm() -> None:
+            start = time.time()
+            loaded = 0
+            for arn in arns:
+                try:
+                    self.get(arn)
+                    loaded += 1
+                except Exception as e:
+                    logger.warning(
+                        "⚠️ Prompt 预热失败",
+                        extra={"prompt_arn": arn, "error": str(e)},
+                    )
+            logger.info(
+                "✅ Prompt 缓存预热完成",
+                extra={
+                    "loaded": loaded,
+                    "requested": len(arns),
+                    "duration_seconds": round(time.time() - start, 3),
+                },
+            )
+
+        if block:
+            _warm()
+        else:
+            threading.Thread(target=_warm, name="prompt-warm-up", daemon=True).start()
+
+    def invalidate(self, prompt_arn: str | None = None) -> None:
+        """清除缓存
+
+        Args:
+            prompt_arn: 指定 ARN（None=清除全部）
+        """
+        with self._lock:
+            if prompt_arn is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(parse_prompt_arn(prompt_arn), None)
+
+    def stats(self) -> dict[str, int]:
+        """获取缓存统计
+
+        Returns:
+            dict: hits / stale_hits / misses / refreshes / refresh_failures / size
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "stale_hits": self._stale_hits,
+                "misses": self._misses,
+                "refreshes": self._refreshes,
+                "refresh_failures": self._refresh_failures,
+                "size": len(self._entries),
+            }
+
+    def _lookup(self, key: tuple[str, str], prompt_arn: str) -> str | None:
+        """查找缓存（不阻塞）：新鲜或陈旧时返回文本（陈旧时调度后台刷新），未命中返回 None"""
+        now = self._clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.loaded_at
+                if age < self.ttl_seconds:
+                    self._hits += 1
+                    return entry.text
+                if age < self.max_stale_seconds:
+                    self._stale_hits += 1
+                    schedule_refresh = key not in self._refreshing
+                    if schedule_refresh:
+                        self._refreshing.add(key)
+                else:
+                    entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+
+        if schedule_refresh:
+            threading.Thread(
+                target=self._refresh,
+                args=(key, prompt_arn),
+                name=f"prompt-refresh-{key[0]}",
+                daemon=True,
+            ).start()
+        return entry.text
+
+    def _load_once(self, key: tuple[str, str], prompt_arn: str) -> _PromptEntry:
+        """同步加载（单飞）：同一 key 已在加载时等待其结果，不重复调用 loader"""
+        with self._lock:
+            # 等锁期间其它线程可能已加载完成
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() - entry.loaded_at < self.ttl_seconds:
+                return entry
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            entry = self._load(key, prompt_arn)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(entry)
+            return entry
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _load(self, key: tuple[str, str], prompt_arn: str) -> _PromptEntry:
+        """同步加载并写入缓存"""
+        start = time.time()
+        text = self._loader(prompt_arn)
+        entry = _PromptEntry(
+            text=text,
+            content_hash=hashlib.sha256(text.encode("utf-8")).hexdigest()[:12],
+            loaded_at=self._clock(),
+        )
+        with self._lock:
+            self._entries[key] = entry
+
+        logger.info(
+            "📥 Prompt 已加载到缓存",
+            extra={
+                "prompt_id": key[0],
+                "version": key[1],
+                "text_length": len(text),
+                "duration_seconds": round(time.time() - start, 3),
+            },
+        )
+        return entry
+
+    def _refresh(self, key: tuple[str, str], prompt_arn: str) -> None:
+        """后台刷新（失败时保留旧值）"""
+        try:
+            self._load(key, prompt_arn)
+            with self._lock:
+                self._refreshes += 1
+        except Exception as e:
+            with self._lock:
+                self._refresh_failures += 1
+            logger.warning(
+                "⚠️ Prompt 后台刷新失败，继续使用旧值",
+                extra={"prompt_id": key[0], "version": key[1], "error": str(e)},
+            )
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+# 全局单例
+_prompt_registry: PromptRegistry | None = None
+_prompt_registry_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """获取全局 Prompt 注册表单例
+
+    Returns:
+        PromptRegistry: 注册表实例（加载函数为 AgentManager.load_bedrock_prompt）
+    """
+    global _prompt_registry
+
+    if _prompt_registry is None:
+        with _prompt_registry_lock:
+            if _prompt_registry is None:
+                from costq_agents.agent.manager import AgentManager
+                from costq_agents.config.settings import settings
+
+                _prompt_registry = PromptRegistry(
+                    loader=AgentManager.load_bedrock_prompt,
+                    ttl_seconds=settings.PROMPT_CACHE_TTL_SECONDS,
+                    max_stale_seconds=settings.PROMPT_CACHE_MAX_STALE_SECONDS,
+                )
+
+    return _prompt_registry
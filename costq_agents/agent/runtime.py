@@ -18,6 +18,7 @@ AgentCore Runtime 入口文件
 """
 
 # ========== 标准库导入 ==========
+import asyncio
 import logging
 import os
 import sys
@@ -27,7 +28,6 @@ from pathlib import Path
 from typing import Any
 
 # ========== 第三方库导入 ==========
-from bedrock_agentcore import BedrockAgentCoreApp
 from opentelemetry import baggage, context, trace
 
 # ========== 本地模块导入 ==========
@@ -35,8 +35,21 @@ from opentelemetry import baggage, context, trace
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from costq_agents.agent.manager import AgentManager
-from costq_agents.mcp.mcp_manager import MCPManager
+from costq_agents.agent.event_projector import (  # noqa: E402
+    SSEPassthroughApp,
+    encode_sse,
+    filter_event,
+    project_event,
+)
+from costq_agents.agent.manager import AgentManager, get_bedrock_model_registry_stats  # noqa: E402
+from costq_agents.agent.stream_telemetry import StreamTelemetry  # noqa: E402
+from costq_agents.mcp.mcp_manager import MCPManager  # noqa: E402
+from costq_agents.utils.executors import (  # noqa: E402
+    ExecutorSaturatedError,
+    executor_stats,
+    run_blocking,
+)
+from costq_agents.utils.logging_pipeline import log_event  # noqa: E402
 
 # ========== 全局变量初始化 ==========
 logger = logging.getLogger(__name__)
@@ -121,13 +134,78 @@ def _get_or_create_memory_client():
         return (None, None)
 
 
+def _warm_up_prompts():
+    """容器启动时预热 Prompt 缓存（后台线程，不阻塞启动）"""
+    try:
+        from costq_agents.agent.prompt_registry import get_prompt_registry
+        from costq_agents.config.settings import settings
+
+        get_prompt_registry().warm_up(
+            [
+                settings.DIALOG_AWS_PROMPT_ARN,
+                settings.DIALOG_GCP_PROMPT_ARN,
+                settings.ALERT_PROMPT_ARN,
+            ]
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Prompt 缓存预热启动失败: {e}")
+
+
 _get_or_create_memory_client()
-app = BedrockAgentCoreApp(debug=True)
+_warm_up_prompts()
+app = SSEPassthroughApp(debug=True)
 mcp_manager = None
 agent_manager = None
 
 
-def get_or_create_managers():
+def _get_or_create_connection_pool():
+    """获取或创建本地 MCP worker 连接池（未启用时返回 None）
+
+    Returns:
+        MCPConnectionPool | None: 全局连接池
+    """
+    global mcp_manager
+    from costq_agents.config.settings import settings
+    from costq_agents.mcp.connection_pool import initialize_connection_pool
+
+    if not settings.MCP_POOL_ENABLED or not settings.MCP_POOL_SERVER_TYPES:
+        return None
+    if mcp_manager is None:
+        mcp_manager = MCPManager()
+    return initialize_connection_pool(
+        mcp_manager,
+        server_types=settings.MCP_POOL_SERVER_TYPES,
+        min_size=settings.MCP_POOL_MIN_SIZE,
+        max_size=settings.MCP_POOL_MAX_SIZE,
+        max_uses=settings.MCP_POOL_MAX_USES,
+        max_lifetime_seconds=settings.MCP_POOL_MAX_LIFETIME_SECONDS,
+        acquire_timeout=settings.MCP_POOL_ACQUIRE_TIMEOUT_SECONDS,
+    )
+
+
+async def _release_mcp_lease(mcp_lease) -> None:
+    """归还池化 MCP worker（清除凭证需要逐个 call_tool_sync，在 "mcp" 线程池中执行）"""
+    try:
+        await run_blocking("mcp", mcp_lease.release)
+    except ExecutorSaturatedError:
+        # 线程池已满时仍必须归还，否则 worker 泄漏
+        mcp_lease.release()
+
+
+def _warm_up_mcp_pool():
+    """容器启动时预热 MCP 连接池（后台线程，不阻塞启动）"""
+    try:
+        connection_pool = _get_or_create_connection_pool()
+        if connection_pool is not None:
+            connection_pool.warm_up()
+    except Exception as e:
+        logger.warning(f"⚠️ MCP 连接池预热启动失败: {e}")
+
+
+_warm_up_mcp_pool()
+
+
+async def get_or_create_managers():
     """获取或创建全局管理器
 
     只在第一次调用时创建，后续复用。
@@ -137,165 +215,30 @@ def get_or_create_managers():
         Tuple: (mcp_manager, agent_manager, dialog_system_prompt, alert_system_prompt)
     """
     global mcp_manager, agent_manager
+    from costq_agents.agent.prompt_registry import get_prompt_registry
+    from costq_agents.config.settings import settings
+
+    # ✅ 从进程内缓存读取（TTL 过期后后台刷新；未命中在 "aws" 线程池中加载，不阻塞事件循环）
+    # 每个提示词每次调用只读取一次，首次创建 AgentManager 时复用同一结果
+    prompt_registry = get_prompt_registry()
+    dialog_system_prompt = await prompt_registry.aget(settings.DIALOG_AWS_PROMPT_ARN)
+    alert_system_prompt = await prompt_registry.aget(settings.ALERT_PROMPT_ARN)
+
     if mcp_manager is None:
         logger.info("创建 MCPManager...")
         mcp_manager = MCPManager()
     if agent_manager is None:
         logger.info("创建 AgentManager...")
-        from costq_agents.config.settings import settings
-
-        dialog_system_prompt = AgentManager.load_bedrock_prompt(settings.DIALOG_AWS_PROMPT_ARN)
         logger.info(f"✅ 对话提示词加载完成 - 长度: {len(dialog_system_prompt)} 字符")
-        alert_system_prompt = AgentManager.load_bedrock_prompt(settings.ALERT_PROMPT_ARN)
         logger.info(f"✅ 告警提示词加载完成 - 长度: {len(alert_system_prompt)} 字符")
         agent_manager = AgentManager(
             system_prompt=dialog_system_prompt, model_id=settings.BEDROCK_MODEL_ID
         )
         logger.info("✅ 默认 AgentManager 已创建（对话场景）")
-    from costq_agents.config.settings import settings
-
-    dialog_system_prompt = AgentManager.load_bedrock_prompt(settings.DIALOG_AWS_PROMPT_ARN)
-    alert_system_prompt = AgentManager.load_bedrock_prompt(settings.ALERT_PROMPT_ARN)
+    logger.debug("Prompt 缓存统计", extra=prompt_registry.stats())
     return (mcp_manager, agent_manager, dialog_system_prompt, alert_system_prompt)
 
 
-def log_tool_call(tool_name: str, tool_id: str, tool_input: dict):
-    """记录工具调用的详细信息
-
-    这些日志会被 OpenTelemetry 采集并发送到 CloudWatch
-    使用 logger.info() 的 extra 参数传递结构化数据
-    """
-    import json
-
-    logger.info(
-        f"🔧 TOOL CALL START - {tool_name}",
-        extra={
-            "tool_name": tool_name,
-            "tool_id": tool_id,
-            "tool_input": json.dumps(tool_input, ensure_ascii=False),
-            "event_type": "tool_call_start",
-        },
-    )
-
-
-def log_tool_result(tool_id: str, tool_result: dict, status: str = "success"):
-    """记录工具执行结果
-
-    使用 logger.info() 的 extra 参数传递结构化数据
-    """
-    import json
-
-    result_preview = json.dumps(tool_result, ensure_ascii=False)[:500]
-    logger.info(
-        f"✅ TOOL RESULT - {status}",
-        extra={
-            "tool_id": tool_id,
-            "tool_result": result_preview,
-            "status": status,
-            "event_type": "tool_result",
-        },
-    )
-
-
-def filter_event(event: dict) -> dict:
-    """
-    过滤SSE事件冗余字段，避免触发100MB Runtime限制
-
-    策略：黑名单过滤 - 只移除已知的冗余大字段，保留所有其他字段
-
-    根因：
-    - AWS Bedrock AgentCore Runtime 限制：Maximum payload size = 100 MB
-    - Strands Agent 每个token事件携带完整上下文（~100KB）
-    - 导致约1049个事件后触发限制
-
-    解决：
-    - 移除冗余字段（agent、request_state等，~99KB）
-    - 保留必需字段（event、delta、data等）
-    - 事件大小从 ~100KB 减少到 ~500字节（99.5%减少）
-    - 支持事件数从 1,049 增加到 ~200,000（190倍提升）
-
-    优势：
-    - 安全：不会意外过滤掉未知但重要的小字段
-    - 简单：只需维护"移除列表"
-    - 鲁棒：兼容未来可能新增的字段
-
-    Args:
-        event: 原始Strands事件
-
-    Returns:
-        过滤后的事件（移除了冗余大字段）
-    """
-    remove_fields = {
-        "agent",
-        "request_state",
-        "event_loop_cycle_trace",
-        "event_loop_cycle_span",
-        "model",
-        "messages",
-        "system_prompt",
-        "tool_config",
-        "event_loop_cycle_id",
-    }
-    filtered = {k: v for k, v in event.items() if k not in remove_fields}
-    if not hasattr(filter_event, "_logged_stats"):
-        import json
-
-        try:
-            original_size = len(json.dumps(event, ensure_ascii=False, default=str))
-            filtered_size = len(json.dumps(filtered, ensure_ascii=False, default=str))
-            reduction_ratio = (
-                (1 - filtered_size / original_size) * 100 if original_size > 0 else 0
-            )
-            opt_ratio = round(original_size / filtered_size, 1) if filtered_size else 0
-            logger.info(
-                f"✅ Event filtering initialized - original: {original_size}B, "
-                f"filtered: {filtered_size}B, reduction: {round(reduction_ratio, 2)}%, "
-                f"optimization: {opt_ratio}x"
-            )
-            filter_event._logged_stats = True
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to log filter stats: {e}")
-    return filtered
-
-
-# ========== 文档附件辅助函数 ==========
-
-def _mime_to_document_format(mime_type: str) -> str:
-    """将 MIME 类型映射为 Bedrock Converse API document format
-
-    Bedrock 允许的 format 枚举值: docx, csv, html, txt, pdf, md, doc, xlsx, xls
-
-    Raises:
-        ValueError: 当 mime_type 不在白名单内时抛出，由调用方决定是否跳过该文件
-    """
-    mapping = {
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
-        "application/vnd.ms-excel": "xls",
-        "application/pdf": "pdf",
-        "text/csv": "csv",
-        "text/html": "html",
-        "application/msword": "doc",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
-        "text/markdown": "md",
-        "text/plain": "txt",
-    }
-    result = mapping.get(mime_type)
-    if result is None:
-        raise ValueError(f"不支持的文档 MIME 类型: {mime_type}，Bedrock 支持: {list(mapping.values())}")
-    return result
-
-
-def _sanitize_document_name(file_name: str) -> str:
-    """清洗文件名以符合 Bedrock API 要求：仅 [a-zA-Z0-9_-]，最长 200 字符"""
-    import re
-    name = file_name.rsplit(".", 1)[0] if "." in file_name else file_name
-    name = name.replace(" ", "_")
-    name = re.sub(r'[^a-zA-Z0-9_-]', '', name)
-    if not name:
-        name = "document"
-    return name[:200]
-
-
 @app.entrypoint
 async def invoke(payload: dict[str, Any]):
     """
@@ -353,8 +296,6 @@ async def invoke(payload: dict[str, Any]):
         ...     "model_id": "us.anthropic.claude-3-5-haiku-20241022-v1:0",
         ... }
     """
-    import json
-
     from costq_agents.config.settings import settings
 
     invoke_start_time = time.time()
@@ -431,22 +372,39 @@ async def invoke(payload: dict[str, Any]):
         )
         original_session_id = session_id
         session_renewed = False
-        if session_id and prompt_type == "dialog":
+        check_session = bool(session_id and prompt_type == "dialog")
+
+        # ✅ 账号、组织 External ID、会话年龄一次查询取回（asyncpg，不阻塞事件循环）
+        db_query_start = time.time()
+        logger.info("⏱️ Step 2: 数据库查询开始", extra={"account_id": account_id})
+        resolution = None
+        resolution_error = None
+        try:
+            from costq_agents.database.account_repository import get_account_repository
+
+            resolution = await get_account_repository().resolve(
+                account_id, account_type, session_id=session_id if check_session else None
+            )
+        except Exception as e:
+            resolution_error = e
+        logger.debug(
+            "⏱️ 账号解析查询完成",
+            extra={
+                "duration_seconds": round(time.time() - db_query_start, 3),
+                "session_checked": check_session,
+            },
+        )
+
+        if check_session:
             session_check_start = time.time()
             SESSION_MAX_AGE = 7 * 3600
-            db = None
             try:
-                from sqlalchemy import text
-
-                from costq_agents.database.connection import get_db
-
-                db = next(get_db())
-                sql = text(
-                    "\n                    SELECT\n                        EXTRACT(EPOCH FROM (NOW() - created_at)) as age_seconds\n                    FROM chat_sessions\n                    WHERE id = :session_id\n                "
-                )
-                result = db.execute(sql, {"session_id": session_id}).fetchone()
-                if result:
-                    session_age = result[0]
+                if resolution_error is not None:
+                    raise resolution_error
+                if resolution.session_error is not None:
+                    raise resolution.session_error
+                if resolution.session_found:
+                    session_age = resolution.session_age_seconds or 0.0
                     if session_age > SESSION_MAX_AGE:
                         import uuid
 
@@ -473,28 +431,23 @@ async def invoke(payload: dict[str, Any]):
                     session_id = new_session_id
                     session_renewed = True
             except Exception as e:
-                session_check_duration = time.time() - session_check_start
                 logger.warning(
                     "⏱️ Session过期检测失败，继续使用原session",
                     extra={
                         "error": str(e),
                         "session_id": str(session_id),
-                        "duration_seconds": round(session_check_duration, 3),
+                        "duration_seconds": round(time.time() - db_query_start, 3),
                     },
                 )
             finally:
-                if "session_check_start" in locals():
-                    session_check_duration = time.time() - session_check_start
-                    logger.debug(
-                        "⏱️ Session检测完成",
-                        extra={
-                            "duration_seconds": round(session_check_duration, 3),
-                            "session_renewed": session_renewed,
-                        },
-                    )
-                if db is not None:
-                    db.close()
-                    logger.debug("数据库连接已关闭")
+                session_check_duration = time.time() - session_check_start
+                logger.debug(
+                    "⏱️ Session检测完成",
+                    extra={
+                        "duration_seconds": round(session_check_duration, 3),
+                        "session_renewed": session_renewed,
+                    },
+                )
         root_span.set_attribute("session.id", session_id or "")
         root_span.set_attribute("session.renewed", session_renewed)
         root_span.set_attribute("user.id", user_id or "")
@@ -534,74 +487,23 @@ async def invoke(payload: dict[str, Any]):
                     "event_type": "session_context",
                 },
             )
-        db_query_start = time.time()
-        logger.info("⏱️ Step 2: 数据库查询开始", extra={"account_id": account_id})
-        db = None
         with tracer.start_as_current_span("costq_agents.database.query_account") as db_span:
             db_span.set_attribute("db.operation", "SELECT")
             db_span.set_attribute("account.type", account_type)
             db_span.set_attribute("account.id", account_id)
+            db_span.set_attribute(
+                "db.table", "gcp_accounts" if account_type == "gcp" else "aws_accounts"
+            )
             try:
-                from costq_agents.database.connection import get_db
-
-                logger.info("Database modules imported successfully")
-                db = next(get_db())
-                logger.info("Database session created")
-                from sqlalchemy import text
-
-                if account_type == "gcp":
-                    db_span.set_attribute("db.table", "gcp_accounts")
-                    sql = text(
-                        """
-                        SELECT id, project_id, account_name, credentials_encrypted, org_id
-                        FROM gcp_accounts
-                        WHERE id = :account_id
-                        ORDER BY created_at DESC
-                        LIMIT 1
-                    """
-                    )
-                    logger.debug(
-                        "📊 Using GCP query",
-                        extra={"table": "gcp_accounts", "account_id": account_id},
-                    )
-                else:
-                    db_span.set_attribute("db.table", "aws_accounts")
-                    sql = text(
-                        """
-                        SELECT id, account_id, role_arn, org_id, region, auth_type,
-                               access_key_id, secret_access_key_encrypted
-                        FROM aws_accounts
-                        WHERE id = :account_id
-                        ORDER BY created_at DESC
-                        LIMIT 1
-                    """
-                    )
-                    logger.debug(
-                        "📊 Using AWS query",
-                        extra={"table": "aws_accounts", "account_id": account_id},
-                    )
-                logger.info(
-                    "Executing database query",
-                    extra={"account_id": account_id, "account_type": account_type},
-                )
-                sql_exec_start = time.time()
-                result = db.execute(sql, {"account_id": account_id}).fetchone()
-                sql_exec_duration = time.time() - sql_exec_start
-                logger.debug(
-                    "⏱️ SQL执行完成",
-                    extra={
-                        "duration_seconds": round(sql_exec_duration, 3),
-                        "result_found": bool(result),
-                    },
-                )
-                if not result:
+                if resolution_error is not None:
+                    raise resolution_error
+                if not resolution.account_found:
                     error_msg = f"Account not found: {account_id} (type: {account_type})"
                     logger.error(
                         error_msg,
                         extra={
                             "account_id": account_id,
                             "account_type": account_type,
-                            "sql_query": str(sql),
                             "table": "gcp_accounts" if account_type == "gcp" else "aws_accounts",
                         },
                     )
@@ -611,29 +513,19 @@ async def invoke(payload: dict[str, Any]):
                     yield {"error": error_msg}
                     return
                 db_span.set_attribute("account.found", True)
+                account_uuid = resolution.account_uuid
+                account_id_db = resolution.account_id
+                account_name = resolution.account_name
+                role_arn = resolution.role_arn
+                org_id = resolution.org_id
+                region = resolution.region
+                auth_type = resolution.auth_type
+                access_key_id = resolution.access_key_id
+                secret_key_encrypted = resolution.secret_key_encrypted
                 if account_type == "gcp":
-                    account_uuid = result[0]
-                    project_id = result[1]
-                    account_name = result[2]
-                    credentials_encrypted = result[3]
-                    org_id = result[4]
-                    account_id_db = project_id
-                    role_arn = None
-                    region = None
-                    auth_type = "service_account"
-                    access_key_id = None
-                    secret_key_encrypted = credentials_encrypted
-                    db_span.set_attribute("gcp.project_id", project_id)
+                    db_span.set_attribute("gcp.project_id", account_id_db)
                     db_span.set_attribute("gcp.account_name", account_name)
                 else:
-                    account_uuid = result[0]
-                    account_id_db = result[1]
-                    role_arn = result[2]
-                    org_id = result[3]
-                    region = result[4] or "us-east-1"
-                    auth_type = result[5] or "aksk"
-                    access_key_id = result[6]
-                    secret_key_encrypted = result[7]
                     db_span.set_attribute("auth.type", auth_type)
                     db_span.set_attribute("account.region", region)
                 db_query_duration = time.time() - db_query_start
@@ -686,13 +578,14 @@ async def invoke(payload: dict[str, Any]):
                 root_span.set_status(trace.Status(trace.StatusCode.ERROR, error_msg))
                 yield {"error": error_msg, "error_type": "database_error"}
                 return
-            finally:
-                if db is not None:
-                    db.close()
-                    logger.info("Database session closed")
     logger.info("Step 3: Creating managers (before setting env vars)")
     try:
-        mcp_mgr, agent_mgr, dialog_system_prompt, alert_system_prompt = get_or_create_managers()
+        (
+            mcp_mgr,
+            agent_mgr,
+            dialog_system_prompt,
+            alert_system_prompt,
+        ) = await get_or_create_managers()
         logger.info(
             "Managers created successfully",
             extra={
@@ -754,16 +647,31 @@ async def invoke(payload: dict[str, Any]):
             logger.info("IAMRoleSessionFactory imported")
             if not org_id:
                 raise ValueError("Organization ID is required for IAM Role authentication")
-            user_storage = UserStoragePostgreSQL()
-            external_id = user_storage.get_organization_external_id(str(org_id))
+            # ✅ External ID 已随账号查询一并取回；缺失时走 ORM（按规则生成并持久化，结果缓存）
+            external_id = resolution.org_external_id
+            if not external_id:
+                from costq_agents.services.credential_cache import get_credential_cache
+
+                external_id = await run_blocking(
+                    "db",
+                    get_credential_cache().get_external_id,
+                    str(account_uuid),
+                    str(resolution.org_updated_at),
+                    lambda: UserStoragePostgreSQL().get_organization_external_id(str(org_id)),
+                )
             logger.info("Loaded organization external_id", extra={"external_id": external_id})
             logger.info("Creating IAMRoleSessionFactory instance")
-            target_factory = IAMRoleSessionFactory.get_instance(
-                account_id=account_id, role_arn=role_arn, external_id=external_id, region=region
+            target_factory = await run_blocking(
+                "aws",
+                IAMRoleSessionFactory.get_instance,
+                account_id=account_id,
+                role_arn=role_arn,
+                external_id=external_id,
+                region=region,
             )
             logger.info("IAMRoleSessionFactory instance created")
             logger.info("Getting temporary credentials")
-            target_credentials = target_factory.get_current_credentials()
+            target_credentials = await run_blocking("aws", target_factory.get_current_credentials)
             logger.info(
                 "IAM Role credentials obtained (storing to isolated env dict)",
                 extra={
@@ -811,11 +719,19 @@ async def invoke(payload: dict[str, Any]):
             yield {"error": error_msg}
             return
         try:
+            from costq_agents.services.credential_cache import get_credential_cache
             from costq_agents.services.credential_manager import get_credential_manager
 
             logger.info("Decrypting AKSK credentials")
             credential_manager = get_credential_manager()
-            secret_access_key = credential_manager.decrypt_secret_key(secret_key_encrypted)
+            # ✅ 按账号 UUID + updated_at 缓存解密结果，账号未变更时跳过 Fernet 解密
+            secret_access_key = await run_blocking(
+                "cpu",
+                get_credential_cache().get_secret,
+                str(account_uuid),
+                version=str(resolution.updated_at),
+                loader=lambda: credential_manager.decrypt_secret_key(secret_key_encrypted),
+            )
             logger.info(
                 "AKSK credentials decrypted successfully (storing to isolated env dict)",
                 extra={
@@ -871,6 +787,7 @@ async def invoke(payload: dict[str, Any]):
         extra={"auth_type": auth_type, "duration_seconds": round(credentials_duration, 3)},
     )
     clients_dict = None
+    mcp_lease = None
     with tracer.start_as_current_span("costq_agents.mcp.initialize") as mcp_span:
         try:
             mcp_start_time = time.time()
@@ -893,14 +810,45 @@ async def invoke(payload: dict[str, Any]):
                     "additional_env_count": len(additional_env)
                 },
             )
-            # ✅ 传递隔离的环境变量给 MCP Clients（不污染主进程）
-            clients_dict = mcp_mgr.create_all_clients(
-                server_types=available_mcps,
-                additional_env=additional_env  # ✅ 关键：隔离传递
+            # ✅ 优先从连接池租用预热的 worker（请求凭证注入 worker 进程，主进程不受影响）
+            connection_pool = _get_or_create_connection_pool() if available_mcps else None
+            if connection_pool is not None:
+                mcp_lease = await run_blocking(
+                    "mcp", connection_pool.acquire, available_mcps, additional_env
+                )
+            pooled_types = list(mcp_lease.clients.keys()) if mcp_lease else []
+            remaining_mcps = [st for st in available_mcps if st not in pooled_types]
+            mcp_span.set_attribute("costq_agents.mcp.pooled", len(pooled_types))
+
+            # ✅ 未池化的本地 MCP 与 Gateway MCP 并发启动（各自独立截止时间）
+            gateway_names: list[str] = []
+            if account_type == "aws":
+                if settings.COSTQ_AWS_MCP_SERVERS_GATEWAY_URL:
+                    gateway_names.append("gateway")
+                else:
+                    logger.info("AWS Gateway MCP 未配置（COSTQ_AWS_MCP_SERVERS_GATEWAY_URL 未设置），跳过")
+            elif account_type == "gcp":
+                if settings.COSTQ_GCP_MCP_SERVERS_GATEWAY_URL:
+                    gateway_names.append("gateway-gcp")
+                else:
+                    logger.info("GCP Gateway MCP 未配置（COSTQ_GCP_MCP_SERVERS_GATEWAY_URL 未设置），跳过")
+
+            load_result = await mcp_mgr.load_clients_async(
+                remaining_mcps + gateway_names,
+                additional_env=additional_env,  # ✅ 关键：隔离传递
+                critical=set(settings.MCP_CRITICAL_SERVERS),
+                deadlines=settings.MCP_SERVER_DEADLINES,
+                default_deadline=settings.MCP_DEFAULT_DEADLINE_SECONDS,
+                grace_seconds=settings.MCP_OPTIONAL_GRACE_SECONDS,
             )
+            # 复制一份：转入后台的客户端完成后会从 load_result 中移除并关闭
+            clients_dict = dict(load_result.clients)
             mcp_elapsed = time.time() - mcp_start_time
-            mcp_span.set_attribute("costq_agents.mcp.clients_created", len(clients_dict))
+            mcp_span.set_attribute(
+                "costq_agents.mcp.clients_created", len(clients_dict) + len(pooled_types)
+            )
             mcp_span.set_attribute("costq_agents.mcp.elapsed_seconds", round(mcp_elapsed, 2))
+            mcp_span.set_attribute("costq_agents.mcp.detached", len(load_result.detached))
 
             # ✅ 验证主进程环境变量没有被污染（使用专用验证函数）
             from costq_agents.utils.env_isolation_validator import verify_env_isolation
@@ -918,9 +866,12 @@ async def invoke(payload: dict[str, Any]):
             logger.info(
                 "MCP clients created (env isolation verified)",
                 extra={
-                    "success_count": len(clients_dict),
-                    "requested_count": len(available_mcps),
+                    "success_count": len(clients_dict) + len(pooled_types),
+                    "requested_count": len(available_mcps) + len(gateway_names),
                     "created_types": list(clients_dict.keys()),
+                    "pooled_types": pooled_types,
+                    "failed_types": list(load_result.errors.keys()),
+                    "detached_types": load_result.detached,
                     "elapsed_seconds": round(mcp_elapsed, 2),
                     "env_isolation_verified": isolation_ok,  # ✅ 使用验证函数的结果
                 },
@@ -929,25 +880,15 @@ async def invoke(payload: dict[str, Any]):
             tool_details = {}
 
             # ========== 1. 收集本地 MCP 工具（stdio 模式）==========
-            for server_type, client in clients_dict.items():
-                try:
-                    logger.info(f"Getting tools from {server_type}")
-                    server_tools = client.list_tools_sync()
+            # 池化 worker 的工具列表在启动时已缓存
+            if mcp_lease is not None:
+                for server_type, server_tools in mcp_lease.tools.items():
                     tools.extend(server_tools)
                     tool_details[server_type] = len(server_tools)
-                    logger.info(
-                        f"✅ Tools from {server_type}", extra={"tool_count": len(server_tools)}
-                    )
-                except Exception as e:
-                    logger.error(
-                        f"❌ Failed to load tools from {server_type}",
-                        extra={
-                            "server_type": server_type,
-                            "error_type": type(e).__name__,
-                            "error": str(e),
-                        },
-                    )
-                    tool_details[server_type] = 0
+            for server_type in remaining_mcps:
+                server_tools = load_result.tools.get(server_type, [])
+                tools.extend(server_tools)
+                tool_details[server_type] = len(server_tools)
 
             local_tools_count = len(tools)
             logger.info(
@@ -956,85 +897,23 @@ async def invoke(payload: dict[str, Any]):
             )
 
             # ========== 2. 收集 Gateway MCP 工具（HTTP + SigV4 模式）==========
-            if account_type == "aws":
-                gateway_url = settings.COSTQ_AWS_MCP_SERVERS_GATEWAY_URL
-                if gateway_url:
-                    try:
-                        logger.info(
-                            "Step 6.1: Creating AWS Gateway MCP client (SigV4)",
-                            extra={
-                                "gateway_url": gateway_url[:50] + "..." if len(gateway_url) > 50 else gateway_url,
-                            }
-                        )
-                        gateway_client = mcp_mgr.create_gateway_client(name="gateway-mcp")
-                        gateway_client.__enter__()  # 激活连接
-
-                        # 获取完整工具列表（处理分页）
-                        gateway_tools = mcp_mgr.get_full_tools_list(gateway_client)
-                        tools.extend(gateway_tools)
-                        tool_details["gateway"] = len(gateway_tools)
-
-                        logger.info(
-                            "✅ Gateway MCP tools loaded (dynamically)",
-                            extra={
-                                "gateway_tools_count": len(gateway_tools),
-                            }
-                        )
-
-                        # 注意：gateway_client 需要在 Agent 使用完毕后关闭
-                        # 这里先保存引用，后续在清理阶段处理
-                        clients_dict["gateway"] = gateway_client
-
-                    except Exception as e:
-                        logger.error(
-                            "❌ Failed to load AWS Gateway MCP tools",
-                            extra={
-                                "error_type": type(e).__name__,
-                                "error": str(e),
-                                "gateway_url": gateway_url[:50] + "..." if len(gateway_url) > 50 else gateway_url,
-                            },
-                        )
-                        tool_details["gateway"] = 0
-                else:
-                    logger.info("AWS Gateway MCP 未配置（COSTQ_AWS_MCP_SERVERS_GATEWAY_URL 未设置），跳过")
-            elif account_type == "gcp":
-                gateway_url = settings.COSTQ_GCP_MCP_SERVERS_GATEWAY_URL
-                if gateway_url:
-                    try:
-                        logger.info(
-                            "Step 6.1: Creating GCP Gateway MCP client (SigV4)",
-                            extra={
-                                "gateway_url": gateway_url[:50] + "..." if len(gateway_url) > 50 else gateway_url,
-                            }
-                        )
-                        gateway_client = mcp_mgr.create_gcp_gateway_client(name="gcp-gateway-mcp")
-                        gateway_client.__enter__()
-
-                        gateway_tools = mcp_mgr.get_full_tools_list(gateway_client)
-                        tools.extend(gateway_tools)
-                        tool_details["gateway-gcp"] = len(gateway_tools)
-
-                        logger.info(
-                            "✅ GCP Gateway MCP tools loaded (dynamically)",
-                            extra={
-                                "gateway_tools_count": len(gateway_tools),
-                            }
-                        )
-
-                        clients_dict["gateway-gcp"] = gateway_client
-
-                    except Exception as e:
-                        logger.error(
-                            "❌ Failed to load GCP Gateway MCP tools",
-                            extra={
-                                "error_type": type(e).__name__,
-                                "error": str(e),
-                                "gateway_url": gateway_url[:50] + "..." if len(gateway_url) > 50 else gateway_url,
-                            },
-                        )
-                        tool_details["gateway-gcp"] = 0
+            for gateway_name in gateway_names:
+                gateway_tools = load_result.tools.get(gateway_name, [])
+                tools.extend(gateway_tools)
+                tool_details[gateway_name] = len(gateway_tools)
+                if gateway_name in load_result.errors:
+                    logger.error(
+                        "❌ Failed to load Gateway MCP tools",
+                        extra={
+                            "gateway": gateway_name,
+                            "error": load_result.errors[gateway_name],
+                        },
+                    )
                 else:
-                    logger.info("GCP Gateway MCP 未配置（COSTQ_GCP_MCP_SERVERS_GATEWAY_URL 未设置），跳过")
+                    logger.info(
+                        "✅ Gateway MCP tools loaded (dynamically)",
+                        extra={"gateway": gateway_name, "gateway_tools_count": len(gateway_tools)},
+                    )
 
             mcp_span.set_attribute("costq_agents.mcp.total_tools", len(tools))
             mcp_span.set_attribute("costq_agents.mcp.local_tools", local_tools_count)
@@ -1055,6 +934,8 @@ async def invoke(payload: dict[str, Any]):
             logger.error(traceback.format_exc())
             mcp_span.set_status(trace.Status(trace.StatusCode.ERROR, str(e)))
             root_span.set_status(trace.Status(trace.StatusCode.ERROR, str(e)))
+            if mcp_lease is not None:
+                await _release_mcp_lease(mcp_lease)
             yield {"error": f"Failed to create MCP clients: {str(e)}"}
             return
     # ✅ 不再需要清理环境变量（因为从未污染 os.environ）
@@ -1081,29 +962,35 @@ async def invoke(payload: dict[str, Any]):
         )
         memory_client = None
         memory_id = None
+        agent_cache_key = None
         
         # ✅ 始终使用前端传过来的 model_id 创建 AgentManager
-        dialog_agent_manager = AgentManager(
-            system_prompt=dialog_system_prompt, model_id=model_id
+        # 每个请求只创建一个 AgentManager；BedrockModel 由注册表跨请求、跨提示词类型共享
+        if prompt_type == "alert":
+            request_system_prompt = alert_system_prompt
+        elif prompt_type == "dialog" and account_type == "gcp":
+            from costq_agents.agent.prompt_registry import get_prompt_registry
+
+            request_system_prompt = await get_prompt_registry().aget(
+                settings.DIALOG_GCP_PROMPT_ARN
+            )
+            logger.info(f"✅ GCP 对话提示词加载完成 - 长度: {len(request_system_prompt)} 字符")
+        else:
+            request_system_prompt = dialog_system_prompt
+
+        request_agent_manager = AgentManager(
+            system_prompt=request_system_prompt, model_id=model_id
         )
         logger.info(
             "AgentManager 已创建",
-            extra={"model_id": model_id},
+            extra={"model_id": model_id, "model_registry": get_bedrock_model_registry_stats()},
         )
-        
-        if prompt_type == "dialog" and account_type == "gcp":
-            gcp_prompt = AgentManager.load_bedrock_prompt(settings.DIALOG_GCP_PROMPT_ARN)
-            logger.info(f"✅ GCP 对话提示词加载完成 - 长度: {len(gcp_prompt)} 字符")
-            dialog_agent_manager = AgentManager(
-                system_prompt=gcp_prompt, model_id=model_id
-            )
+
         if prompt_type == "alert":
             logger.info("创建告警 Agent（使用告警提示词，无 Memory）")
-            alert_prompt = AgentManager.load_bedrock_prompt(settings.ALERT_PROMPT_ARN)
-            alert_agent_manager = AgentManager(
-                system_prompt=alert_prompt, model_id=model_id
+            agent = await run_blocking(
+                "cpu", request_agent_manager.create_agent_with_memory, tools=tools
             )
-            agent = alert_agent_manager.create_agent_with_memory(tools=tools)
             logger.info(
                 "Agent 创建完成（告警场景）", extra={"has_memory": False, "tool_count": len(tools)}
             )
@@ -1111,7 +998,6 @@ async def invoke(payload: dict[str, Any]):
             logger.info("创建对话 Agent（尝试Memory模式）")
             agent_created = False
             memory_fallback_reason = None
-            executor = None
             try:
                 memory_init_start = time.time()
                 memory_client, memory_id = _get_or_create_memory_client()
@@ -1123,27 +1009,53 @@ async def invoke(payload: dict[str, Any]):
                         "duration_seconds": round(memory_init_duration, 2),
                     },
                 )
-                import asyncio
-                from concurrent.futures import ThreadPoolExecutor
-
-                executor = ThreadPoolExecutor(max_workers=1)
                 agent_create_start = time.time()
-
-                async def create_with_timeout():
-                    loop = asyncio.get_event_loop()
-                    return await loop.run_in_executor(
-                        executor,
-                        dialog_agent_manager.create_agent_with_memory,
-                        tools,
-                        memory_client,
-                        memory_id,
-                        user_id,
-                        session_id,
-                        40,
+                # ✅ 同一会话的后续轮次：复用缓存的 Agent（跳过历史加载），只重新绑定工具
+                cache_key = None
+                agent = None
+                if settings.AGENT_CACHE_ENABLED and memory_client and session_id and user_id:
+                    from costq_agents.agent.agent_cache import get_agent_cache, tool_catalog_hash
+                    from costq_agents.agent.prompt_registry import get_prompt_registry
+
+                    prompt_arn = (
+                        settings.DIALOG_GCP_PROMPT_ARN
+                        if account_type == "gcp"
+                        else settings.DIALOG_AWS_PROMPT_ARN
                     )
-
-                agent = await asyncio.wait_for(create_with_timeout(), timeout=30.0)
-                if dialog_agent_manager is not agent_mgr:
+                    cache_key = (
+                        str(session_id),
+                        str(user_id),
+                        model_id,
+                        await get_prompt_registry().aget_version(prompt_arn),
+                        tool_catalog_hash(tools),
+                    )
+                    agent = get_agent_cache().checkout(cache_key)
+                if agent is not None:
+                    request_agent_manager.rebind_tools(agent, tools)
+                    logger.info(
+                        "♻️ 复用缓存 Agent（跳过历史加载）",
+                        extra={
+                            "session_id": str(session_id),
+                            "message_count": len(agent.messages),
+                            "agent_cache": get_agent_cache().stats(),
+                        },
+                    )
+                else:
+                    # 共享 memory 线程池：超时只放弃等待，任务在池中跑完，不再遗留孤儿线程
+                    agent = await asyncio.wait_for(
+                        run_blocking(
+                            "memory",
+                            request_agent_manager.create_agent_with_memory,
+                            tools,
+                            memory_client,
+                            memory_id,
+                            user_id,
+                            session_id,
+                            40,
+                        ),
+                        timeout=30.0,
+                    )
+                if request_system_prompt is not dialog_system_prompt:
                     logger.info("✅ 已使用 GCP 对话提示词创建 Agent")
                 agent_create_duration = time.time() - agent_create_start
                 if agent is None:
@@ -1151,6 +1063,7 @@ async def invoke(payload: dict[str, Any]):
                 if not hasattr(agent, "stream_async"):
                     raise ValueError("Agent对象缺少stream_async方法")
                 agent_created = True
+                agent_cache_key = cache_key
                 logger.info(
                     "⏱️ Agent创建完成（对话场景，Memory模式）",
                     extra={
@@ -1177,14 +1090,12 @@ async def invoke(payload: dict[str, Any]):
                         "session_id": str(session_id),
                     },
                 )
-            finally:
-                if executor is not None:
-                    executor.shutdown(wait=False)
-                    logger.debug("ThreadPoolExecutor已关闭")
             if not agent_created:
                 try:
                     logger.info("使用无Memory模式创建Agent（回退）")
-                    agent = dialog_agent_manager.create_agent_with_memory(tools=tools)
+                    agent = await run_blocking(
+                        "cpu", request_agent_manager.create_agent_with_memory, tools=tools
+                    )
                     if agent is None:
                         raise ValueError("Agent创建返回None（无Memory模式）")
                     if not hasattr(agent, "stream_async"):
@@ -1228,23 +1139,30 @@ async def invoke(payload: dict[str, Any]):
 
         logger.error("Agent creation traceback")
         root_span.set_status(trace.Status(trace.StatusCode.ERROR, error_msg))
+        if mcp_lease is not None:
+            await _release_mcp_lease(mcp_lease)
         yield {"error": error_msg}
         return
+    project_events = settings.SSE_EVENT_PROJECTION_ENABLED
+    coalescer = None
+    if project_events and settings.SSE_COALESCE_ENABLED:
+        from costq_agents.agent.stream_coalescer import DeltaCoalescer
+
+        coalescer = DeltaCoalescer(
+            max_bytes=settings.SSE_COALESCE_MAX_BYTES,
+            max_delay_seconds=settings.SSE_COALESCE_MAX_DELAY_MS / 1000,
+        )
     stream_start_time = time.time()
     event_count = 0
+    frame_count = 0
     last_event_time = stream_start_time
+    stream_succeeded = False
 
-    # Token 使用统计（流式结束后发送给前端）
-    token_usage: dict[str, int | float] = {
-        "input_tokens": 0,
-        "output_tokens": 0,
-        "cache_read_tokens": 0,
-        "cache_write_tokens": 0,
-        "input_cache_hit_rate": 0.0,
-        "output_cache_hit_rate": 0.0,
-    }
+    # 工具遥测 + Token 使用统计（流式结束后发送给前端）
+    telemetry = StreamTelemetry(max_queue_size=settings.STREAM_TELEMETRY_QUEUE_SIZE)
 
     with tracer.start_as_current_span("costq_agents.agent.execute") as exec_span:
+        telemetry.start()
         try:
             exec_span.set_attribute("costq_agents.agent.prompt", user_message[:200])
             exec_span.set_attribute(
@@ -1258,6 +1176,12 @@ async def invoke(payload: dict[str, Any]):
                     )
                 },
             )
+            # 历史轮次只保留附件哈希引用，不再每轮重新发送之前上传的图片 / 文档；
+            # 只有本轮用户消息（下方 ingest_attachments 构建）携带字节
+            from costq_agents.agent.attachment_store import dehydrate_history
+
+            agent.messages[:] = dehydrate_history(agent.messages)
+
             # ✅ 构建用户消息（支持多模态：文本 + 图片 + 文档）
             images_data = payload.get("images")
             files_data = payload.get("files")
@@ -1265,52 +1189,20 @@ async def invoke(payload: dict[str, Any]):
             has_files = files_data and len(files_data) > 0
 
             if has_images or has_files:
-                import base64
-                user_content = [{"text": user_message}]
-
-                # 追加图片 content blocks
-                if has_images:
-                    for img in images_data:
-                        try:
-                            mime_type = img.get("mime_type", "image/jpeg")
-                            b64_data = img.get("base64_data", "")
-                            img_bytes = base64.b64decode(b64_data)
-                            user_content.append({
-                                "image": {
-                                    "format": mime_type.split("/")[-1],
-                                    "source": {
-                                        "bytes": img_bytes,
-                                    },
-                                }
-                            })
-                        except Exception as e:
-                            logger.warning(
-                                "⚠️ 图片附件处理失败，跳过该图片",
-                                extra={"file_name": img.get("file_name"), "error": str(e)},
-                            )
-
-                # 追加文档 content blocks（Excel 等）
-                if has_files:
-                    for file_item in files_data:
-                        try:
-                            mime_type = file_item.get("mime_type", "application/octet-stream")
-                            doc_format = _mime_to_document_format(mime_type)
-                            doc_name = _sanitize_document_name(file_item.get("file_name", "document"))
-                            b64_data = file_item.get("base64_data", "")
-                            user_content.append({
-                                "document": {
-                                    "format": doc_format,
-                                    "name": doc_name,
-                                    "source": {
-                                        "bytes": base64.b64decode(b64_data),
-                                    },
-                                }
-                            })
-                        except Exception as e:
-                            logger.warning(
-                                "⚠️ 文档附件处理失败，跳过该文件",
-                                extra={"file_name": file_item.get("file_name"), "error": str(e)},
-                            )
+                from costq_agents.agent.attachment_ingest import ingest_attachments
+
+                # 预算校验 + 分块解码在 cpu 线程池中完成，不阻塞其它并发流
+                ingest = await run_blocking(
+                    "cpu",
+                    ingest_attachments,
+                    images_data if has_images else None,
+                    files_data if has_files else None,
+                    settings.ATTACHMENT_MAX_FILE_BYTES,
+                    settings.ATTACHMENT_MAX_TOTAL_BYTES,
+                    digest_spreadsheets=settings.ATTACHMENT_SPREADSHEET_DIGEST_ENABLED,
+                    digest_max_rows=settings.ATTACHMENT_SPREADSHEET_DIGEST_MAX_ROWS,
+                )
+                user_content = [{"text": user_message}, *ingest.blocks]
 
                 logger.info(
                     "📎 多模态消息构建完成",
@@ -1320,6 +1212,8 @@ async def invoke(payload: dict[str, Any]):
                         "file_count": len(files_data) if has_files else 0,
                         "image_types": [img.get("mime_type") for img in images_data] if has_images else [],
                         "file_types": [f.get("mime_type") for f in files_data] if has_files else [],
+                        "skipped_files": ingest.skipped,
+                        "attachment_stats": ingest.stats,
                     },
                 )
                 stream = agent.stream_async(user_content)
@@ -1331,170 +1225,60 @@ async def invoke(payload: dict[str, Any]):
                 current_time = time.time()
                 event_interval = current_time - last_event_time
                 if event_interval > 5.0:
-                    event_type = "unknown"
+                    stream_event_type = "unknown"
                     if isinstance(event, dict) and "event" in event:
                         event_data = event["event"]
                         if "contentBlockStart" in event_data:
-                            event_type = "tool_start"
+                            stream_event_type = "tool_start"
                         elif "contentBlockDelta" in event_data:
-                            event_type = "text_delta"
-                    logger.warning(
+                            stream_event_type = "text_delta"
+                    log_event(
+                        logger,
+                        logging.WARNING,
                         "⏱️ 长间隔事件检测",
-                        extra={
+                        "long_interval",
+                        lambda: {
                             "interval_seconds": round(event_interval, 2),
-                            "event_type": event_type,
+                            "stream_event_type": stream_event_type,
                             "event_count": event_count,
                             "cumulative_seconds": round(current_time - stream_start_time, 2),
                         },
                     )
                 last_event_time = current_time
                 if isinstance(event, dict):
-                    if "event" in event:
-                        event_data = event["event"]
-                        if "contentBlockStart" in event_data:
-                            start = event_data["contentBlockStart"].get("start", {})
-                            if "toolUse" in start:
-                                tool_use = start["toolUse"]
-                                tool_name = tool_use.get("name")
-                                tool_id = tool_use.get("toolUseId")
-                                tool_span = tracer.start_span(
-                                    f"tool.{tool_name}",
-                                    attributes={
-                                        "tool.name": tool_name,
-                                        "tool.id": tool_id,
-                                        "tool.input": json.dumps(tool_use.get("input", {}))[:500],
-                                    },
-                                )
-                                if not hasattr(exec_span, "_tool_spans"):
-                                    exec_span._tool_spans = {}
-                                exec_span._tool_spans[tool_id] = tool_span
-                                log_tool_call(
-                                    tool_name=tool_name,
-                                    tool_id=tool_id,
-                                    tool_input=tool_use.get("input", {}),
-                                )
-                    if "message" in event:
-                        message = event["message"]
-                        if message.get("role") == "user":
-                            for content in message.get("content", []):
-                                if isinstance(content, dict) and "toolResult" in content:
-                                    tool_result = content["toolResult"]
-                                    tool_id = tool_result.get("toolUseId")
-                                    result_data = {}
-                                    for item in tool_result.get("content", []):
-                                        if isinstance(item, dict):
-                                            if "json" in item:
-                                                try:
-                                                    result_data = (
-                                                        item["json"]
-                                                        if isinstance(item["json"], dict)
-                                                        else json.loads(item["json"])
-                                                    )
-                                                except (json.JSONDecodeError, TypeError, ValueError):
-                                                    result_data = {"raw": str(item["json"])}
-                                            elif "text" in item:
-                                                result_data = {"text": item["text"]}
-                                    if (
-                                        hasattr(exec_span, "_tool_spans")
-                                        and tool_id in exec_span._tool_spans
-                                    ):
-                                        tool_span = exec_span._tool_spans[tool_id]
-                                        tool_span.set_attribute(
-                                            "tool.status", tool_result.get("status", "success")
-                                        )
-                                        tool_span.set_attribute(
-                                            "tool.result", json.dumps(result_data)[:500]
-                                        )
-                                        tool_span.end()
-                                        del exec_span._tool_spans[tool_id]
-                                    log_tool_result(
-                                        tool_id=tool_id,
-                                        tool_result=result_data,
-                                        status=tool_result.get("status", "success"),
-                                    )
-
-                    # 提取 Token 使用统计（从 result 事件的 metrics.accumulated_usage 获取）
-                    if "result" in event:
-                        try:
-                            result = event["result"]
-                            if hasattr(result, "metrics") and result.metrics:
-                                metrics = result.metrics
-                                if hasattr(metrics, "accumulated_usage"):
-                                    usage_data = metrics.accumulated_usage
-                                    # Strands SDK 使用驼峰命名
-                                    input_tokens = max(0, usage_data.get("inputTokens", 0))
-                                    output_tokens = max(0, usage_data.get("outputTokens", 0))
-                                    cache_read_tokens = max(
-                                        0, usage_data.get("cacheReadInputTokens", 0)
-                                    )
-                                    cache_write_tokens = max(
-                                        0, usage_data.get("cacheWriteInputTokens", 0)
-                                    )
-
-                                    # 计算缓存命中率
-                                    total_input = input_tokens + cache_read_tokens
-                                    input_cache_hit_rate = (
-                                        (cache_read_tokens / total_input * 100)
-                                        if total_input > 0
-                                        else 0.0
-                                    )
-                                    # 输出缓存（Bedrock 暂不支持，预留）
-                                    cache_read_output = usage_data.get("cacheReadOutputTokens", 0)
-                                    total_output = output_tokens + cache_read_output
-                                    output_cache_hit_rate = (
-                                        (cache_read_output / total_output * 100)
-                                        if total_output > 0
-                                        else 0.0
-                                    )
-
-                                    token_usage.update({
-                                        "input_tokens": input_tokens,
-                                        "output_tokens": output_tokens,
-                                        "cache_read_tokens": cache_read_tokens,
-                                        "cache_write_tokens": cache_write_tokens,
-                                        "input_cache_hit_rate": round(input_cache_hit_rate, 1),
-                                        "output_cache_hit_rate": round(output_cache_hit_rate, 1),
-                                    })
-
-                                    logger.info(
-                                        "Token 统计已提取",
-                                        extra={
-                                            "input": input_tokens,
-                                            "output": output_tokens,
-                                            "cache_read": cache_read_tokens,
-                                            "cache_write": cache_write_tokens,
-                                            "input_cache_hit_rate": f"{input_cache_hit_rate:.1f}%",
-                                        },
-                                    )
-                                else:
-                                    logger.warning("Result.metrics 没有 accumulated_usage 属性")
-                            else:
-                                logger.debug("Result 没有 metrics 属性或 metrics 为空")
-                        except Exception as e:
-                            logger.warning(
-                                "Token 统计提取失败",
-                                extra={"error": str(e), "error_type": type(e).__name__},
+                    # 工具 span / 日志 / Token 统计由旁路 task 处理，这里只入队引用
+                    telemetry.submit(event)
+
+                    if project_events:
+                        # 白名单投影 + 预编码，前端不消费的事件直接丢弃
+                        projected = project_event(event)
+                        if coalescer is not None:
+                            outgoing = (
+                                coalescer.push(projected)
+                                if projected is not None
+                                else coalescer.tick()
                             )
-
-                    logger.debug(
-                        "Yielding Bedrock event (before filter)",
-                        extra={"event_keys": list(event.keys())},
-                    )
-                    filtered_event = filter_event(event)
-                    logger.debug(
-                        "Yielding filtered event",
-                        extra={
-                            "filtered_keys": list(filtered_event.keys()),
-                            "original_count": len(event.keys()),
-                            "filtered_count": len(filtered_event.keys()),
-                        },
-                    )
-                    yield filtered_event
+                        else:
+                            outgoing = [projected] if projected is not None else []
+                        for item in outgoing:
+                            frame_count += 1
+                            yield encode_sse(item)
+                    else:
+                        frame_count += 1
+                        yield filter_event(event)
                 else:
                     logger.debug(
                         "Skipping non-dict event", extra={"event_type": type(event).__name__}
                     )
 
+            if coalescer is not None:
+                for item in coalescer.flush():
+                    frame_count += 1
+                    yield encode_sse(item)
+
+            await telemetry.aclose()
+            token_usage = telemetry.token_usage
+
             # 流式结束后发送 Token 使用统计
             # ✅ 修复：检查所有 token 类型，避免缓存命中率100%时不发送
             total_tokens = (
@@ -1522,6 +1306,7 @@ async def invoke(payload: dict[str, Any]):
                     },
                 )
 
+            stream_succeeded = True
             exec_span.set_status(trace.Status(trace.StatusCode.OK))
             stream_duration = time.time() - stream_start_time
             avg_interval = stream_duration / event_count if event_count > 0 else 0
@@ -1530,7 +1315,11 @@ async def invoke(payload: dict[str, Any]):
                 extra={
                     "total_duration_seconds": round(stream_duration, 2),
                     "event_count": event_count,
+                    "frame_count": frame_count,
                     "avg_interval_seconds": round(avg_interval, 3),
+                    "coalescer": coalescer.stats() if coalescer is not None else None,
+                    "telemetry": telemetry.stats(),
+                    "executors": executor_stats(),
                 },
             )
         except Exception as e:
@@ -1553,6 +1342,47 @@ async def invoke(payload: dict[str, Any]):
             root_span.set_status(trace.Status(trace.StatusCode.ERROR, error_msg))
             yield {"error": str(e), "type": type(e).__name__}
         finally:
+            # 正常结束时已 aclose()；失败或客户端断开时直接停止消费
+            telemetry.cancel()
+
+            # 写后模式：无论成功、失败还是客户端断开，都等待本轮已入队的 Memory 消息写完
+            session_manager = getattr(agent, "_session_manager", None)
+            flushed = True
+            if hasattr(session_manager, "flush_pending"):
+                from costq_agents.agent.memory_write_behind import get_write_behind_stats
+
+                flushed = False
+                try:
+                    flushed = await run_blocking(
+                        "memory",
+                        session_manager.flush_pending,
+                        settings.MEMORY_WRITE_BEHIND_FLUSH_TIMEOUT_SECONDS,
+                    )
+                    logger.info(
+                        "💾 Memory 写后队列已刷新" if flushed else "⚠️ Memory 写后队列未写完",
+                        extra=get_write_behind_stats(),
+                    )
+                except Exception as e:
+                    logger.error(
+                        "❌ Memory 写后队列刷新失败",
+                        extra={"error_type": type(e).__name__, "error": str(e)},
+                    )
+
+            # 本轮成功结束且 Memory 已写完：放回 Agent 缓存，供同一会话的下一轮复用
+            # （写后队列未写完时缓存的 Agent 会领先于持久化历史，丢弃后下一轮从 Memory 重建）
+            if (
+                stream_succeeded
+                and flushed
+                and agent_cache_key is not None
+                and session_manager is not None
+            ):
+                from costq_agents.agent.agent_cache import get_agent_cache
+                from costq_agents.agent.attachment_store import dehydrate_history
+
+                # 缓存期间只保留哈希引用（与持久化历史一致）
+                agent.messages[:] = dehydrate_history(agent.messages)
+                get_agent_cache().checkin(agent_cache_key, agent)
+
             # ✅ GCP 临时凭证文件已废弃（Gateway 模式无需清理）
             if gcp_temp_file:
                 logger.warning(
@@ -1569,6 +1399,9 @@ async def invoke(payload: dict[str, Any]):
                         "Failed to detach OpenTelemetry context",
                         extra={"error": str(e), "error_type": type(e).__name__},
                     )
+            if "mcp_lease" in locals() and mcp_lease is not None:
+                await _release_mcp_lease(mcp_lease)
+                logger.debug("MCP pooled workers released")
             if "clients_dict" in locals() and clients_dict:
                 logger.info("Cleaning up MCP clients", extra={"client_count": len(clients_dict)})
                 for server_type, client in clients_dict.items():
@@ -1620,10 +1453,14 @@ if __name__ == "__main__":
     parser.add_argument("--port", default=8080, type=int, help="Port to bind")
     parser.add_argument("--log-level", default="INFO", help="Log level")
     args = parser.parse_args()
-    logging.basicConfig(
-        level=args.log_level.upper(),
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[logging.StreamHandler(sys.stderr)],
+    from costq_agents.config.settings import settings
+    from costq_agents.utils.logging_pipeline import configure_logging
+
+    configure_logging(
+        level=args.log_level,
+        json_format=settings.LOG_FORMAT == "json",
+        sample_rates=settings.LOG_SAMPLE_RATES,
+        queue_size=settings.LOG_QUEUE_SIZE,
     )
     startup_log = {
         "timestamp": datetime.now().isoformat(),
@@ -0,0 +1,350 @@
+"""CSV / XLSX 附件本地摘要
+
+表格附件以前作为完整 document 发送给 Bedrock，模型为每一行支付输入 Token 和延迟；
+大型成本导出（CUR、账单明细）动辄数万行。digest_spreadsheet() 在本地流式读取表格，
+生成紧凑的结构化摘要代替原文件：
+
+    - CSV 使用 csv 模块逐行读取；XLSX 使用 zipfile + iterparse 逐行读取
+      （不加载整个工作表，不依赖 openpyxl / pandas）
+    - 前 SAMPLE_ROWS 行推断列类型与主指标列（列名含 cost / amount / 费用 等，
+      否则取绝对值总和最大的数值列）
+    - 单遍聚合：数值列 sum / min / max / mean，文本列去重计数与高频值，
+      低基数文本列按主指标分组求和，主指标 Top-N 行（堆）
+    - 分组列的不同取值超过 GROUP_MAX_KEYS 后，新取值并入 OTHER_GROUP，内存有界
+    - 超过 max_rows 时截断并标记 truncated
+
+逐行循环是纯 Python（持有 GIL），经 ingest_attachments 在共享的 "cpu" 线程池中运行，
+该池默认只有 4 个 worker，与 Agent 创建共用：大文件会占用一个 worker 直到读完或达到
+max_rows（ATTACHMENT_SPREADSHEET_DIGEST_MAX_ROWS），并发上传多个大表格时其它请求排队。
+"""
+
+import codecs
+import csv
+import heapq
+import io
+import json
+import re
+import zipfile
+from collections import Counter
+from collections.abc import Iterator
+from typing import Any
+from xml.etree.ElementTree import iterparse
+
+# 用于推断列类型与主指标列的样本行数
+SAMPLE_ROWS = 200
+# 文本列去重计数上限（超出后不再记录新值）
+MAX_DISTINCT = 1000
+# 参与分组汇总的文本列：基数上限与列数上限
+GROUP_MAX_CARDINALITY = 200
+GROUP_MAX_COLUMNS = 5
+# 单个分组列累计的不同取值上限（样本之后出现的高基数列），超出的取值并入 OTHER_GROUP
+GROUP_MAX_KEYS = 1000
+OTHER_GROUP = "(other)"
+# 每个分组列 / 高频值 / Top 行的输出条数
+TOP_GROUPS = 10
+TOP_VALUES = 5
+TOP_ROWS = 10
+
+SPREADSHEET_FORMATS = ("csv", "xlsx")
+
+_METRIC_NAME = re.compile(r"cost|amount|charge|spend|price|total|费用|金额|成本", re.IGNORECASE)
+_NUMBER_STRIP = str.maketrans("", "", ",$¥￥€£ ")
+
+_XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def _to_number(value: Any) -> float | None:
+    """解析数值（允许千分位与货币符号），失败返回 None"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return float(value.translate(_NUMBER_STRIP))
+    except ValueError:
+        return None
+
+
+def _iter_csv_rows(data: bytes) -> Iterator[list[str]]:
+    """逐行读取 CSV（utf-8 / utf-8-sig，失败时回退 gbk 与 latin-1）"""
+    for encoding in ("utf-8-sig", "gbk", "latin-1"):
+        try:
+            # 增量解码器：样本末尾被截断的多字节字符不算错误
+            codecs.getincrementaldecoder(encoding)().decode(data[:65536], final=False)
+        except UnicodeDecodeError:
+            continue
+        text = io.TextIOWrapper(io.BytesIO(data), encoding=encoding, errors="replace", newline="")
+        yield from csv.reader(text)
+        return
+
+
+def _column_index(cell_ref: str) -> int:
+    """单元格引用（如 "AB12"）转 0 起始列号"""
+    index = 0
+    for char in cell_ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + (ord(char.upper()) - 64)
+    return index - 1
+
+
+def _first_sheet_path(archive: zipfile.ZipFile) -> str:
+    """解析 workbook.xml 中第一个工作表的路径"""
+    try:
+        with archive.open("xl/workbook.xml") as f:
+            for _, elem in iterparse(f):
+                if elem.tag == f"{_XLSX_NS}sheet":
+                    rel_id = elem.get(f"{_REL_NS}id")
+                    break
+            else:
+                rel_id = None
+        if rel_id:
+            with archive.open("xl/_rels/workbook.xml.rels") as f:
+                for _, elem in iterparse(f):
+                    if elem.tag == f"{_PKG_REL_NS}Relationship" and elem.get("Id") == rel_id:
+                        target = elem.get("Target", "").lstrip("/")
+                        return target if target.startswith("xl/") else f"xl/{target}"
+    except KeyError:
+        pass
+    return "xl/worksheets/sheet1.xml"
+
+
+def _iter_xlsx_rows(data: bytes) -> Iterator[list[Any]]:
+    """逐行读取 XLSX 第一个工作表（共享字符串表一次性加载，工作表流式解析）"""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        shared: list[str] = []
+        if "xl/sharedStrings.xml" in archive.namelist():
+            with archive.open("xl/sharedStrings.xml") as f:
+                for _, elem in iterparse(f):
+                    if elem.tag == f"{_XLSX_NS}si":
+                        shared.append("".join(t.text or "" for t in elem.iter(f"{_XLSX_NS}t")))
+                        elem.clear()
+
+        with archive.open(_first_sheet_path(archive)) as f:
+            sheet_data = None
+            for event, elem in iterparse(f, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == f"{_XLSX_NS}sheetData":
+                        sheet_data = elem
+                    continue
+                if elem.tag != f"{_XLSX_NS}row":
+                    continue
+                row: list[Any] = []
+                for cell in elem.iter(f"{_XLSX_NS}c"):
+                    column = _column_index(cell.get("r", ""))
+                    if column < 0:
+                        column = len(row)
+                    cell_type = cell.get("t")
+                    if cell_type == "inlineStr":
+                        value: Any = "".join(t.text or "" for t in cell.iter(f"{_XLSX_NS}t"))
+                    else:
+                        raw = cell.findtext(f"{_XLSX_NS}v")
+                        if raw is None:
+                            value = None
+                        elif cell_type == "s":
+                            value = shared[int(raw)]
+                        elif cell_type in ("str", "b", "e"):
+                            value = raw
+                        else:
+                            value = _to_number(raw)
+                    row.extend([None] * (column - len(row) + 1))
+                    row[column] = value
+                # 已处理的行从树中移除，内存不随行数增长
+                elem.clear()
+                if sheet_data is not None:
+                    sheet_data.remove(elem)
+                yield row
+
+
+class _ColumnStats:
+    """单列聚合"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.non_null = 0
+        self.numeric = 0
+        self.total = 0.0
+        self.minimum: float | None = None
+        self.maximum: float | None = None
+        self.values: Counter[str] = Counter()
+        self.distinct_overflow = False
+
+    def add(self, value: Any) -> float | None:
+        if value is None or value == "":
+            return None
+        self.non_null += 1
+        number = _to_number(value)
+        if number is not None:
+            self.numeric += 1
+            self.total += number
+            self.minimum = number if self.minimum is None else min(self.minimum, number)
+            self.maximum = number if self.maximum is None else max(self.maximum, number)
+        text = value if isinstance(value, str) else str(value)
+        if text in self.values or len(self.values) < MAX_DISTINCT:
+            self.values[text] += 1
+        else:
+            self.distinct_overflow = True
+        return number
+
+    @property
+    def is_numeric(self) -> bool:
+        return self.non_null > 0 and self.numeric >= 0.9 * self.non_null
+
+    def summary(self) -> dict[str, Any]:
+        if self.is_numeric:
+            return {
+                "name": self.name,
+                "type": "number",
+                "non_null": self.non_null,
+                "sum": round(self.total, 4),
+                "min": self.minimum,
+                "max": self.maximum,
+                "mean": round(self.total / self.numeric, 4) if self.numeric else None,
+            }
+        return {
+            "name": self.name,
+            "type": "text",
+            "non_null": self.non_null,
+            "distinct": f">{MAX_DISTINCT}" if self.distinct_overflow else len(self.values),
+            "top_values": self.values.most_common(TOP_VALUES),
+        }
+
+
+def _pick_metric(header: list[str], columns: list[_ColumnStats]) -> int | None:
+    """选择主指标列：数值列中列名匹配成本类关键字优先，否则取绝对值总和最大者"""
+    numeric = [i for i, column in enumerate(columns) if column.is_numeric]
+    if not numeric:
+        return None
+    named = [i for i in numeric if _METRIC_NAME.search(header[i])]
+    candidates = named or numeric
+    return max(candidates, key=lambda i: abs(columns[i].total))
+
+
+def digest_spreadsheet(
+    data: bytes, doc_format: str, name: str = "", max_rows: int = 1_000_000
+) -> dict[str, Any]:
+    """生成表格摘要
+
+    Args:
+        data: 文件字节
+        doc_format: "csv" 或 "xlsx"
+        name: 文件名（写入摘要）
+        max_rows: 最多读取的数据行数
+
+    Returns:
+        dict: 行数、列统计、主指标分组汇总与 Top 行
+
+    Raises:
+        ValueError: 不支持的格式或表格为空
+        zipfile.BadZipFile: XLSX 文件损坏
+    """
+    if doc_format == "csv":
+        rows = _iter_csv_rows(data)
+    elif doc_format == "xlsx":
+        rows = _iter_xlsx_rows(data)
+    else:
+        raise ValueError(f"不支持的表格格式: {doc_format}")
+
+    header: list[str] | None = None
+    for row in rows:
+        if any(cell not in (None, "") for cell in row):
+            header = [
+                str(cell).strip() if cell not in (None, "") else f"column_{i + 1}"
+                for i, cell in enumerate(row)
+            ]
+            break
+    if header is None:
+        raise ValueError("表格为空")
+
+    width = len(header)
+    columns = [_ColumnStats(column) for column in header]
+    sample: list[list[Any]] = []
+    row_count = 0
+    truncated = False
+
+    def _consume(row: list[Any]) -> list[Any]:
+        row = (row + [None] * width)[:width]
+        for column, value in zip(columns, row, strict=True):
+            column.add(value)
+        return row
+
+    # 阶段 1：样本行推断类型与主指标列
+    for row in rows:
+        if row_count >= max_rows:
+            truncated = True
+            break
+        sample.append(_consume(row))
+        row_count += 1
+        if len(sample) >= SAMPLE_ROWS:
+            break
+
+    metric = _pick_metric(header, columns)
+    group_columns = [
+        i
+        for i, column in enumerate(columns)
+        if i != metric
+        and not column.is_numeric
+        and not column.distinct_overflow
+        and 1 < len(column.values) <= GROUP_MAX_CARDINALITY
+    ][:GROUP_MAX_COLUMNS]
+    groups: dict[int, dict[str, float]] = {i: {} for i in group_columns}
+    top_rows: list[tuple[float, int, list[Any]]] = []
+
+    def _aggregate(index: int, row: list[Any]) -> None:
+        value = _to_number(row[metric])
+        if value is None:
+            return
+        for i in group_columns:
+            key = "" if row[i] is None else str(row[i])
+            totals = groups[i]
+            if key not in totals and len(totals) >= GROUP_MAX_KEYS:
+                key = OTHER_GROUP
+            totals[key] = totals.get(key, 0.0) + value
+        entry = (value, -index, row)
+        if len(top_rows) < TOP_ROWS:
+            heapq.heappush(top_rows, entry)
+        elif entry > top_rows[0]:
+            heapq.heapreplace(top_rows, entry)
+
+    # 阶段 2：单遍聚合（先回放样本，再读取剩余行）
+    if metric is not None:
+        for index, row in enumerate(sample):
+            _aggregate(index, row)
+    if not truncated:
+        for row in rows:
+            if row_count >= max_rows:
+                truncated = True
+                break
+            row = _consume(row)
+            if metric is not None:
+                _aggregate(row_count, row)
+            row_count += 1
+
+    return {
+        "file": name,
+        "format": doc_format,
+        "rows": row_count,
+        "truncated": truncated,
+        "columns": [column.summary() for column in columns],
+        "metric": header[metric] if metric is not None else None,
+        "group_totals": {
+            header[i]: [
+                [key, round(total, 4)]
+                for key, total in sorted(groups[i].items(), key=lambda kv: -abs(kv[1]))[:TOP_GROUPS]
+            ]
+            for i in group_columns
+        },
+        "top_rows": [
+            dict(zip(header, row, strict=True))
+            for _, _, row in sorted(top_rows, key=lambda entry: (-entry[0], -entry[1]))
+        ],
+    }
+
+
+def digest_to_text(digest: dict[str, Any]) -> str:
+    """摘要转为发送给模型的文本块内容"""
+    body = json.dumps(digest, ensure_ascii=False, default=str, separators=(",", ":"))
+    name = str(digest["file"]).replace('"', "'")
+    return f'<spreadsheet_digest name="{name}">{body}</spreadsheet_digest>'
@@ -0,0 +1,143 @@
+"""流式文本增量合并
+
+长回答会产生数千个只含几个字符的 contentBlockDelta 帧，每帧的 SSE / 网络开销远大于
+内容本身，也会消耗 Runtime 的事件数余量。DeltaCoalescer 在 invoke() 的流式循环中
+把连续的文本增量合并为一帧：
+
+    - 缓冲达到字节上限，或首个缓冲增量已等待超过时间窗口 → 输出合并帧
+    - 工具调用开始、message、result 等非文本事件 → 先输出缓冲，再原样输出该事件
+    - contentBlockIndex 变化 → 先输出缓冲
+
+输入为 project_event() 投影后的事件（SSE_COALESCE_ENABLED 需配合事件投影使用）。
+时间窗口在每个原始事件到达时检查（tick），不额外启动定时器。
+"""
+
+import time
+from collections.abc import Callable
+from typing import Any
+
+
+def _text_delta(event: dict) -> tuple[str, Any] | None:
+    """提取纯文本增量，返回 (text, contentBlockIndex)；非文本增量返回 None"""
+    if len(event) != 1:
+        return None
+    stream_event = event.get("event")
+    if not stream_event or "contentBlockDelta" not in stream_event:
+        return None
+    block_delta = stream_event["contentBlockDelta"]
+    delta = block_delta.get("delta", {})
+    text = delta.get("text")
+    if len(delta) != 1 or not isinstance(text, str):
+        return None
+    return text, block_delta.get("contentBlockIndex")
+
+
+class DeltaCoalescer:
+    """合并连续文本增量（单请求实例，非线程安全）
+
+    Attributes:
+        max_bytes: 缓冲文本的 UTF-8 字节上限
+        max_delay_seconds: 首个缓冲增量的最长等待时间（秒）
+
+    Examples:
+        >>> coalescer = DeltaCoalescer(max_bytes=512, max_delay_seconds=0.05)
+        >>> for projected in coalescer.push(project_event(event)):
+        ...     yield encode_sse(projected)
+        >>> for projected in coalescer.flush():
+        ...     yield encode_sse(projected)
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 512,
+        max_delay_seconds: float = 0.05,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """初始化合并器
+
+        Args:
+            max_bytes: 缓冲文本的 UTF-8 字节上限
+            max_delay_seconds: 首个缓冲增量的最长等待时间（秒）
+            clock: 单调时钟（测试时可注入）
+        """
+        self.max_bytes = max_bytes
+        self.max_delay_seconds = max_delay_seconds
+        self._clock = clock
+        self._parts: list[str] = []
+        self._bytes = 0
+        self._index: Any = None
+        self._started_at = 0.0
+        self._stats = {
+            "text_deltas": 0,
+            "frames": 0,
+            "flush_size": 0,
+            "flush_time": 0,
+            "flush_boundary": 0,
+        }
+
+    def push(self, event: dict) -> list[dict]:
+        """输入一个投影后的事件
+
+        Args:
+            event: project_event() 的返回值
+
+        Returns:
+            list[dict]: 需要立即下发的事件（可能为空）
+        """
+        text_delta = _text_delta(event)
+        if text_delta is None:
+            out = self._drain("flush_boundary")
+            out.append(event)
+            self._stats["frames"] += 1
+            return out
+
+        text, index = text_delta
+        self._stats["text_deltas"] += 1
+        out = self._drain("flush_boundary") if self._parts and index != self._index else []
+        if not self._parts:
+            self._index = index
+            self._started_at = self._clock()
+        self._parts.append(text)
+        self._bytes += len(text.encode("utf-8"))
+
+        if self._bytes >= self.max_bytes:
+            out.extend(self._drain("flush_size"))
+        elif self._clock() - self._started_at >= self.max_delay_seconds:
+            out.extend(self._drain("flush_time"))
+        return out
+
+    def tick(self) -> list[dict]:
+        """检查时间窗口（不下发的原始事件到达时调用）
+
+        Returns:
+            list[dict]: 超时的合并帧（可能为空）
+        """
+        if self._parts and self._clock() - self._started_at >= self.max_delay_seconds:
+            return self._drain("flush_time")
+        return []
+
+    def flush(self) -> list[dict]:
+        """输出剩余缓冲（流结束时调用）"""
+        return self._drain("flush_boundary")
+
+    def _drain(self, reason: str) -> list[dict]:
+        """输出缓冲的合并帧并清空"""
+        if not self._parts:
+            return []
+        merged = {
+            "event": {
+                "contentBlockDelta": {
+                    "delta": {"text": "".join(self._parts)},
+                    "contentBlockIndex": self._index,
+                }
+            }
+        }
+        self._parts = []
+        self._bytes = 0
+        self._stats[reason] += 1
+        self._stats["frames"] += 1
+        return [merged]
+
+    def stats(self) -> dict[str, int]:
+        """获取合并统计（文本增量数、输出帧数、各原因的 flush 次数）"""
+        return dict(self._stats)
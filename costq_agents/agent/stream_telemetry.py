@@ -0,0 +1,328 @@
+"""invoke 流式循环的工具遥测（旁路消费）
+
+invoke() 的 async for 循环以前在每个事件上同步完成：开启工具 span、json.dumps 工具
+输入/结果（完整序列化后再截断 500 字符）、写工具日志、提取 Token 统计。这些工作和
+向客户端 yield 抢同一个事件循环时间片。
+
+StreamTelemetry 把它们移出热路径：
+
+    - 循环中只做 key 判断，把需要遥测的事件引用放入有界 asyncio.Queue
+    - 独立 task 消费队列：工具 span、tool call / result 日志、Token 统计
+    - 预览使用 bounded_json_preview()，编码到预览上限即停止，不再编码整个结果
+    - 队列满时丢弃工具事件（计数），result 事件改为就地处理，保证 Token 统计不丢
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any
+
+from opentelemetry import trace
+
+from costq_agents.utils.logging_pipeline import log_event
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+# span 属性 / 工具结果日志的预览长度
+PREVIEW_CHARS = 500
+# 工具输入日志的预览长度（输入通常较小，保留更多上下文）
+TOOL_INPUT_LOG_CHARS = 4000
+
+_preview_encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+
+
+def bounded_json_preview(obj: Any, limit: int = PREVIEW_CHARS) -> str:
+    """编码 JSON 预览，达到 limit 字符即停止
+
+    Args:
+        obj: 待编码对象
+        limit: 预览字符上限
+
+    Returns:
+        str: 最多 limit 个字符的 JSON 文本（超出部分截断）
+
+    Notes:
+        - JSONEncoder.iterencode() 使用纯 Python 的惰性生成器，停止迭代即不再编码剩余部分
+    """
+    parts: list[str] = []
+    size = 0
+    try:
+        for chunk in _preview_encoder.iterencode(obj):
+            parts.append(chunk)
+            size += len(chunk)
+            if size >= limit:
+                break
+    except (TypeError, ValueError) as e:
+        return f"<unserializable: {type(e).__name__}>"
+    return "".join(parts)[:limit]
+
+
+def log_tool_call(tool_name: str, tool_id: str, tool_input: dict):
+    """记录工具调用的详细信息
+
+    这些日志会被 OpenTelemetry 采集并发送到 CloudWatch
+    使用 logger.info() 的 extra 参数传递结构化数据
+    """
+    log_event(
+        logger,
+        logging.INFO,
+        f"🔧 TOOL CALL START - {tool_name}",
+        "tool_call_start",
+        lambda: {
+            "tool_name": tool_name,
+            "tool_id": tool_id,
+            "tool_input": bounded_json_preview(tool_input, TOOL_INPUT_LOG_CHARS),
+        },
+    )
+
+
+def log_tool_result(tool_id: str, tool_result: dict, status: str = "success"):
+    """记录工具执行结果
+
+    使用 logger.info() 的 extra 参数传递结构化数据
+    """
+    log_event(
+        logger,
+        logging.INFO,
+        f"✅ TOOL RESULT - {status}",
+        "tool_result",
+        lambda: {
+            "tool_id": tool_id,
+            "tool_result": bounded_json_preview(tool_result),
+            "status": status,
+        },
+    )
+
+
+def needs_telemetry(event: dict) -> bool:
+    """事件是否需要遥测处理（热路径上只做 key 判断）"""
+    if "message" in event or "result" in event:
+        return True
+    stream_event = event.get("event")
+    return bool(stream_event) and "contentBlockStart" in stream_event
+
+
+def _tool_result_data(tool_result: dict) -> dict:
+    """提取工具结果内容（json / text）"""
+    result_data: Any = {}
+    for item in tool_result.get("content", []):
+        if isinstance(item, dict):
+            if "json" in item:
+                try:
+                    result_data = (
+                        item["json"] if isinstance(item["json"], dict) else json.loads(item["json"])
+                    )
+                except (json.JSONDecodeError, TypeError, ValueError):
+                    result_data = {"raw": str(item["json"])}
+            elif "text" in item:
+                result_data = {"text": item["text"]}
+    return result_data
+
+
+def new_token_usage() -> dict[str, int | float]:
+    """Token 使用统计初始值"""
+    return {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_read_tokens": 0,
+        "cache_write_tokens": 0,
+        "input_cache_hit_rate": 0.0,
+        "output_cache_hit_rate": 0.0,
+    }
+
+
+class StreamTelemetry:
+    """单次 invoke 的工具遥测消费者
+
+    Attributes:
+        token_usage: Token 使用统计（aclose() 后完整）
+
+    Examples:
+        >>> telemetry = StreamTelemetry(max_queue_size=1024)
+        >>> telemetry.start()
+        >>> async for event in stream:
+        ...     telemetry.submit(event)
+        >>> await telemetry.aclose()
+        >>> telemetry.token_usage["input_tokens"]
+    """
+
+    def __init__(self, max_queue_size: int = 1024) -> None:
+        """初始化消费者
+
+        Args:
+            max_queue_size: 队列容量（事件数）
+        """
+        self.token_usage = new_token_usage()
+        self._queue: asyncio.Queue[dict | None] = asyncio.Queue(maxsize=max_queue_size)
+        self._task: asyncio.Task | None = None
+        self._tool_spans: dict[str, Any] = {}
+        self._stats = {"submitted": 0, "processed": 0, "dropped": 0, "inline": 0}
+
+    def start(self) -> None:
+        """启动消费 task（需在 exec span 的上下文中调用，工具 span 以其为父）"""
+        self._task = asyncio.create_task(self._consume(), name="stream-telemetry")
+
+    def submit(self, event: dict) -> None:
+        """提交事件引用（不阻塞）
+
+        Args:
+            event: 原始 Strands 事件
+        """
+        if not needs_telemetry(event):
+            return
+        self._stats["submitted"] += 1
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            if "result" in event:
+                # Token 统计不能丢：就地处理
+                self._stats["inline"] += 1
+                self._process(event)
+                return
+            self._stats["dropped"] += 1
+            if self._stats["dropped"] == 1:
+                logger.warning(
+                    "⚠️ 工具遥测队列已满，丢弃事件", extra={"queue_size": self._queue.maxsize}
+                )
+
+    async def _consume(self) -> None:
+        """消费循环（None 为结束标记）"""
+        while True:
+            event = await self._queue.get()
+            if event is None:
+                return
+            try:
+                self._process(event)
+            except Exception as e:
+                logger.warning(
+                    "工具遥测处理失败",
+                    extra={"error": str(e), "error_type": type(e).__name__},
+                )
+
+    def _process(self, event: dict) -> None:
+        """处理单个事件"""
+        self._stats["processed"] += 1
+        stream_event = event.get("event")
+        if stream_event and "contentBlockStart" in stream_event:
+            start = stream_event["contentBlockStart"].get("start", {})
+            if "toolUse" in start:
+                self._on_tool_start(start["toolUse"])
+
+        message = event.get("message")
+        if message and message.get("role") == "user":
+            for content in message.get("content", []):
+                if isinstance(content, dict) and "toolResult" in content:
+                    self._on_tool_result(content["toolResult"])
+
+        if "result" in event:
+            self._on_result(event["result"])
+
+    def _on_tool_start(self, tool_use: dict) -> None:
+        """开启工具 span 并记录调用"""
+        tool_name = tool_use.get("name")
+        tool_id = tool_use.get("toolUseId")
+        tool_input = tool_use.get("input", {})
+        self._tool_spans[tool_id] = tracer.start_span(
+            f"tool.{tool_name}",
+            attributes={
+                "tool.name": tool_name,
+                "tool.id": tool_id,
+                "tool.input": bounded_json_preview(tool_input),
+            },
+        )
+        log_tool_call(tool_name=tool_name, tool_id=tool_id, tool_input=tool_input)
+
+    def _on_tool_result(self, tool_result: dict) -> None:
+        """结束工具 span 并记录结果"""
+        tool_id = tool_result.get("toolUseId")
+        status = tool_result.get("status", "success")
+        result_data = _tool_result_data(tool_result)
+        tool_span = self._tool_spans.pop(tool_id, None)
+        if tool_span is not None:
+            tool_span.set_attribute("tool.status", status)
+            tool_span.set_attribute("tool.result", bounded_json_preview(result_data))
+            tool_span.end()
+        log_tool_result(tool_id=tool_id, tool_result=result_data, status=status)
+
+    def _on_result(self, result: Any) -> None:
+        """从 result.metrics.accumulated_usage 提取 Token 统计"""
+        try:
+            metrics = getattr(result, "metrics", None)
+            if not metrics:
+                logger.debug("Result 没有 metrics 属性或 metrics 为空")
+                return
+            if not hasattr(metrics, "accumulated_usage"):
+                logger.warning("Result.metrics 没有 accumulated_usage 属性")
+                return
+            usage_data = metrics.accumulated_usage
+            # Strands SDK 使用驼峰命名
+            input_tokens = max(0, usage_data.get("inputTokens", 0))
+            output_tokens = max(0, usage_data.get("outputTokens", 0))
+            cache_read_tokens = max(0, usage_data.get("cacheReadInputTokens", 0))
+            cache_write_tokens = max(0, usage_data.get("cacheWriteInputTokens", 0))
+
+            # 计算缓存命中率
+            total_input = input_tokens + cache_read_tokens
+            input_cache_hit_rate = (
+                (cache_read_tokens / total_input * 100) if total_input > 0 else 0.0
+            )
+            # 输出缓存（Bedrock 暂不支持，预留）
+            cache_read_output = usage_data.get("cacheReadOutputTokens", 0)
+            total_output = output_tokens + cache_read_output
+            output_cache_hit_rate = (
+                (cache_read_output / total_output * 100) if total_output > 0 else 0.0
+            )
+
+            self.token_usage.update(
+                {
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "cache_read_tokens": cache_read_tokens,
+                    "cache_write_tokens": cache_write_tokens,
+                    "input_cache_hit_rate": round(input_cache_hit_rate, 1),
+                    "output_cache_hit_rate": round(output_cache_hit_rate, 1),
+                }
+            )
+            logger.info(
+                "Token 统计已提取",
+                extra={
+                    "input": input_tokens,
+                    "output": output_tokens,
+                    "cache_read": cache_read_tokens,
+                    "cache_write": cache_write_tokens,
+                    "input_cache_hit_rate": f"{input_cache_hit_rate:.1f}%",
+                },
+            )
+        except Exception as e:
+            logger.warning(
+                "Token 统计提取失败",
+                extra={"error": str(e), "error_type": type(e).__name__},
+            )
+
+    async def aclose(self) -> None:
+        """处理完队列中剩余事件后结束消费 task"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._end_open_spans()
+
+    def cancel(self) -> None:
+        """立即停止消费（客户端断开或执行失败时）"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._end_open_spans()
+
+    def _end_open_spans(self) -> None:
+        """结束未收到结果的工具 span"""
+        for tool_span in self._tool_spans.values():
+            tool_span.set_attribute("tool.status", "unfinished")
+            tool_span.end()
+        self._tool_spans.clear()
+
+    def stats(self) -> dict[str, int]:
+        """获取队列统计（提交、处理、丢弃、就地处理次数）"""
+        return dict(self._stats)
@@ -7,9 +7,10 @@ import json
 import logging
 from typing import Any
 
-import boto3
 from botocore.exceptions import ClientError
 
+from costq_agents.utils.aws_client_factory import get_aws_client_factory
+
 logger = logging.getLogger(__name__)
 
 
@@ -39,16 +40,17 @@ class AWSSecretsManager:
         """延迟初始化客户端（支持 IAM Role 和 Profile）"""
         if self._client is None:
             try:
-                # 如果指定了 profile，使用 Session
+                # 客户端按 (region, profile) 在进程内共享
+                factory = get_aws_client_factory()
+                self._client = factory.get_client(
+                    "secretsmanager", region_name=self.region_name, profile_name=self.profile_name
+                )
                 if self.profile_name:
-                    session = boto3.Session(profile_name=self.profile_name)
-                    self._client = session.client("secretsmanager", region_name=self.region_name)
                     logger.info(
                         f"✅ Secrets Manager 客户端初始化成功 - Region: {self.region_name}, Profile: {self.profile_name}"
                     )
                 else:
                     # EC2 上会自动使用 IAM Role
-                    self._client = boto3.client("secretsmanager", region_name=self.region_name)
                     logger.info(
                         f"✅ Secrets Manager 客户端初始化成功 - Region: {self.region_name} (使用默认凭证/IAM Role)"
                     )
@@ -146,6 +148,10 @@ class AWSSecretsManager:
 _secrets_manager: AWSSecretsManager | None = None
 
 
+# 按 (region_name, profile_name) 缓存的实例
+_secrets_managers: dict[tuple[str, str | None], AWSSecretsManager] = {}
+
+
 def get_secrets_manager(
     region_name: str = "ap-northeast-1", profile_name: str | None = None
 ) -> AWSSecretsManager:
@@ -160,7 +166,10 @@ def get_secrets_manager(
         AWSSecretsManager 实例
 
     Note:
-        由于不同环境可能使用不同的 profile，这里不再使用全局单例
+        实例按 (region_name, profile_name) 缓存，不同 profile 互不影响
     """
-    # 每次都创建新实例，以支持不同的 profile
-    return AWSSecretsManager(region_name, profile_name)
+    key = (region_name, profile_name)
+    manager = _secrets_managers.get(key)
+    if manager is None:
+        manager = _secrets_managers.setdefault(key, AWSSecretsManager(region_name, profile_name))
+    return manager
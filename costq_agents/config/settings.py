@@ -35,6 +35,28 @@ class Settings(BaseSettings):
     ENCRYPTION_KEY: str | None = Field(
         default=None, description="Fernet加密密钥，用于加密云账号凭证"
     )
+    CREDENTIAL_CACHE_MAX_ENTRIES: int = Field(
+        default=256, description="解密凭证 / External ID 进程内缓存的最大条目数（LRU淘汰）"
+    )
+    CREDENTIAL_CACHE_TTL_SECONDS: int = Field(
+        default=900, description="解密凭证 / External ID 缓存有效期（秒）"
+    )
+    IAM_ROLE_FACTORY_MAX_INSTANCES: int = Field(
+        default=1000, description="IAMRoleSessionFactory 实例上限（超出后按 LRU 淘汰）"
+    )
+    IAM_ROLE_FACTORY_IDLE_TTL_SECONDS: int = Field(
+        default=7200, description="IAMRoleSessionFactory 实例空闲过期时间（秒）"
+    )
+    IAM_ROLE_REFRESH_MARGIN_SECONDS: int = Field(
+        default=1200,
+        description=(
+            "AssumeRole 凭证提前刷新余量（秒，客户 Role 与 Bedrock 跨账号 Role 共用），"
+            "需大于 botocore 的 15 分钟 advisory 窗口"
+        ),
+    )
+    CREDENTIAL_REFRESH_INTERVAL_SECONDS: int = Field(
+        default=60, description="后台凭证刷新器扫描间隔（秒）"
+    )
 
     # ==================== 数据库配置 ====================
     DATABASE_URL: str | None = Field(default=None, description="数据库连接字符串 (PostgreSQL)")
@@ -76,6 +98,17 @@ class Settings(BaseSettings):
         description="Bedrock AssumeRole 临时凭证有效期（秒），使用 role chaining 时最大 3600 秒",
     )
 
+    # ==================== AWS 客户端配置 ====================
+    AWS_CLIENT_MAX_POOL_CONNECTIONS: int = Field(
+        default=50, description="共享 boto3 客户端的 HTTP 连接池大小"
+    )
+    AWS_CLIENT_MAX_ATTEMPTS: int = Field(default=3, description="共享 boto3 客户端的最大尝试次数")
+    AWS_CLIENT_RETRY_MODE: str = Field(
+        default="standard", description="共享 boto3 客户端的重试模式（standard / adaptive）"
+    )
+    AWS_CLIENT_CONNECT_TIMEOUT: float = Field(default=5.0, description="连接超时（秒）")
+    AWS_CLIENT_READ_TIMEOUT: float = Field(default=60.0, description="读取超时（秒）")
+
     # ==================== Bedrock Prompt Caching 配置 ====================
     BEDROCK_ENABLE_PROMPT_CACHING: bool = Field(
         default=True, description="是否启用 Bedrock Prompt Caching 功能"
@@ -102,6 +135,37 @@ class Settings(BaseSettings):
         description="AWS账号启用的MCP服务器列表（本地 stdio 模式）",
     )
 
+    # MCP 连接池（预热的 stdio worker，跨请求复用）
+    MCP_POOL_ENABLED: bool = Field(default=True, description="是否启用本地 MCP worker 连接池")
+    MCP_POOL_SERVER_TYPES: list[str] = Field(
+        default=["common-tools", "alert", "send-email"],
+        description="进入连接池的 MCP 服务器类型（请求凭证通过控制工具注入，无需重启子进程）",
+    )
+    MCP_POOL_MIN_SIZE: int = Field(default=1, description="每种类型常驻预热 worker 数")
+    MCP_POOL_MAX_SIZE: int = Field(default=4, description="每种类型 worker 上限（含租出中的）")
+    MCP_POOL_MAX_USES: int = Field(default=50, description="单个 worker 最大使用次数，超过后回收")
+    MCP_POOL_MAX_LIFETIME_SECONDS: int = Field(
+        default=3600, description="单个 worker 最大存活时间（秒）"
+    )
+    MCP_POOL_ACQUIRE_TIMEOUT_SECONDS: float = Field(
+        default=5.0, description="获取 worker 超时（秒），超时后回退为临时创建"
+    )
+
+    # MCP 并发加载（load_clients_async）
+    MCP_CRITICAL_SERVERS: list[str] = Field(
+        default=["common-tools", "gateway", "gateway-gcp"],
+        description="关键 MCP 客户端：全部就绪（或失败/超时）后才开始执行 Agent",
+    )
+    MCP_SERVER_DEADLINES: dict[str, float] = Field(
+        default={}, description="单个 MCP 客户端启动截止时间（秒），如 {\"gateway\": 15}"
+    )
+    MCP_DEFAULT_DEADLINE_SECONDS: float = Field(
+        default=20.0, description="MCP 客户端默认启动截止时间（秒）"
+    )
+    MCP_OPTIONAL_GRACE_SECONDS: float = Field(
+        default=2.0, description="关键客户端就绪后，等待非关键客户端的最长时间（秒）"
+    )
+
     # ==================== 云资源配置 ====================
     # AWS Secrets Manager 密钥名称
     # 本地开发时指向 Dev 密钥，生产环境指向 Prod 密钥
@@ -117,6 +181,71 @@ class Settings(BaseSettings):
         default=None,
         description="AgentCore Memory Resource ID（预先在 AWS Console 创建，必须通过环境变量设置）",
     )
+    MEMORY_WRITE_BEHIND_ENABLED: bool = Field(
+        default=True, description="Memory 消息后台批量写入（False=每条消息同步写入）"
+    )
+    MEMORY_WRITE_BEHIND_MAX_BATCH: int = Field(
+        default=20, description="单次 create_event 合并的最大消息数"
+    )
+    MEMORY_WRITE_BEHIND_LINGER_MS: int = Field(
+        default=200, description="首条消息入队后等待凑批的时间（毫秒）"
+    )
+    MEMORY_WRITE_BEHIND_MAX_RETRIES: int = Field(default=3, description="Memory 写入失败重试次数")
+    MEMORY_WRITE_BEHIND_WORKERS: int = Field(default=4, description="Memory 写入线程数")
+    MEMORY_WRITE_BEHIND_FLUSH_TIMEOUT_SECONDS: float = Field(
+        default=10.0, description="流结束时等待 Memory 写完的最长时间（秒）"
+    )
+    MEMORY_RETRIEVAL_CACHE_TTL_SECONDS: float = Field(
+        default=120.0, description="长期记忆检索结果缓存有效期（秒）"
+    )
+    MEMORY_RETRIEVAL_CACHE_MAX_ENTRIES: int = Field(
+        default=1024, description="长期记忆检索结果缓存最大条目数"
+    )
+    MEMORY_RETRIEVAL_WORKERS: int = Field(default=8, description="长期记忆并发检索线程数")
+    MEMORY_HISTORY_MAX_MESSAGES: int = Field(
+        default=40, description="Agent 初始化时加载的短期历史消息数上限（0=加载全部）"
+    )
+    MEMORY_HISTORY_TOKEN_BUDGET: int = Field(
+        default=60000, description="Agent 初始化时加载的短期历史 Token 预算（估算，0=不限制）"
+    )
+    ATTACHMENT_MAX_FILE_BYTES: int = Field(
+        default=10 * 1024 * 1024, description="单个附件解码后的字节上限（超出时跳过该文件）"
+    )
+    ATTACHMENT_MAX_TOTAL_BYTES: int = Field(
+        default=25 * 1024 * 1024, description="单次请求所有附件解码后的字节上限"
+    )
+    ATTACHMENT_SPREADSHEET_DIGEST_ENABLED: bool = Field(
+        default=False,
+        description=(
+            "CSV / XLSX 附件是否在本地生成摘要代替原文件"
+            "（条目 include_original=true 时摘要之后再附上原文件）"
+        ),
+    )
+    ATTACHMENT_SPREADSHEET_DIGEST_MAX_ROWS: int = Field(
+        default=1_000_000, description="表格摘要最多读取的数据行数（超出时截断）"
+    )
+    ATTACHMENT_STORE_MAX_BYTES: int = Field(
+        default=256 * 1024 * 1024, description="附件内容寻址缓存的字节上限（LRU 淘汰）"
+    )
+    AGENT_CACHE_ENABLED: bool = Field(
+        default=True, description="是否缓存对话 Agent（同一会话后续轮次复用内存中的对话状态）"
+    )
+    AGENT_CACHE_MAX_ENTRIES: int = Field(default=32, description="Agent 缓存最大条目数")
+    AGENT_CACHE_MAX_BYTES: int = Field(
+        default=64 * 1024 * 1024, description="缓存 Agent 的消息总体积上限（字节，估算）"
+    )
+    AGENT_CACHE_IDLE_TTL_SECONDS: float = Field(
+        default=900.0, description="缓存 Agent 的空闲有效期（秒）"
+    )
+
+    # ==================== 共享线程池配置 ====================
+    EXECUTOR_POOL_WORKERS: dict[str, int] = Field(
+        default_factory=lambda: {"db": 8, "aws": 16, "memory": 8, "cpu": 4, "mcp": 16},
+        description="各命名线程池的线程数（db / aws / memory / cpu / mcp）",
+    )
+    EXECUTOR_MAX_QUEUE: int = Field(
+        default=256, description="单个线程池的最大排队任务数（0=不限制，超出时拒绝）"
+    )
 
     # AgentCore Runtime 配置
     AGENTCORE_RUNTIME_ARN: str = Field(
@@ -140,6 +269,13 @@ class Settings(BaseSettings):
     BEDROCK_PROMPT_REGION: str = Field(
         default="ap-northeast-1", description="Bedrock Prompt 管理服务区域"
     )
+    PROMPT_CACHE_TTL_SECONDS: int = Field(
+        default=3600, description="Prompt 进程内缓存新鲜期（秒），期内不调用 GetPrompt"
+    )
+    PROMPT_CACHE_MAX_STALE_SECONDS: int = Field(
+        default=86400,
+        description="Prompt 最大陈旧期（秒），期内先返回旧值并后台刷新，超过后同步加载",
+    )
 
     # ==================== Gateway MCP 配置 ====================
     # Gateway MCP URL（远程 MCP Server 端点）
@@ -154,6 +290,12 @@ class Settings(BaseSettings):
         description="GCP Gateway MCP HTTP 端点 URL（如 https://xxx.gateway.bedrock-agentcore.ap-northeast-1.amazonaws.com/mcp）",
     )
 
+    # Gateway 工具目录缓存有效期（秒）
+    GATEWAY_TOOL_CATALOG_TTL_SECONDS: int = Field(
+        default=300,
+        description="Gateway list_tools 结果缓存有效期（秒），期内会话延迟到首次调用工具时建立",
+    )
+
     # Gateway MCP 服务名（用于 SigV4 签名）
     GATEWAY_SERVICE: str = Field(
         default="bedrock-agentcore",
@@ -170,9 +312,31 @@ class Settings(BaseSettings):
     GCP_ACCOUNT_ID: str | None = Field(default=None, description="GCP账号ID（用于成本分析）")
     GCP_PROJECT_ID: str | None = Field(default=None, description="GCP项目ID")
 
+    # ==================== 流式响应配置 ====================
+    SSE_EVENT_PROJECTION_ENABLED: bool = Field(
+        default=True,
+        description="SSE 事件白名单投影 + 预编码（False=回退黑名单 filter_event）",
+    )
+    SSE_COALESCE_ENABLED: bool = Field(
+        default=False, description="合并连续文本增量为单帧（需启用事件投影）"
+    )
+    SSE_COALESCE_MAX_BYTES: int = Field(default=512, description="文本增量合并的字节上限")
+    SSE_COALESCE_MAX_DELAY_MS: int = Field(
+        default=50, description="文本增量合并的时间窗口（毫秒）"
+    )
+    STREAM_TELEMETRY_QUEUE_SIZE: int = Field(
+        default=1024, description="工具遥测旁路队列容量（满时丢弃工具事件）"
+    )
+
     # ==================== 日志配置 ====================
     LOG_LEVEL: str = Field(default="INFO", description="日志级别")
     FASTMCP_LOG_LEVEL: str = Field(default="WARNING", description="MCP框架日志级别")
+    LOG_FORMAT: str = Field(default="json", description="日志格式（json / text）")
+    LOG_QUEUE_SIZE: int = Field(default=10000, description="日志队列容量（满时丢弃）")
+    LOG_SAMPLE_RATES: dict[str, float] = Field(
+        default_factory=dict,
+        description='按 event_type 的日志采样率，如 {"tool_result": 0.2, "long_interval": 0.1}',
+    )
 
     # ==================== 模型配置 ====================
     model_config = SettingsConfigDict(
@@ -1,5 +1,5 @@
 """Database package."""
 
-from costq_agents.database.connection import get_db, get_engine, init_db
+from costq_agents.database.connection import get_async_engine, get_db, get_engine, init_db
 
-__all__ = ["get_db", "get_engine", "init_db"]
+__all__ = ["get_async_engine", "get_db", "get_engine", "init_db"]
@@ -0,0 +1,243 @@
+"""账号解析数据访问层（异步）
+
+invoke() 运行在事件循环中，会话有效期检测（chat_sessions）、账号查询
+（aws_accounts / gcp_accounts）和组织 External ID（organizations）使用
+SQLAlchemy asyncio 引擎 + asyncpg 执行，不再阻塞同一 Runtime 中的其它流式响应。
+
+resolve() 用一条 CTE 语句同时取回账号行、组织 External ID 和会话年龄，
+每个请求只需一次数据库往返。
+"""
+
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from typing import Any
+
+from opentelemetry import trace
+from sqlalchemy import text
+
+from costq_agents.database.connection import get_async_engine
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+# 合并查询：以单行锚点 LEFT JOIN，账号或会话不存在时仍返回一行
+_RESOLVE_SQL_TEMPLATE = """
+    WITH account AS (
+        {account_select}
+        WHERE id = :account_id
+        ORDER BY created_at DESC
+        LIMIT 1
+    ),
+    session AS (
+        SELECT EXTRACT(EPOCH FROM (NOW() - created_at)) AS age_seconds
+        FROM chat_sessions
+        WHERE id = :session_id
+    )
+    SELECT account.*,
+           org.external_id AS org_external_id,
+           org.updated_at AS org_updated_at,
+           (SELECT age_seconds FROM session) AS session_age_seconds,
+           EXISTS (SELECT 1 FROM session) AS session_found
+    FROM (SELECT 1) AS anchor
+    LEFT JOIN account ON TRUE
+    LEFT JOIN organizations AS org ON org.id = account.org_id::text
+"""
+
+AWS_RESOLVE_SQL = text(
+    _RESOLVE_SQL_TEMPLATE.format(
+        account_select="""SELECT id, account_id, role_arn, org_id, region, auth_type,
+               access_key_id, secret_access_key_encrypted, updated_at
+        FROM aws_accounts"""
+    )
+)
+
+GCP_RESOLVE_SQL = text(
+    _RESOLVE_SQL_TEMPLATE.format(
+        account_select="""SELECT id, project_id, account_name, credentials_encrypted, org_id,
+               updated_at
+        FROM gcp_accounts"""
+    )
+)
+
+
+@dataclass(frozen=True)
+class AccountResolution:
+    """invoke 路径的账号解析结果
+
+    Attributes:
+        account_found: 账号是否存在
+        account_uuid: 账号主键
+        account_id: AWS 账号 ID / GCP project_id
+        account_name: GCP 账号名称（AWS 为 None）
+        role_arn: IAM Role ARN（仅 AWS）
+        org_id: 组织 ID
+        region: AWS 区域（默认 us-east-1，GCP 为 None）
+        auth_type: aksk / iam_role / service_account
+        access_key_id: AKSK 的 Access Key（仅 AWS）
+        secret_key_encrypted: 加密的 Secret Key 或 GCP 服务账号 JSON
+        updated_at: 账号最后更新时间（凭证缓存版本）
+        org_external_id: 组织 External ID（组织不存在或未生成时为 None）
+        org_updated_at: 组织最后更新时间（External ID 缓存版本）
+        session_checked: 是否执行了会话检测
+        session_found: 会话是否存在
+        session_age_seconds: 会话创建至今的秒数
+        session_error: 会话检测失败时的异常
+    """
+
+    account_found: bool
+    account_uuid: Any = None
+    account_id: str | None = None
+    account_name: str | None = None
+    role_arn: str | None = None
+    org_id: Any = None
+    region: str | None = None
+    auth_type: str | None = None
+    access_key_id: str | None = None
+    secret_key_encrypted: str | None = None
+    updated_at: Any = None
+    org_external_id: str | None = None
+    org_updated_at: Any = None
+    session_checked: bool = False
+    session_found: bool = False
+    session_age_seconds: float | None = None
+    session_error: BaseException | None = None
+
+    @classmethod
+    def from_row(cls, row: Any, account_type: str, session_checked: bool) -> "AccountResolution":
+        """从合并查询结果行构建
+
+        Args:
+            row: AWS_RESOLVE_SQL / GCP_RESOLVE_SQL 的结果行
+            account_type: "aws" 或 "gcp"
+            session_checked: 是否执行了会话检测
+
+        Returns:
+            AccountResolution: 解析结果
+        """
+        mapping = row._mapping
+        session_age = mapping["session_age_seconds"]
+        session_fields = {
+            "session_checked": session_checked,
+            "session_found": bool(mapping["session_found"]),
+            # EXTRACT 在 PostgreSQL 14+ 返回 numeric（Decimal）
+            "session_age_seconds": float(session_age) if session_age is not None else None,
+        }
+        if mapping["id"] is None:
+            return cls(account_found=False, **session_fields)
+
+        if account_type == "gcp":
+            return cls(
+                account_found=True,
+                account_uuid=mapping["id"],
+                account_id=mapping["project_id"],
+                account_name=mapping["account_name"],
+                org_id=mapping["org_id"],
+                auth_type="service_account",
+                secret_key_encrypted=mapping["credentials_encrypted"],
+                updated_at=mapping["updated_at"],
+                org_external_id=mapping["org_external_id"],
+                org_updated_at=mapping["org_updated_at"],
+                **session_fields,
+            )
+        return cls(
+            account_found=True,
+            account_uuid=mapping["id"],
+            account_id=mapping["account_id"],
+            role_arn=mapping["role_arn"],
+            org_id=mapping["org_id"],
+            region=mapping["region"] or "us-east-1",
+            auth_type=mapping["auth_type"] or "aksk",
+            access_key_id=mapping["access_key_id"],
+            secret_key_encrypted=mapping["secret_access_key_encrypted"],
+            updated_at=mapping["updated_at"],
+            org_external_id=mapping["org_external_id"],
+            org_updated_at=mapping["org_updated_at"],
+            **session_fields,
+        )
+
+
+def account_table(account_type: str) -> str:
+    """账号类型对应的表名"""
+    return "gcp_accounts" if account_type == "gcp" else "aws_accounts"
+
+
+class AsyncAccountRepository:
+    """invoke 路径的异步账号解析
+
+    Examples:
+        >>> repo = get_account_repository()
+        >>> resolution = await repo.resolve(account_id, "aws", session_id=session_id)
+        >>> resolution.account_found, resolution.org_external_id
+    """
+
+    def __init__(self, engine_factory: Callable[[], Any] = get_async_engine) -> None:
+        """初始化仓储
+
+        Args:
+            engine_factory: 返回 AsyncEngine 的工厂（测试时可注入）
+        """
+        self._engine_factory = engine_factory
+
+    async def _fetch_one(self, sql: Any, params: dict[str, Any]) -> Any:
+        """从连接池取连接执行查询并返回第一行"""
+        async with self._engine_factory().connect() as conn:
+            result = await conn.execute(sql, params)
+            return result.fetchone()
+
+    async def resolve(
+        self, account_id: str, account_type: str, session_id: str | None = None
+    ) -> AccountResolution:
+        """单次查询解析账号、组织 External ID 和会话年龄
+
+        Args:
+            account_id: 账号主键
+            account_type: "aws" 或 "gcp"
+            session_id: 需要检测有效期的会话 ID（None=跳过会话检测）
+
+        Returns:
+            AccountResolution: 解析结果（账号不存在时 account_found=False）
+
+        Notes:
+            - 会话 ID 与列类型不匹配（如非法 UUID）会让整条语句失败；此时不带会话重试一次，
+              并把异常记录在 session_error 中，保证会话检测失败不影响账号查询
+        """
+        sql = GCP_RESOLVE_SQL if account_type == "gcp" else AWS_RESOLVE_SQL
+        with tracer.start_as_current_span("costq_agents.database.resolve_account") as span:
+            span.set_attribute("db.table", account_table(account_type))
+            span.set_attribute("session.checked", session_id is not None)
+            session_error = None
+            try:
+                row = await self._fetch_one(
+                    sql, {"account_id": account_id, "session_id": session_id}
+                )
+            except Exception as e:
+                if session_id is None:
+                    raise
+                logger.warning(
+                    "⚠️ 合并查询失败，跳过会话检测重试",
+                    extra={"error_type": type(e).__name__, "error": str(e)},
+                )
+                session_error = e
+                row = await self._fetch_one(sql, {"account_id": account_id, "session_id": None})
+            resolution = AccountResolution.from_row(
+                row, account_type, session_checked=session_id is not None
+            )
+            if session_error is not None:
+                resolution = replace(resolution, session_error=session_error)
+            span.set_attribute("account.found", resolution.account_found)
+        return resolution
+
+
+# 全局单例
+_account_repository: AsyncAccountRepository | None = None
+
+
+def get_account_repository() -> AsyncAccountRepository:
+    """获取全局异步账号仓储"""
+    global _account_repository
+
+    if _account_repository is None:
+        _account_repository = AsyncAccountRepository()
+
+    return _account_repository
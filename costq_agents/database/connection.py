@@ -117,6 +117,80 @@ def get_db():
         db.close()
 
 
+# ==================== 异步引擎（invoke 路径使用） ====================
+
+_async_engine = None
+
+
+def to_async_database_url(database_url: str) -> str:
+    """将同步连接字符串转换为异步驱动连接字符串
+
+    Args:
+        database_url: 同步连接字符串（postgresql:// 或 postgresql+psycopg2://）
+
+    Returns:
+        str: 异步连接字符串（postgresql+asyncpg:// / sqlite+aiosqlite://）
+
+    Notes:
+        - asyncpg 不识别 libpq 的 sslmode 参数，转换为 ssl
+    """
+    from sqlalchemy.engine import make_url
+
+    url = make_url(database_url)
+    if url.drivername in ("postgresql", "postgres", "postgresql+psycopg2"):
+        url = url.set(drivername="postgresql+asyncpg")
+        if "sslmode" in url.query:
+            query = dict(url.query)
+            query["ssl"] = query.pop("sslmode")
+            url = url.set(query=query)
+    elif url.drivername == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url.render_as_string(hide_password=False)
+
+
+def get_async_engine():
+    """获取异步数据库引擎（延迟初始化）
+
+    Returns:
+        AsyncEngine: 基于 asyncpg 的异步引擎
+
+    Notes:
+        - 与同步引擎共用连接字符串，但各自维护连接池
+        - 连接池绑定在首次使用时的事件循环上（Runtime 只有一个事件循环）
+    """
+    global _async_engine
+
+    if _async_engine is not None:
+        return _async_engine
+
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async_url = to_async_database_url(get_database_url())
+    engine_kwargs = {"echo": False, "pool_pre_ping": True}
+    if "sqlite" not in async_url:
+        engine_kwargs.update(
+            {
+                "pool_size": 10,
+                "max_overflow": 20,
+                "pool_timeout": 30,
+                "pool_recycle": 3600,
+            }
+        )
+
+    _async_engine = create_async_engine(async_url, **engine_kwargs)
+    logger.info(f"✅ 异步数据库引擎创建成功 - Environment: {settings.ENVIRONMENT}")
+    return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    """关闭异步引擎及其连接池"""
+    global _async_engine
+
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
 def init_db():
     """初始化数据库（创建所有表）"""
     # 导入所有模型以确保它们被注册
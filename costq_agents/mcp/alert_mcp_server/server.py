@@ -8,6 +8,8 @@ import logging
 logger = logging.getLogger(__name__)
 from mcp.server.fastmcp import FastMCP
 
+from costq_agents.mcp.credential_control import register_credential_control  # noqa: E402
+
 # Import handler functions
 from .handlers.alert_handler import (
     create_alert,
@@ -181,5 +183,8 @@ app.tool("update_alert")(update_alert)
 app.tool("toggle_alert")(toggle_alert)
 app.tool("delete_alert")(delete_alert)
 
+# 池化 worker 的请求凭证控制（非池化启动时不注册）
+register_credential_control(app)
+
 if __name__ == "__main__":
     app.run()
@@ -9,6 +9,8 @@ from typing import Dict
 
 from mcp.server.fastmcp import FastMCP
 
+from costq_agents.mcp.credential_control import register_credential_control
+
 logger = logging.getLogger(__name__)
 
 # Define server instructions
@@ -222,6 +224,9 @@ async def get_today_date() -> Dict[str, str | int]:
 # Main Entry Point
 # ============================================================================
 
+# 池化 worker 的请求凭证控制（非池化启动时不注册）
+register_credential_control(mcp)
+
 if __name__ == "__main__":
     # Run the MCP server
     mcp.run()
\ No newline at end of file
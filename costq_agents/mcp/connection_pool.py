@@ -1,138 +1,568 @@
 """MCP连接池管理器
 
-实现长连接池，避免每次查询都重新启动MCP服务器
-这是业界标准做法，类似于数据库连接池、Redis连接池等
+为每种本地 MCP 服务器（stdio 子进程）维护 N 个预热的 worker，跨 invoke 复用，
+避免每次请求都重新启动 Python 解释器并导入 FastMCP / SQLAlchemy / boto3。
+
+设计要点：
+    1. 每个 worker 同一时刻只租给一个请求（独占租约），请求结束后归还
+    2. 租出前做健康检查（后台线程存活 + 空闲过久时探测 list_tools）
+    3. 使用次数 / 存活时间超过上限时回收并在后台补充新 worker
+    4. 工具列表在 worker 启动时获取并缓存，请求时无需再次 list_tools
+    5. 池内 worker 使用平台级基础环境启动，不携带任何租户凭证；
+       请求凭证在租出时通过控制工具注入，归还时清除（见 credential_control）
 """
 
+import atexit
+import logging
+import threading
 import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Any
 
+from costq_agents.mcp.credential_control import (
+    CONTROL_TOOL_NAME,
+    apply_worker_credentials,
+    build_injected_env,
+)
 
-class MCPConnectionPool:
-    """MCP客户端连接池
-
-    功能：
-    1. 在应用启动时建立所有MCP连接并保持激活
-    2. 查询时直接使用已激活的连接（无需重新启动服务器）
-    3. 定期健康检查，自动重连失效的连接
-    4. 优雅关闭所有连接
-
-    这避免了每次查询都要：
-    - 重新安装MCP包（uvx行为）
-    - 重新启动MCP服务器进程
-    - 重新建立stdio连接
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PooledWorker:
+    """池化的 MCP worker（一个已激活的 MCPClient + 对应子进程）"""
+
+    server_type: str
+    client: Any
+    control_token: str | None = None
+    tools: list = field(default_factory=list)
+    created_at: float = field(default_factory=time.monotonic)
+    last_used_at: float = field(default_factory=time.monotonic)
+    uses: int = 0
+    credentials_injected: bool = False
+
+
+def _visible_tools(client: Any) -> list:
+    """获取 worker 的工具列表（过滤凭证控制工具）"""
+    return [
+        tool
+        for tool in client.list_tools_sync()
+        if getattr(tool, "tool_name", None) != CONTROL_TOOL_NAME
+    ]
+
+
+class MCPWorkerPool:
+    """单一服务器类型的 worker 池
+
+    Attributes:
+        server_type: MCP服务器类型
+        min_size: 常驻预热 worker 数
+        max_size: worker 总数上限（含租出中的）
+        max_uses: 单个 worker 最大使用次数，超过后回收
+        max_lifetime_seconds: 单个 worker 最大存活时间（秒）
+        health_check_interval: 空闲超过该时间（秒）的 worker 在租出前探测一次
     """
 
-    def __init__(self, clients: list[Any]) -> None:
-        """初始化连接池
+    def __init__(
+        self,
+        server_type: str,
+        spawn: Callable[[], tuple[Any, str | None]],
+        min_size: int = 1,
+        max_size: int = 4,
+        max_uses: int = 50,
+        max_lifetime_seconds: float = 3600.0,
+        health_check_interval: float = 60.0,
+    ) -> None:
+        """初始化 worker 池
 
         Args:
-            clients: MCP客户端列表
+            server_type: MCP服务器类型
+            spawn: 创建并激活 MCPClient 的函数，返回 (已 __enter__ 的客户端, 控制令牌)
+            min_size: 常驻预热 worker 数
+            max_size: worker 总数上限
+            max_uses: 单个 worker 最大使用次数
+            max_lifetime_seconds: 单个 worker 最大存活时间（秒）
+            health_check_interval: 空闲探测间隔（秒）
         """
-        self.clients = clients
-        self._initialized = False
-        self._contexts: list[Any] = []  # 存储已激活的上下文
-        self._last_health_check: float = 0.0
-        self._health_check_interval: float = 60.0  # 每60秒健康检查一次
-
-    def initialize(self) -> None:
-        """初始化连接池 - 激活所有MCP连接并保持"""
-        if self._initialized:
-            print("ℹ️  连接池已初始化")
-            return
+        self.server_type = server_type
+        self._spawn = spawn
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.max_uses = max_uses
+        self.max_lifetime_seconds = max_lifetime_seconds
+        self.health_check_interval = health_check_interval
+
+        self._idle: deque[PooledWorker] = deque()
+        self._in_use: set[int] = set()
+        self._spawning = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._stats = {
+            "acquired": 0,
+            "spawned": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+            "acquire_timeouts": 0,
+        }
+
+    # ==================== 租约 ====================
+
+    def acquire(
+        self, timeout: float = 5.0, credentials: dict[str, str] | None = None
+    ) -> PooledWorker:
+        """租出一个健康的 worker（必要时同步启动新 worker）
 
-        print("🔌 初始化MCP连接池（长连接模式）...")
+        Args:
+            timeout: 无空闲 worker 且已达上限时的最长等待时间（秒）
+            credentials: 需要注入 worker 的请求凭证（见 build_injected_env）
 
-        # 进入所有客户端的上下文并保持
-        for i, client in enumerate(self.clients, 1):
-            if client:
-                try:
-                    # __enter__ 会启动MCP服务器并建立连接
-                    # Cost Explorer 可能需要较长时间启动（首次 uvx 安装）
-                    print(f"  🔄 正在激活连接 {i}/{len(self.clients)}...")
-                    client.__enter__()
-                    self._contexts.append(client)
-                    print("  ✅ 连接已激活并保持")
-                except TimeoutError as e:
-                    print(f"  ⚠️  连接激活超时（可能是首次安装包，请稍后重试）: {e}")
-                except Exception as e:
-                    print(f"  ⚠️  连接激活失败: {e}")
-
-        self._initialized = True
-        self._last_health_check = time.time()
-
-        print(f"✅ 连接池已初始化（{len(self._contexts)}/{len(self.clients)}个连接）\n")
-
-    def is_ready(self) -> bool:
-        """检查连接池是否就绪"""
-        return self._initialized and len(self._contexts) > 0
-
-    def health_check(self) -> None:
-        """健康检查 - 检测失效的连接并尝试重连
-
-        注意：由于MCP连接基于stdio，很难真正检测连接状态
-        目前采用简单策略：定期更新检查时间，实际重连由异常触发
+        Returns:
+            PooledWorker: 独占的 worker（已注入请求凭证）
+
+        Raises:
+            TimeoutError: 等待超时
+            RuntimeError: 池已关闭，或凭证注入失败
         """
-        current_time = time.time()
+        deadline = time.monotonic() + timeout
+
+        while True:
+            worker = None
+            should_spawn = False
+
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError(f"MCP worker 池已关闭: {self.server_type}")
+                    if self._idle:
+                        worker = self._idle.popleft()
+                        self._in_use.add(id(worker))
+                        break
+                    if self._total() < self.max_size:
+                        self._spawning += 1
+                        should_spawn = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["acquire_timeouts"] += 1
+                        raise TimeoutError(
+                            f"获取 MCP worker 超时: {self.server_type} ({timeout}s)"
+                        )
+                    self._cond.wait(remaining)
+
+            if should_spawn:
+                worker = self._spawn_worker(lease=True)
+                if worker is None:
+                    raise RuntimeError(f"MCP worker 启动失败: {self.server_type}")
+            elif not self._check_health(worker):
+                self._discard(worker)
+                continue
+
+            if credentials:
+                try:
+                    self._inject(worker, credentials)
+                except Exception:
+                    self._discard(worker)
+                    raise
+
+            worker.uses += 1
+            worker.last_used_at = time.monotonic()
+            with self._cond:
+                self._stats["acquired"] += 1
+            return worker
+
+    def release(self, worker: PooledWorker, broken: bool = False) -> None:
+        """归还 worker
 
-        # 限制检查频率
-        if current_time - self._last_health_check < self._health_check_interval:
+        Args:
+            worker: acquire() 返回的 worker
+            broken: 调用方确认 worker 已不可用（直接回收）
+        """
+        if worker.credentials_injected and not broken:
+            try:
+                apply_worker_credentials(worker.client, worker.control_token, {})
+                worker.credentials_injected = False
+            except Exception as e:
+                # 清除失败的 worker 不能再租给其他租户
+                logger.warning(
+                    f"⚠️ MCP worker 凭证清除失败，回收 worker: {self.server_type}",
+                    extra={"server_type": self.server_type, "error": str(e)},
+                )
+                broken = True
+
+        recycle = (
+            broken
+            or worker.uses >= self.max_uses
+            or time.monotonic() - worker.created_at >= self.max_lifetime_seconds
+            or not self._is_alive(worker)
+        )
+
+        if recycle:
+            with self._cond:
+                self._stats["recycled"] += 1
+            self._discard(worker)
             return
 
-        print("🔍 MCP连接池健康检查...")
+        with self._cond:
+            self._in_use.discard(id(worker))
+            if self._closed:
+                close_now = True
+            else:
+                worker.last_used_at = time.monotonic()
+                self._idle.append(worker)
+                close_now = False
+            self._cond.notify()
+
+        if close_now:
+            self._close_client(worker)
+
+    # ==================== 预热与补充 ====================
 
-        # 简单的存活确认（实际连接由工具调用时验证）
-        print(f"✅ 连接池状态: {len(self._contexts)}/{len(self.clients)}个连接活跃")
+    def warm_up(self) -> int:
+        """同步补充 worker 到 min_size
 
-        self._last_health_check = current_time
+        Returns:
+            int: 本次新启动的 worker 数
+        """
+        spawned = 0
+        while True:
+            with self._cond:
+                if self._closed or self._total() >= self.min_size:
+                    return spawned
+                self._spawning += 1
+            if self._spawn_worker(lease=False) is None:
+                return spawned
+            spawned += 1
+
+    def replenish_async(self) -> None:
+        """后台补充 worker 到 min_size（不阻塞调用方）"""
+        with self._cond:
+            if self._closed or self._total() >= self.min_size:
+                return
+        threading.Thread(
+            target=self.warm_up, name=f"mcp-pool-{self.server_type}", daemon=True
+        ).start()
 
     def close(self) -> None:
-        """关闭连接池 - 优雅关闭所有MCP连接"""
-        if not self._initialized:
+        """关闭池：立即关闭所有空闲 worker，租出中的 worker 在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for worker in idle:
+            self._close_client(worker)
+
+    def stats(self) -> dict[str, int]:
+        """获取池统计"""
+        with self._cond:
+            return {
+                **self._stats,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "spawning": self._spawning,
+            }
+
+    # ==================== 内部方法 ====================
+
+    def _total(self) -> int:
+        """当前 worker 总数（需持有锁）"""
+        return len(self._idle) + len(self._in_use) + self._spawning
+
+    def _spawn_worker(self, lease: bool) -> PooledWorker | None:
+        """启动 worker（调用前已占用 _spawning 名额）
+
+        Args:
+            lease: True=直接租给调用方，False=放入空闲队列
+        """
+        start = time.time()
+        client = None
+        worker = None
+        try:
+            client, control_token = self._spawn()
+            worker = PooledWorker(
+                server_type=self.server_type,
+                client=client,
+                control_token=control_token,
+                tools=_visible_tools(client),
+            )
+        except Exception as e:
+            logger.error(
+                f"❌ MCP worker 启动失败: {self.server_type}",
+                extra={"server_type": self.server_type, "error": str(e)},
+            )
+            if client is not None:
+                self._close_client(PooledWorker(self.server_type, client))
+
+        with self._cond:
+            self._spawning -= 1
+            if worker is not None:
+                self._stats["spawned"] += 1
+                if lease:
+                    self._in_use.add(id(worker))
+                else:
+                    self._idle.append(worker)
+            self._cond.notify()
+
+        if worker is not None:
+            logger.info(
+                f"🔌 MCP worker 已启动: {self.server_type}",
+                extra={
+                    "server_type": self.server_type,
+                    "tool_count": len(worker.tools),
+                    "duration_seconds": round(time.time() - start, 3),
+                },
+            )
+        return worker
+
+    def _is_alive(self, worker: PooledWorker) -> bool:
+        """检查 MCPClient 后台会话是否仍然存活"""
+        is_active = getattr(worker.client, "_is_session_active", None)
+        return bool(is_active()) if callable(is_active) else True
+
+    def _check_health(self, worker: PooledWorker) -> bool:
+        """租出前的健康检查（空闲过久时用 list_tools 探测并刷新工具缓存）"""
+        now = time.monotonic()
+        if now - worker.created_at >= self.max_lifetime_seconds:
+            return False
+        if not self._is_alive(worker):
+            healthy = False
+        elif now - worker.last_used_at < self.health_check_interval:
+            return True
+        else:
+            try:
+                worker.tools = _visible_tools(worker.client)
+                healthy = True
+            except Exception as e:
+                logger.warning(
+                    f"⚠️ MCP worker 探测失败: {self.server_type}",
+                    extra={"server_type": self.server_type, "error": str(e)},
+                )
+                healthy = False
+
+        if not healthy:
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+        return healthy
+
+    def _inject(self, worker: PooledWorker, credentials: dict[str, str]) -> None:
+        """向 worker 注入请求凭证"""
+        if not worker.control_token:
+            raise RuntimeError(f"MCP worker 不支持凭证注入: {self.server_type}")
+        # 先标记，注入中途失败时归还也会尝试清除
+        worker.credentials_injected = True
+        apply_worker_credentials(worker.client, worker.control_token, credentials)
+
+    def _discard(self, worker: PooledWorker) -> None:
+        """移出并关闭 worker，然后在后台补充"""
+        with self._cond:
+            self._in_use.discard(id(worker))
+            self._cond.notify()
+        self._close_client(worker)
+        self.replenish_async()
+
+    def _close_client(self, worker: PooledWorker) -> None:
+        """关闭 worker 对应的 MCPClient（失败只记录日志）"""
+        try:
+            worker.client.__exit__(None, None, None)
+        except Exception as e:
+            logger.warning(
+                f"⚠️ MCP worker 关闭失败: {self.server_type}",
+                extra={"server_type": self.server_type, "error": str(e)},
+            )
+
+
+class MCPLease:
+    """一次请求租用的 worker 集合"""
+
+    def __init__(self, pool: "MCPConnectionPool", workers: dict[str, PooledWorker]) -> None:
+        self._pool = pool
+        self._workers = workers
+        self._released = False
+
+    @property
+    def clients(self) -> dict[str, Any]:
+        """{server_type: MCPClient}"""
+        return {st: w.client for st, w in self._workers.items()}
+
+    @property
+    def tools(self) -> dict[str, list]:
+        """{server_type: 缓存的工具列表}"""
+        return {st: w.tools for st, w in self._workers.items()}
+
+    def release(self, broken_types: set[str] | None = None) -> None:
+        """归还所有 worker（幂等）
+
+        Args:
+            broken_types: 已确认不可用的服务器类型（直接回收）
+        """
+        if self._released:
             return
+        self._released = True
+        for server_type, worker in self._workers.items():
+            self._pool.release(worker, broken=bool(broken_types and server_type in broken_types))
+
+
+class MCPConnectionPool:
+    """MCP客户端连接池（按服务器类型管理多个 MCPWorkerPool）
+
+    Examples:
+        >>> pool = initialize_connection_pool(MCPManager(), ["common-tools", "alert"])
+        >>> lease = pool.acquire(["common-tools", "alert", "send-email"], additional_env)
+        >>> lease.clients.keys()  # 未进入池或获取失败的类型由调用方自行创建
+        dict_keys(['common-tools', 'alert'])
+        >>> lease.release()
+    """
+
+    def __init__(self, pools: dict[str, MCPWorkerPool], acquire_timeout: float = 5.0) -> None:
+        """初始化连接池
 
-        print("\n🔄 关闭MCP连接池...")
+        Args:
+            pools: {server_type: MCPWorkerPool}
+            acquire_timeout: 单个服务器类型的获取超时（秒）
+        """
+        self._pools = pools
+        self.acquire_timeout = acquire_timeout
+
+    @property
+    def server_types(self) -> list[str]:
+        """已池化的服务器类型"""
+        return list(self._pools.keys())
+
+    def warm_up(self, block: bool = False) -> None:
+        """并行预热所有服务器类型
+
+        Args:
+            block: 是否阻塞等待预热完成
+        """
 
-        # 退出所有上下文
-        for client in self._contexts:
+        def _warm() -> None:
+            start = time.time()
+            with ThreadPoolExecutor(
+                max_workers=max(len(self._pools), 1), thread_name_prefix="mcp-pool-warm"
+            ) as executor:
+                spawned = dict(
+                    zip(self._pools, executor.map(lambda p: p.warm_up(), self._pools.values()))
+                )
+            logger.info(
+                "✅ MCP 连接池预热完成",
+                extra={
+                    "spawned": spawned,
+                    "duration_seconds": round(time.time() - start, 2),
+                },
+            )
+
+        if block:
+            _warm()
+        else:
+            threading.Thread(target=_warm, name="mcp-pool-warm-up", daemon=True).start()
+
+    def acquire(
+        self, server_types: list[str], additional_env: dict[str, str] | None = None
+    ) -> MCPLease:
+        """为一次请求租用 worker（单个类型失败不影响其他类型）
+
+        Args:
+            server_types: 请求需要的服务器类型
+            additional_env: 本次请求的隔离环境变量（凭证部分注入 worker）
+
+        Returns:
+            MCPLease: 成功租用的 worker 集合（不在池中或获取失败的类型不包含在内）
+        """
+        credentials = build_injected_env(additional_env)
+        workers: dict[str, PooledWorker] = {}
+        for server_type in server_types:
+            pool = self._pools.get(server_type)
+            if pool is None:
+                continue
             try:
-                client.__exit__(None, None, None)
+                workers[server_type] = pool.acquire(
+                    timeout=self.acquire_timeout, credentials=credentials
+                )
             except Exception as e:
-                print(f"⚠️  关闭连接时出错: {e}")
+                logger.warning(
+                    f"⚠️ 从连接池获取 MCP worker 失败，回退为临时创建: {server_type}",
+                    extra={"server_type": server_type, "error": str(e)},
+                )
+        return MCPLease(self, workers)
 
-        self._contexts.clear()
-        self._initialized = False
+    def release(self, worker: PooledWorker, broken: bool = False) -> None:
+        """归还单个 worker"""
+        self._pools[worker.server_type].release(worker, broken=broken)
 
-        print("✅ 连接池已关闭")
+    def stats(self) -> dict[str, dict[str, int]]:
+        """获取各服务器类型的池统计"""
+        return {st: pool.stats() for st, pool in self._pools.items()}
 
-    def get_active_count(self) -> int:
-        """获取活跃连接数"""
-        return len(self._contexts)
+    def close(self) -> None:
+        """关闭连接池 - 优雅关闭所有MCP连接"""
+        for pool in self._pools.values():
+            pool.close()
+        logger.info("✅ MCP 连接池已关闭")
 
 
 # 全局连接池实例
 _connection_pool: MCPConnectionPool | None = None
+_connection_pool_lock = threading.Lock()
 
 
 def get_connection_pool() -> MCPConnectionPool | None:
-    """获取全局连接池实例"""
+    """获取全局连接池实例（未初始化时返回 None）"""
     return _connection_pool
 
 
-def initialize_connection_pool(clients: list[Any]) -> MCPConnectionPool:
-    """初始化全局连接池
+def initialize_connection_pool(
+    mcp_manager: Any,
+    server_types: list[str],
+    min_size: int = 1,
+    max_size: int = 4,
+    max_uses: int = 50,
+    max_lifetime_seconds: float = 3600.0,
+    acquire_timeout: float = 5.0,
+) -> MCPConnectionPool:
+    """初始化全局连接池（幂等）
 
     Args:
-        clients: MCP客户端列表
+        mcp_manager: MCPManager 实例（提供 create_pooled_client）
+        server_types: 需要池化的服务器类型
+        min_size: 每种类型常驻预热 worker 数
+        max_size: 每种类型 worker 上限
+        max_uses: 单个 worker 最大使用次数
+        max_lifetime_seconds: 单个 worker 最大存活时间（秒）
+        acquire_timeout: 获取超时（秒）
 
     Returns:
-        MCPConnectionPool: 初始化后的连接池实例
+        MCPConnectionPool: 连接池实例
     """
     global _connection_pool
 
     if _connection_pool is None:
-        _connection_pool = MCPConnectionPool(clients)
-        _connection_pool.initialize()
+        with _connection_pool_lock:
+            if _connection_pool is None:
+                pools = {
+                    server_type: MCPWorkerPool(
+                        server_type=server_type,
+                        spawn=lambda st=server_type: mcp_manager.create_pooled_client(st),
+                        min_size=min_size,
+                        max_size=max_size,
+                        max_uses=max_uses,
+                        max_lifetime_seconds=max_lifetime_seconds,
+                    )
+                    for server_type in server_types
+                }
+                _connection_pool = MCPConnectionPool(pools, acquire_timeout=acquire_timeout)
+                atexit.register(close_connection_pool)
+                logger.info(
+                    "MCP 连接池已创建",
+                    extra={
+                        "server_types": server_types,
+                        "min_size": min_size,
+                        "max_size": max_size,
+                    },
+                )
 
     return _connection_pool
 
@@ -0,0 +1,172 @@
+"""MCP worker 凭证注入协议
+
+长驻（池化）的 MCP worker 无法在启动时拿到请求账号的凭证，因此通过一个受令牌保护的
+控制工具，在租约开始时把请求凭证写入 worker 进程自身的环境变量，租约结束时恢复为启动时的基线值。
+
+隔离保证：
+    - 凭证只写入 MCP 子进程的 os.environ，Runtime 主进程环境不变（verify_env_isolation 仍然成立）
+    - worker 被独占租用，注入的凭证只对本次请求的工具调用可见
+    - 归还时清除凭证；清除失败的 worker 直接回收，不会被下一个租户复用
+    - 每次设置 / 清除凭证时重置 boto3 默认 Session，并调用已注册的重置钩子清除
+      服务端模块级客户端缓存（如 send-email 的 SES 客户端），避免沿用上一个租户的凭证
+    - 控制令牌在 worker 启动时随机生成，并在服务端读取后立即从环境变量中移除
+    - 控制工具不会出现在 Agent 的工具列表中
+"""
+
+import hmac
+import logging
+import os
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# 控制工具名称（Agent 工具列表中会被过滤掉）
+CONTROL_TOOL_NAME = "costq_set_request_credentials"
+
+# 控制令牌环境变量（仅池化 worker 启动时设置）
+CONTROL_TOKEN_ENV = "COSTQ_MCP_CONTROL_TOKEN"
+
+# 允许注入的环境变量（白名单）
+INJECTABLE_ENV_KEYS = (
+    "AWS_ACCESS_KEY_ID",
+    "AWS_SECRET_ACCESS_KEY",
+    "AWS_SESSION_TOKEN",
+    "AWS_REGION",
+    "AWS_DEFAULT_REGION",
+)
+
+
+# ==================== 服务端（MCP 子进程） ====================
+
+# 从环境变量中取出的控制令牌（同一进程内 server 模块可能被导入两次：
+# 包 __init__ 导入一次，python -m 作为 __main__ 再执行一次）
+_control_token: str | None = None
+
+# 凭证变化时需要清除的模块级客户端缓存
+_credential_reset_hooks: list[Callable[[], None]] = []
+
+
+def _take_control_token() -> str | None:
+    """取出控制令牌（首次调用时从环境变量中移除）"""
+    global _control_token
+    if _control_token is None:
+        _control_token = os.environ.pop(CONTROL_TOKEN_ENV, None)
+    return _control_token
+
+
+def register_credential_reset_hook(hook: Callable[[], None]) -> None:
+    """注册凭证重置钩子（缓存了 boto3 客户端的服务端模块在导入时调用）
+
+    Args:
+        hook: 清除模块级客户端缓存的函数（重复注册同一函数只保留一次）
+    """
+    if hook not in _credential_reset_hooks:
+        _credential_reset_hooks.append(hook)
+
+
+def register_credential_control(server: Any) -> bool:
+    """在 FastMCP 服务器上注册凭证控制工具（仅池化 worker 生效）
+
+    Args:
+        server: FastMCP 实例
+
+    Returns:
+        bool: 是否已注册（未设置控制令牌时不注册）
+    """
+    token = _take_control_token()
+    if not token:
+        return False
+
+    # 启动时的基线值（清除凭证时恢复）
+    baseline = {key: os.environ.get(key) for key in INJECTABLE_ENV_KEYS}
+
+    @server.tool(
+        name=CONTROL_TOOL_NAME,
+        description="Internal credential control for pooled workers. Not for agent use.",
+    )
+    def set_request_credentials(token_value: str, env: dict[str, str] | None = None) -> dict:
+        if not hmac.compare_digest(token_value, token):
+            raise PermissionError("invalid control token")
+
+        env = env or {}
+        unknown = set(env) - set(INJECTABLE_ENV_KEYS)
+        if unknown:
+            raise ValueError(f"unsupported env keys: {sorted(unknown)}")
+
+        for key in INJECTABLE_ENV_KEYS:
+            value = env.get(key, baseline[key])
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+        _reset_cached_clients()
+        return {"success": True, "applied_keys": sorted(env)}
+
+    return True
+
+
+def _reset_cached_clients() -> None:
+    """丢弃 boto3 默认 Session 与模块级客户端缓存（其凭证在首次使用后会被缓存）"""
+    try:
+        import boto3
+    except ImportError:
+        pass
+    else:
+        boto3.DEFAULT_SESSION = None
+
+    for hook in _credential_reset_hooks:
+        try:
+            hook()
+        except Exception as e:
+            # 不能带着旧客户端继续：抛出后控制工具调用失败，worker 被回收
+            logger.error(
+                "凭证重置钩子执行失败",
+                extra={"hook": getattr(hook, "__qualname__", repr(hook)), "error": str(e)},
+            )
+            raise
+
+
+# ==================== 客户端（Runtime 主进程） ====================
+
+
+def build_injected_env(additional_env: dict[str, str] | None) -> dict[str, str]:
+    """从 additional_env 中提取可注入的变量
+
+    Args:
+        additional_env: Runtime 为本次请求准备的隔离环境变量
+
+    Returns:
+        dict: 仅包含 INJECTABLE_ENV_KEYS 的子集
+    """
+    if not additional_env:
+        return {}
+    return {key: additional_env[key] for key in INJECTABLE_ENV_KEYS if key in additional_env}
+
+
+def apply_worker_credentials(client: Any, control_token: str, env: dict[str, str]) -> None:
+    """调用控制工具设置（env 非空）或清除（env 为空）worker 的请求凭证
+
+    Args:
+        client: 已激活的 MCPClient
+        control_token: worker 启动时生成的控制令牌
+        env: 需要注入的环境变量（空字典=恢复基线）
+
+    Raises:
+        RuntimeError: 控制工具调用失败
+    """
+    result = client.call_tool_sync(
+        tool_use_id=f"credential-control-{uuid.uuid4().hex[:8]}",
+        name=CONTROL_TOOL_NAME,
+        arguments={"token_value": control_token, "env": env},
+    )
+    if result.get("status") != "success":
+        # 不记录结果内容（可能回显参数）
+        raise RuntimeError("凭证控制工具调用失败")
+
+    logger.debug(
+        "MCP worker 凭证已更新",
+        extra={"action": "inject" if env else "clear", "keys": sorted(env)},
+    )
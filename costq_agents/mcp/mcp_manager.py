@@ -4,29 +4,64 @@
 支持 Gateway MCP 模式（使用 IAM SigV4 认证连接远程 MCP Server）。
 """
 
+import asyncio
 import logging
 import os
+import secrets
 import sys
+import threading
 import time
+from collections.abc import Callable
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
 from pathlib import Path
 
-import boto3
 from botocore.credentials import Credentials
 from mcp import StdioServerParameters
 from mcp.client.stdio import stdio_client
+from opentelemetry import trace
 from strands.tools.mcp import MCPClient
 
+from costq_agents.mcp.credential_control import CONTROL_TOKEN_ENV
+from costq_agents.mcp.tool_catalog import (
+    MAX_TOOL_NAME_LENGTH,
+    LazyMCPClient,
+    build_agent_tools,
+    get_tool_catalog,
+)
 from costq_agents.services.streamable_http_sigv4 import streamablehttp_client_with_sigv4
+from costq_agents.utils.aws_client_factory import get_aws_client_factory
+from costq_agents.utils.executors import ExecutorSaturatedError, get_executor, run_blocking
 
 # 初始化标准 logger
 logger = logging.getLogger(__name__)
 
+tracer = trace.get_tracer(__name__)
+
 # 环境判断
 IS_PRODUCTION = os.getenv("ENVIRONMENT") == "production"
 
 
+@dataclass
+class MCPLoadResult:
+    """异步加载结果（load_clients_async 返回值）
+
+    Attributes:
+        clients: 已激活的客户端 {name: MCPClient}
+        tools: 各客户端的工具列表 {name: tools}
+        errors: 失败或超时的客户端 {name: 错误信息}
+        timings: 各客户端加载耗时（秒）
+        detached: 返回时仍未完成、转入后台的客户端（完成后自动关闭）
+    """
+
+    clients: dict[str, MCPClient] = field(default_factory=dict)
+    tools: dict[str, list] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+    detached: list[str] = field(default_factory=list)
+
+
 class MCPManager:
     """MCP客户端管理器（简化版）
 
@@ -39,7 +74,8 @@ class MCPManager:
         6. 无凭证刷新（MCP Server内部每次调用AssumeRole）
 
     Loading Strategies:
-        - create_all_clients(): 串行加载（50-60秒，稳定，推荐Runtime使用）
+        - load_clients_async(): asyncio 并发加载本地 + Gateway（Runtime 默认）
+        - create_all_clients(): 串行加载（50-60秒，稳定）
         - create_all_clients_parallel(): 并行加载（10-15秒，快速，需充足资源）
 
     Attributes:
@@ -115,7 +151,7 @@ class MCPManager:
             - 生产环境（EKS/Runtime）：使用 IAM Role（自动）
             - 无需明文配置，安全性高
         """
-        session = boto3.Session()
+        session = get_aws_client_factory().get_session()
         credentials = session.get_credentials()
 
         if credentials is None:
@@ -135,6 +171,8 @@ class MCPManager:
         gateway_url: str | None = None,
         name: str = "gateway-mcp",
         env_var_name: str = "COSTQ_AWS_MCP_SERVERS_GATEWAY_URL",
+        lazy: bool = False,
+        on_session_start: Callable[[MCPClient], None] | None = None,
     ) -> MCPClient:
         """创建 Gateway MCP 客户端（使用 IAM SigV4 认证）
 
@@ -146,6 +184,8 @@ class MCPManager:
                 (默认从环境变量读取)
             name: 客户端名称（用于日志）
             env_var_name: Gateway URL 的环境变量名
+            lazy: 是否延迟到第一次调用工具时才建立会话（LazyMCPClient）
+            on_session_start: 延迟会话建立后的回调（仅 lazy=True 时生效）
 
         Returns:
             MCPClient: Gateway 客户端（与本地客户端接口一致）
@@ -194,35 +234,8 @@ class MCPManager:
             }
         )
 
-        return MCPClient(create_transport)
-
-        # 从 boto3 Session 获取凭证（自动使用 Profile 或 IAM Role）
-        credentials = self._get_aws_credentials()
-
-        # 获取 SigV4 签名参数
-        service = self.gateway_service
-        region = self.gateway_region
-
-        # 创建带 SigV4 签名的 transport factory
-        def create_transport():
-            return streamablehttp_client_with_sigv4(
-                url=gateway_url,
-                credentials=credentials,
-                service=service,
-                region=region,
-            )
-
-        logger.info(
-            "✅ 创建 Gateway MCP 客户端",
-            extra={
-                "mcp_name": name,
-                "gateway_url": gateway_url[:50] + "..." if len(gateway_url) > 50 else gateway_url,
-                "service": service,
-                "region": region,
-                "auth_type": "SigV4"
-            }
-        )
-
+        if lazy:
+            return LazyMCPClient(create_transport, on_session_start=on_session_start)
         return MCPClient(create_transport)
 
     def get_full_tools_list(self, client: MCPClient) -> list:
@@ -249,31 +262,37 @@ class MCPManager:
             - 自动处理分页（pagination_token）
             - 适用于 Gateway MCP 和本地 MCP
             - 客户端必须先激活（调用 __enter__）
+            - 超过64字符的工具名称通过 name_override 截断（Bedrock Converse API 限制）
+        """
+        specs = self.list_gateway_tool_specs(client)
+        tools = build_agent_tools(specs, client)
+        truncated_count = sum(1 for spec in specs if len(spec.name) > MAX_TOOL_NAME_LENGTH)
+
+        logger.info(
+            "✅ 获取完整工具列表",
+            extra={
+                "tool_count": len(tools),
+                "truncated_count": truncated_count,
+            }
+        )
+
+        return tools
+
+    def list_gateway_tool_specs(self, client: MCPClient) -> list:
+        """分页获取原始工具定义（mcp.types.Tool，用于工具目录缓存）
+
+        Args:
+            client: 已激活的 MCPClient 实例
+
+        Returns:
+            list: mcp.types.Tool 列表
         """
-        tools = []
+        specs = []
         pagination_token = None
-        truncated_count = 0
 
         while True:
-            # 获取工具列表（带分页）
             result = client.list_tools_sync(pagination_token=pagination_token)
-
-            # ✅ 修复：截断超过64字符的工具名称（Bedrock Converse API 限制）
-            for tool in result:
-                if len(tool.tool_name) > 64:
-                    original_name = tool.tool_name
-                    tool.tool_name = tool.tool_name[:64]  # 截断到64字符
-                    truncated_count += 1
-                    logger.warning(
-                        "⚠️  工具名称超过64字符，已截断",
-                        extra={
-                            "original_name": original_name,
-                            "truncated_name": tool.tool_name,
-                            "original_length": len(original_name),
-                        }
-                    )
-
-            tools.extend(result)
+            specs.extend(tool.mcp_tool for tool in result)
 
             # 检查是否有更多页
             if hasattr(result, "pagination_token") and result.pagination_token:
@@ -281,15 +300,7 @@ class MCPManager:
             else:
                 break
 
-        logger.info(
-            "✅ 获取完整工具列表",
-            extra={
-                "tool_count": len(tools),
-                "truncated_count": truncated_count,
-            }
-        )
-
-        return tools
+        return specs
 
     def _get_env(self, additional_env: dict[str, str] | None = None) -> dict[str, str]:
         """获取MCP子进程的环境变量（支持隔离传递）
@@ -473,6 +484,54 @@ class MCPManager:
             env_var_name="COSTQ_GCP_MCP_SERVERS_GATEWAY_URL",
         )
 
+    # ==================== 连接池支持 ====================
+
+    def get_pool_env(self) -> dict[str, str]:
+        """获取池化 worker 的基础环境变量（不含任何租户凭证）
+
+        Returns:
+            dict: 平台级环境变量（区域 + 本地开发的平台 Profile）
+
+        Notes:
+            - 作为 additional_env 传入 _get_env()，避免回退读取主进程的 AWS_* 凭证
+            - 与 Runtime 为 AWS 账号准备的平台变量保持一致
+        """
+        region = os.getenv("AWS_REGION", "us-east-1")
+        env = {
+            "AWS_REGION": region,
+            "AWS_DEFAULT_REGION": os.getenv("AWS_DEFAULT_REGION", region),
+        }
+        if os.environ.get("DOCKER_CONTAINER") != "1":
+            env["PLATFORM_AWS_PROFILE"] = os.environ.get("AWS_PROFILE", "3532")
+        return env
+
+    def create_pooled_client(self, server_type: str) -> tuple[MCPClient, str]:
+        """创建并激活一个池化 worker（供 MCPConnectionPool 调用）
+
+        Args:
+            server_type: 本地 MCP 服务器类型
+
+        Returns:
+            Tuple[MCPClient, str]: (已激活（__enter__）的客户端, 凭证控制令牌)
+
+        Raises:
+            ValueError: 未知或不支持池化的服务器类型
+
+        Notes:
+            - 控制令牌随机生成，仅通过子进程环境变量传递一次
+            - 服务端据此注册凭证控制工具，请求凭证在租出时注入（见 credential_control）
+        """
+        if server_type == "gcp-gateway":
+            raise ValueError("Gateway MCP 不使用 stdio 连接池")
+        factory = self._get_client_factory(server_type)
+        if factory is None:
+            raise ValueError(f"Unknown server type: {server_type}")
+
+        control_token = secrets.token_urlsafe(32)
+        client = factory({**self.get_pool_env(), CONTROL_TOKEN_ENV: control_token})
+        client.__enter__()
+        return client, control_token
+
     def _get_client_factory(self, server_type: str):
         """获取MCP客户端工厂方法（消除代码重复）
 
@@ -858,6 +917,261 @@ class MCPManager:
 
         return clients
 
+    # ==================== 异步并发加载（Runtime 默认） ====================
+
+    # Gateway 客户端 → (客户端名称, URL 环境变量名)
+    GATEWAY_CLIENT_NAMES = {
+        "gateway": ("gateway-mcp", "COSTQ_AWS_MCP_SERVERS_GATEWAY_URL"),
+        "gateway-gcp": ("gcp-gateway-mcp", "COSTQ_GCP_MCP_SERVERS_GATEWAY_URL"),
+    }
+
+    def _load_gateway_client(self, name: str) -> tuple[MCPClient, list]:
+        """加载 Gateway 客户端（优先使用工具目录缓存）
+
+        命中缓存时返回未建立会话的 LazyMCPClient 和由缓存重建的工具；
+        未命中时建立会话、完整拉取工具列表并写入缓存。
+
+        Args:
+            name: "gateway" 或 "gateway-gcp"
+
+        Returns:
+            Tuple[MCPClient, list]: (客户端, 工具列表)
+        """
+        client_name, env_var_name = self.GATEWAY_CLIENT_NAMES[name]
+        gateway_url = os.getenv(env_var_name, "")
+        catalog = get_tool_catalog()
+
+        cached = catalog.lookup(gateway_url) if gateway_url else None
+        if cached is not None:
+            client = self.create_gateway_client(
+                gateway_url=gateway_url,
+                name=client_name,
+                env_var_name=env_var_name,
+                lazy=True,
+                on_session_start=lambda c: threading.Thread(
+                    target=self._revalidate_tool_catalog,
+                    args=(gateway_url, c),
+                    name=f"tool-catalog-{name}",
+                    daemon=True,
+                ).start(),
+            )
+            logger.info(
+                "✅ Gateway 工具目录命中缓存（会话延迟建立）",
+                extra={
+                    "mcp_name": client_name,
+                    "tool_count": len(cached.specs),
+                    "catalog_hash": cached.content_hash,
+                },
+            )
+            return client, build_agent_tools(cached.specs, client)
+
+        client = self.create_gateway_client(
+            gateway_url=gateway_url or None, name=client_name, env_var_name=env_var_name
+        )
+        client.__enter__()
+        try:
+            tools = self.get_full_tools_list(client)
+        except Exception:
+            client.__exit__(None, None, None)
+            raise
+        catalog.store(gateway_url, [tool.mcp_tool for tool in tools])
+        return client, tools
+
+    def _revalidate_tool_catalog(self, gateway_url: str, client: MCPClient) -> None:
+        """会话建立后在后台重新拉取工具定义，内容变化时更新缓存"""
+        try:
+            get_tool_catalog().store(gateway_url, self.list_gateway_tool_specs(client))
+        except Exception as e:
+            logger.debug("Gateway 工具目录后台校验失败", extra={"error": str(e)})
+
+    def _load_client(
+        self, name: str, additional_env: dict[str, str] | None
+    ) -> tuple[MCPClient, list]:
+        """创建、激活并列出工具（在工作线程中执行）
+
+        Args:
+            name: 本地服务器类型，或 "gateway" / "gateway-gcp"
+            additional_env: 额外的环境变量（仅本地 stdio 客户端使用）
+
+        Returns:
+            Tuple[MCPClient, list]: (已激活客户端, 工具列表)
+        """
+        with tracer.start_as_current_span("costq_agents.mcp.load_client") as span:
+            span.set_attribute("costq_agents.mcp.server_type", name)
+            start = time.time()
+
+            if name in self.GATEWAY_CLIENT_NAMES:
+                client, tools = self._load_gateway_client(name)
+            else:
+                factory = self._get_client_factory(name)
+                if factory is None or name == "gcp-gateway":
+                    raise ValueError(f"Unknown server type: {name}")
+                client = factory(additional_env)
+
+                client.__enter__()
+                try:
+                    tools = list(client.list_tools_sync())
+                except Exception:
+                    client.__exit__(None, None, None)
+                    raise
+
+            span.set_attribute("costq_agents.mcp.tool_count", len(tools))
+            span.set_attribute("costq_agents.mcp.duration_seconds", round(time.time() - start, 3))
+            return client, tools
+
+    @staticmethod
+    def _exit_client(client: MCPClient, name: str, description: str) -> None:
+        """关闭客户端（阻塞：停止后台线程与 stdio 子进程，在工作线程中执行）"""
+        try:
+            client.__exit__(None, None, None)
+            logger.info(f"已关闭{description}的 MCP 客户端", extra={"server_type": name})
+        except Exception as e:
+            logger.warning(
+                f"关闭{description}的 MCP 客户端失败",
+                extra={"server_type": name, "error": str(e)},
+            )
+
+    def _schedule_close(self, client: MCPClient, name: str, description: str) -> None:
+        """把关闭提交到 "mcp" 线程池（done-callback 运行在事件循环上，不能阻塞）"""
+        try:
+            get_executor("mcp").submit(self._exit_client, client, name, description)
+        except ExecutorSaturatedError:
+            threading.Thread(
+                target=self._exit_client,
+                args=(client, name, description),
+                name=f"mcp-close-{name}",
+                daemon=True,
+            ).start()
+
+    def _close_detached(self, name: str, task: "asyncio.Future") -> None:
+        """关闭返回后才完成的客户端（避免子进程泄漏）"""
+        if task.cancelled() or task.exception() is not None:
+            return
+        client, _ = task.result()
+        self._schedule_close(client, name, "超时后完成")
+
+    async def load_clients_async(
+        self,
+        server_types: list[str],
+        additional_env: dict[str, str] | None = None,
+        critical: set[str] | None = None,
+        deadlines: dict[str, float] | None = None,
+        default_deadline: float = 20.0,
+        grace_seconds: float = 2.0,
+    ) -> MCPLoadResult:
+        """并发加载本地 stdio 客户端与 Gateway 客户端（asyncio 原生）
+
+        所有客户端同时在线程中启动，每个客户端有独立的截止时间。
+        关键客户端全部完成（成功/失败/超时）后，非关键客户端最多再等待 grace_seconds，
+        之后立即返回部分结果；仍在启动的客户端转入后台，完成后自动关闭。
+
+        Args:
+            server_types: 本地服务器类型，可包含 "gateway" / "gateway-gcp"
+            additional_env: 额外的环境变量（隔离传递给本地 MCP 子进程）
+            critical: 关键客户端名称（None=全部视为关键）
+            deadlines: 单个客户端截止时间（秒），未配置的使用 default_deadline
+            default_deadline: 默认截止时间（秒）
+            grace_seconds: 关键客户端就绪后，等待非关键客户端的最长时间（秒）
+
+        Returns:
+            MCPLoadResult: 加载结果（不抛出异常，失败记录在 errors 中）
+
+        Examples:
+            >>> result = await manager.load_clients_async(
+            ...     ["common-tools", "alert", "send-email", "gateway"],
+            ...     additional_env=additional_env,
+            ...     critical={"common-tools", "gateway"},
+            ... )
+            >>> tools = [t for server_tools in result.tools.values() for t in server_tools]
+        """
+        start_time = time.time()
+        deadlines = deadlines or {}
+        critical = set(server_types) if critical is None else critical & set(server_types)
+        result = MCPLoadResult()
+
+        logger.info(
+            f"🚀 并发初始化 {len(server_types)} 个 MCP 客户端（asyncio）",
+            extra={
+                "server_types": server_types,
+                "critical": sorted(critical),
+                "env_isolation_enabled": additional_env is not None,
+            },
+        )
+
+        async def _load(name: str) -> None:
+            mcp_start = time.time()
+            deadline = deadlines.get(name, default_deadline)
+            worker = asyncio.ensure_future(
+                run_blocking("mcp", self._load_client, name, additional_env)
+            )
+            try:
+                client, tools = await asyncio.wait_for(asyncio.shield(worker), deadline)
+                result.clients[name] = client
+                result.tools[name] = tools
+                logger.info(
+                    f"⏱️ MCP初始化成功: {name}",
+                    extra={
+                        "server_type": name,
+                        "tool_count": len(tools),
+                        "duration_seconds": round(time.time() - mcp_start, 3),
+                    },
+                )
+            except asyncio.TimeoutError:
+                worker.add_done_callback(lambda t: self._close_detached(name, t))
+                result.errors[name] = f"Timeout after {deadline}s"
+                logger.error(f"⏱️ {name} 超时 ({deadline}s)", extra={"server_type": name})
+            except Exception as e:
+                result.errors[name] = str(e)
+                logger.error(
+                    f"⏱️ MCP初始化失败: {name}",
+                    extra={"server_type": name, "error": str(e), "error_type": type(e).__name__},
+                )
+            finally:
+                result.timings[name] = time.time() - mcp_start
+
+        tasks = {name: asyncio.create_task(_load(name)) for name in server_types}
+
+        critical_tasks = [task for name, task in tasks.items() if name in critical]
+        if critical_tasks:
+            await asyncio.wait(critical_tasks)
+
+        optional_tasks = {name: task for name, task in tasks.items() if name not in critical}
+        if optional_tasks:
+            _, pending = await asyncio.wait(optional_tasks.values(), timeout=grace_seconds)
+            for name, task in optional_tasks.items():
+                if task in pending:
+                    # 转入后台：截止时间内完成的客户端无人使用，同样需要关闭
+                    task.add_done_callback(
+                        lambda _t, n=name: self._close_late_client(result, n)
+                    )
+                    result.detached.append(name)
+
+        elapsed = time.time() - start_time
+        slowest = max(result.timings.items(), key=lambda x: x[1], default=("N/A", 0.0))
+        logger.info(
+            "⏱️ MCP并发创建完成",
+            extra={
+                "success": len(result.clients),
+                "failed": len(result.errors),
+                "detached": result.detached,
+                "total_elapsed_seconds": round(elapsed, 2),
+                "slowest_mcp": slowest[0],
+                "slowest_mcp_duration": round(slowest[1], 3),
+                "success_types": list(result.clients.keys()),
+                "failed_types": list(result.errors.keys()),
+                "individual_timings": {k: round(v, 3) for k, v in result.timings.items()},
+            },
+        )
+        return result
+
+    def _close_late_client(self, result: MCPLoadResult, name: str) -> None:
+        """关闭在 load_clients_async 返回后才就绪的客户端"""
+        client = result.clients.pop(name, None)
+        result.tools.pop(name, None)
+        if client is None:
+            return
+        self._schedule_close(client, name, "返回后才就绪")
+
     def close_all_clients(self, clients: dict[str, MCPClient]) -> None:
         """关闭所有MCP客户端
 
@@ -14,6 +14,8 @@ import logging
 logger = logging.getLogger(__name__)
 from mcp.server.fastmcp import FastMCP
 
+from costq_agents.mcp.credential_control import register_credential_control  # noqa: E402
+
 from .handlers.email_handler import send_email
 
 # 配置日志
@@ -197,5 +199,8 @@ async def send_email_tool(
     )
 
 
+# 池化 worker 的请求凭证控制（非池化启动时不注册）
+register_credential_control(mcp)
+
 if __name__ == "__main__":
     mcp.run()
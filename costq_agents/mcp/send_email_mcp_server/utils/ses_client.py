@@ -10,6 +10,8 @@ from typing import Any
 import boto3
 from botocore.exceptions import ClientError
 
+from costq_agents.mcp.credential_control import register_credential_reset_hook
+
 logger = logging.getLogger(__name__)
 
 # Configure Loguru logging
@@ -23,6 +25,15 @@ SES_CONFIGURATION_SET = os.getenv("SES_CONFIGURATION_SET", "")  # 可选
 _ses_client = None
 
 
+def reset_ses_client() -> None:
+    """清除缓存的 SES 客户端（池化 worker 每次设置 / 清除请求凭证时调用）"""
+    global _ses_client
+    _ses_client = None
+
+
+register_credential_reset_hook(reset_ses_client)
+
+
 def get_ses_client():
     """获取 SES 客户端（使用平台账号 3532 的 IAM Role）
 
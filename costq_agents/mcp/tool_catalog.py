@@ -0,0 +1,248 @@
+"""Gateway MCP 工具目录缓存
+
+按 Gateway URL 缓存 list_tools 返回的工具定义（mcp.types.Tool），避免每次请求都
+完整分页拉取工具列表。命中缓存时：
+    1. 直接用缓存的工具定义重建 MCPAgentTool（无网络调用）
+    2. Gateway 会话延迟到第一次真正调用工具时才建立（LazyMCPClient）
+    3. 会话建立后在后台重新拉取工具列表，内容哈希变化时更新缓存
+
+缓存刷新：
+    - TTL 过期后下一次请求走完整加载路径并重新写入缓存
+    - 内容哈希变化（后台校验发现）时立即替换缓存
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from strands.tools.mcp import MCPAgentTool, MCPClient
+
+from costq_agents.utils.executors import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Bedrock Converse API 工具名称长度限制
+MAX_TOOL_NAME_LENGTH = 64
+
+
+def build_agent_tools(specs: list, client: MCPClient) -> list[MCPAgentTool]:
+    """根据工具定义构建 MCPAgentTool（超长名称截断到 64 字符）
+
+    Args:
+        specs: mcp.types.Tool 列表
+        client: 工具调用使用的 MCPClient
+
+    Returns:
+        list[MCPAgentTool]: Agent 可用的工具列表
+    """
+    tools = []
+    for spec in specs:
+        name_override = None
+        if len(spec.name) > MAX_TOOL_NAME_LENGTH:
+            name_override = spec.name[:MAX_TOOL_NAME_LENGTH]
+            logger.warning(
+                "⚠️  工具名称超过64字符，已截断",
+                extra={
+                    "original_name": spec.name,
+                    "truncated_name": name_override,
+                    "original_length": len(spec.name),
+                },
+            )
+        tools.append(MCPAgentTool(spec, client, name_override=name_override))
+    return tools
+
+
+def compute_catalog_hash(specs: list) -> str:
+    """计算工具定义的内容哈希（与顺序无关）
+
+    Args:
+        specs: mcp.types.Tool 列表
+
+    Returns:
+        str: 16 位十六进制哈希
+    """
+    payload = sorted(
+        json.dumps(spec.model_dump(mode="json", exclude_none=True), sort_keys=True)
+        for spec in specs
+    )
+    return hashlib.sha256("\n".join(payload).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class CatalogEntry:
+    """缓存条目"""
+
+    specs: list
+    content_hash: str
+    fetched_at: float
+
+
+class GatewayToolCatalog:
+    """Gateway 工具目录缓存（按 Gateway URL）
+
+    Attributes:
+        ttl_seconds: 缓存有效期（秒）
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        """初始化缓存
+
+        Args:
+            ttl_seconds: 缓存有效期（秒）
+            clock: 单调时钟（测试时可注入）
+        """
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: dict[str, CatalogEntry] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "changes": 0}
+
+    def lookup(self, url: str) -> CatalogEntry | None:
+        """查询有效期内的缓存
+
+        Args:
+            url: Gateway URL
+
+        Returns:
+            CatalogEntry | None: 命中返回条目，未命中或已过期返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None and self._clock() - entry.fetched_at < self.ttl_seconds:
+                self._stats["hits"] += 1
+                return entry
+            self._stats["misses"] += 1
+            return None
+
+    def store(self, url: str, specs: list) -> bool:
+        """写入工具定义
+
+        Args:
+            url: Gateway URL
+            specs: mcp.types.Tool 列表
+
+        Returns:
+            bool: 内容哈希是否与旧缓存不同（首次写入视为变化）
+        """
+        content_hash = compute_catalog_hash(specs)
+        with self._lock:
+            previous = self._entries.get(url)
+            changed = previous is None or previous.content_hash != content_hash
+            self._entries[url] = CatalogEntry(
+                specs=list(specs), content_hash=content_hash, fetched_at=self._clock()
+            )
+            self._stats["stores"] += 1
+            if changed and previous is not None:
+                self._stats["changes"] += 1
+
+        if changed and previous is not None:
+            logger.info(
+                "🔄 Gateway 工具目录已变化，缓存已更新",
+                extra={
+                    "old_hash": previous.content_hash,
+                    "new_hash": content_hash,
+                    "tool_count": len(specs),
+                },
+            )
+        return changed
+
+    def content_hash(self, url: str) -> str | None:
+        """获取当前缓存的内容哈希（未缓存返回 None）"""
+        with self._lock:
+            entry = self._entries.get(url)
+            return entry.content_hash if entry else None
+
+    def invalidate(self, url: str | None = None) -> None:
+        """清除缓存
+
+        Args:
+            url: 指定 Gateway URL（None=清除全部）
+        """
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(url, None)
+
+    def stats(self) -> dict[str, int]:
+        """获取缓存统计"""
+        with self._lock:
+            return {**self._stats, "size": len(self._entries)}
+
+
+class LazyMCPClient(MCPClient):
+    """延迟建立会话的 MCPClient
+
+    __enter__ 不建立连接；第一次 call_tool / list_tools 时才启动后台会话。
+    从未使用时 __exit__ 为空操作。
+    """
+
+    def __init__(
+        self,
+        transport_callable: Callable,
+        on_session_start: Callable[["LazyMCPClient"], None] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """初始化客户端
+
+        Args:
+            transport_callable: transport 工厂（同 MCPClient）
+            on_session_start: 会话首次建立后的回调（在调用线程中执行，需自行保证不阻塞）
+            **kwargs: 透传给 MCPClient
+        """
+        super().__init__(transport_callable, **kwargs)
+        self._on_session_start = on_session_start
+        self._lazy_start_lock = threading.Lock()
+
+    def __enter__(self) -> "LazyMCPClient":
+        return self
+
+    def ensure_started(self) -> None:
+        """确保会话已建立（线程安全）"""
+        if self._is_session_active():
+            return
+        with self._lazy_start_lock:
+            if self._is_session_active():
+                return
+            start = time.time()
+            self.start()
+            logger.info(
+                "🔌 Gateway MCP 会话已按需建立",
+                extra={"duration_seconds": round(time.time() - start, 3)},
+            )
+        if self._on_session_start is not None:
+            self._on_session_start(self)
+
+    def list_tools_sync(self, *args: Any, **kwargs: Any):
+        self.ensure_started()
+        return super().list_tools_sync(*args, **kwargs)
+
+    def call_tool_sync(self, *args: Any, **kwargs: Any):
+        self.ensure_started()
+        return super().call_tool_sync(*args, **kwargs)
+
+    async def call_tool_async(self, *args: Any, **kwargs: Any):
+        if not self._is_session_active():
+            await run_blocking("mcp", self.ensure_started)
+        return await super().call_tool_async(*args, **kwargs)
+
+
+# 全局单例
+_tool_catalog: GatewayToolCatalog | None = None
+
+
+def get_tool_catalog() -> GatewayToolCatalog:
+    """获取全局 Gateway 工具目录缓存"""
+    global _tool_catalog
+
+    if _tool_catalog is None:
+        from costq_agents.config.settings import settings
+
+        _tool_catalog = GatewayToolCatalog(ttl_seconds=settings.GATEWAY_TOOL_CATALOG_TTL_SECONDS)
+
+    return _tool_catalog
@@ -149,15 +149,20 @@ class AccountStoragePostgreSQL:
             org_id: 组织ID（可选，用于验证）
 
         Returns:
-            Optional[dict]: 账号信息，如果不存在返回None
+            Optional[dict]: 账号信息（附带组织的 org_updated_at，用作 External ID 缓存版本），
+                如果不存在返回None
         """
         db = self._get_db()
         try:
-            query = "SELECT * FROM aws_accounts WHERE id = :id"
+            query = (
+                "SELECT a.*, o.updated_at AS org_updated_at FROM aws_accounts AS a "
+                "LEFT JOIN organizations AS o ON o.id = a.org_id::text "
+                "WHERE a.id = :id"
+            )
             params = {"id": account_id}
 
             if org_id:
-                query += " AND org_id = :org_id"
+                query += " AND a.org_id = :org_id"
                 params["org_id"] = org_id
 
             result = db.execute(text(query), params)
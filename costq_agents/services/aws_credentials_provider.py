@@ -109,6 +109,7 @@ class AWSCredentialsProvider:
         if auth_type == "iam_role":
             # IAM Role: 使用 SessionFactory 获取自动刷新的凭证
             try:
+                from costq_agents.services.credential_cache import get_credential_cache
                 from costq_agents.services.iam_role_session_factory import (
                     IAMRoleSessionFactory,
                 )
@@ -116,11 +117,14 @@ class AWSCredentialsProvider:
                     UserStoragePostgreSQL,
                 )
 
-                user_storage = UserStoragePostgreSQL()
-
-                # 获取 External ID
-                external_id = user_storage.get_organization_external_id(
-                    account["org_id"]
+                # 获取 External ID（按账号缓存、以组织 updated_at 为版本，
+                # clear_instance 时同步失效）
+                external_id = get_credential_cache().get_external_id(
+                    str(account_id),
+                    str(account.get("org_updated_at")),
+                    lambda: UserStoragePostgreSQL().get_organization_external_id(
+                        account["org_id"]
+                    ),
                 )
 
                 # 获取或创建 SessionFactory（自动刷新凭证）
@@ -152,8 +156,14 @@ class AWSCredentialsProvider:
         else:
             # AKSK: 解密 Secret Access Key
             try:
-                secret_access_key = self.credential_manager.decrypt_secret_key(
-                    account["secret_access_key_encrypted"]
+                from costq_agents.services.credential_cache import get_credential_cache
+
+                secret_access_key = get_credential_cache().get_secret(
+                    str(account_id),
+                    version=str(account.get("updated_at")),
+                    loader=lambda: self.credential_manager.decrypt_secret_key(
+                        account["secret_access_key_encrypted"]
+                    ),
                 )
             except Exception as e:
                 logger.error(
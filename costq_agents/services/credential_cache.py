@@ -0,0 +1,235 @@
+"""解密凭证与组织 External ID 的进程内缓存
+
+AKSK 请求每次都要 Fernet 解密 Secret Key，IAM Role 请求每次都要读取组织的
+External ID。两者在账号配置不变时结果相同，因此按账号缓存：
+
+    - Secret Key：键为账号 UUID，版本为账号的 updated_at（账号更新后自动失效）
+    - External ID：键为账号 UUID（与 IAMRoleSessionFactory 实例一一对应），版本为组织的
+      updated_at（组织轮换 External ID 后自动失效）
+
+安全措施：
+    - 明文 Secret Key 以 bytearray 保存，淘汰 / 失效 / 过期时原地清零
+    - 有界 LRU + TTL，长期不用的账号不会常驻内存
+    - IAMRoleSessionFactory.clear_instance() / clear_all_instances() 同步清除对应缓存
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _SecretEntry:
+    """Secret Key 缓存条目"""
+
+    version: str
+    secret: bytearray
+    cached_at: float
+
+
+@dataclass
+class _ExternalIdEntry:
+    """External ID 缓存条目"""
+
+    version: str
+    external_id: str
+    cached_at: float
+
+
+def _zero(buffer: bytearray) -> None:
+    """原地清零"""
+    buffer[:] = bytes(len(buffer))
+
+
+class CredentialCache:
+    """有界 LRU + TTL 的凭证缓存（线程安全）
+
+    Attributes:
+        max_entries: 每类缓存的最大条目数
+        ttl_seconds: 条目有效期（秒）
+
+    Examples:
+        >>> cache = get_credential_cache()
+        >>> secret = cache.get_secret(
+        ...     account_uuid, version=str(updated_at),
+        ...     loader=lambda: manager.decrypt_secret_key(encrypted),
+        ... )
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 900.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """初始化缓存
+
+        Args:
+            max_entries: 每类缓存的最大条目数
+            ttl_seconds: 条目有效期（秒）
+            clock: 单调时钟（测试时可注入）
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._secrets: OrderedDict[str, _SecretEntry] = OrderedDict()
+        self._external_ids: OrderedDict[str, _ExternalIdEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    # ==================== Secret Key ====================
+
+    def get_secret(self, account_uuid: str, version: str, loader: Callable[[], str]) -> str:
+        """获取解密后的 Secret Key（未命中时调用 loader 解密并缓存）
+
+        Args:
+            account_uuid: 账号 UUID
+            version: 账号版本（updated_at），与缓存不一致时视为未命中
+            loader: 解密函数
+
+        Returns:
+            str: 明文 Secret Key
+
+        Notes:
+            - loader 在锁外执行；并发未命中时可能重复解密，结果一致
+            - 返回值是 str 副本，清零只作用于缓存内部的 bytearray
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._secrets.get(account_uuid)
+            if entry is not None:
+                if entry.version == version and now - entry.cached_at < self.ttl_seconds:
+                    self._secrets.move_to_end(account_uuid)
+                    self._stats["hits"] += 1
+                    return entry.secret.decode()
+                # 版本变化或过期：立即清除旧明文
+                self._drop_secret(account_uuid)
+            self._stats["misses"] += 1
+
+        secret = loader()
+
+        with self._lock:
+            previous = self._secrets.pop(account_uuid, None)
+            if previous is not None:
+                _zero(previous.secret)
+            self._secrets[account_uuid] = _SecretEntry(
+                version=version, secret=bytearray(secret.encode()), cached_at=self._clock()
+            )
+            while len(self._secrets) > self.max_entries:
+                evicted_key, evicted = self._secrets.popitem(last=False)
+                _zero(evicted.secret)
+                self._stats["evictions"] += 1
+                logger.debug("凭证缓存淘汰", extra={"account_uuid": evicted_key})
+        return secret
+
+    def _drop_secret(self, account_uuid: str) -> bool:
+        """移除并清零 Secret Key（调用方需持有锁）"""
+        entry = self._secrets.pop(account_uuid, None)
+        if entry is None:
+            return False
+        _zero(entry.secret)
+        return True
+
+    # ==================== External ID ====================
+
+    def get_external_id(self, account_uuid: str, version: str, loader: Callable[[], str]) -> str:
+        """获取账号所属组织的 External ID（未命中时调用 loader 读取并缓存）
+
+        Args:
+            account_uuid: 账号 UUID
+            version: 组织版本（organizations.updated_at），与缓存不一致时视为未命中
+            loader: 读取函数（通常为 UserStoragePostgreSQL.get_organization_external_id）
+
+        Returns:
+            str: External ID
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._external_ids.get(account_uuid)
+            if (
+                entry is not None
+                and entry.version == version
+                and now - entry.cached_at < self.ttl_seconds
+            ):
+                self._external_ids.move_to_end(account_uuid)
+                self._stats["hits"] += 1
+                return entry.external_id
+            self._stats["misses"] += 1
+
+        external_id = loader()
+        self.put_external_id(account_uuid, external_id, version)
+        return external_id
+
+    def put_external_id(self, account_uuid: str, external_id: str, version: str) -> None:
+        """写入 External ID（如账号解析查询已一并取回）"""
+        with self._lock:
+            self._external_ids.pop(account_uuid, None)
+            self._external_ids[account_uuid] = _ExternalIdEntry(
+                version=version, external_id=external_id, cached_at=self._clock()
+            )
+            while len(self._external_ids) > self.max_entries:
+                self._external_ids.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    # ==================== 失效 ====================
+
+    def invalidate(self, account_uuid: str) -> None:
+        """清除指定账号的缓存凭证和 External ID（账号删除或更新时）
+
+        Args:
+            account_uuid: 账号 UUID
+        """
+        with self._lock:
+            secret_dropped = self._drop_secret(account_uuid)
+            external_id_dropped = self._external_ids.pop(account_uuid, None) is not None
+            if secret_dropped or external_id_dropped:
+                self._stats["invalidations"] += 1
+                logger.info("🔄 已清除账号凭证缓存", extra={"account_uuid": account_uuid})
+
+    def clear(self) -> None:
+        """清除全部缓存（明文全部清零）"""
+        with self._lock:
+            for entry in self._secrets.values():
+                _zero(entry.secret)
+            self._secrets.clear()
+            self._external_ids.clear()
+
+    def stats(self) -> dict[str, int]:
+        """获取缓存统计"""
+        with self._lock:
+            return {
+                **self._stats,
+                "secrets": len(self._secrets),
+                "external_ids": len(self._external_ids),
+            }
+
+
+# 全局单例
+_credential_cache: CredentialCache | None = None
+_credential_cache_lock = threading.Lock()
+
+
+def get_credential_cache() -> CredentialCache:
+    """获取全局凭证缓存
+
+    Returns:
+        CredentialCache: 缓存实例
+    """
+    global _credential_cache
+
+    if _credential_cache is None:
+        with _credential_cache_lock:
+            if _credential_cache is None:
+                from costq_agents.config.settings import settings
+
+                _credential_cache = CredentialCache(
+                    max_entries=settings.CREDENTIAL_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.CREDENTIAL_CACHE_TTL_SECONDS,
+                )
+
+    return _credential_cache
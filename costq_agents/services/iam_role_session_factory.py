@@ -5,9 +5,12 @@
 核心特性：
 1. 使用 DeferredRefreshableCredentials 实现自动刷新
 2. boto3 会在凭证过期前自动调用 refresh 方法
-3. 支持多账号（每个 account_id 独立实例）
+3. 支持多账号（按 (account_id, role_arn, external_id, region, duration) 注册）
 4. 支持 ExternalId 安全验证
 5. 线程安全
+6. 有界 LRU + 空闲 TTL 注册表（淘汰指标见 registry_stats()）
+7. 提前刷新：由 CredentialRefresher 在剩余有效期低于余量时后台 AssumeRole，
+   并发刷新 single-flight，请求不阻塞在 STS 上
 
 与 Bedrock SessionFactory 的区别：
 - Bedrock: 单例模式，一个 Role（平台 Bedrock 账号）
@@ -22,14 +25,26 @@
 import datetime
 import logging
 import threading
+import time
+from collections import OrderedDict
 
 import boto3
 import botocore.credentials
 import botocore.session
 from dateutil.tz import tzlocal
 
+from costq_agents.config.settings import settings
+from costq_agents.utils.credential_refresher import (
+    AssumeRoleSource,
+    effective_refresh_margin,
+    get_credential_refresher,
+)
+
 logger = logging.getLogger(__name__)
 
+# 注册表键：(account_id, role_arn, external_id, region, duration_seconds)
+RegistryKey = tuple[str, str, str, str, int]
+
 
 class IAMRoleSessionFactory:
     """为客户 IAM Role 创建可自动刷新凭证的 Session
@@ -52,9 +67,23 @@ class IAMRoleSessionFactory:
         ce_client = session.client('ce')
     """
 
-    # 多账号实例缓存：{account_id: IAMRoleSessionFactory}
-    _instances: dict[str, "IAMRoleSessionFactory"] = {}
+    # 多账号实例注册表（LRU 顺序）：{RegistryKey: IAMRoleSessionFactory}
+    _instances: "OrderedDict[RegistryKey, IAMRoleSessionFactory]" = OrderedDict()
+    # account_id -> 当前注册键（同一账号的 Role / ExternalId / 区域变化时替换旧实例）
+    _account_keys: dict[str, RegistryKey] = {}
     _instances_lock = threading.Lock()
+    _registry_stats = {
+        "hits": 0,
+        "misses": 0,
+        "evictions_lru": 0,
+        "evictions_idle": 0,
+        "identity_changes": 0,
+    }
+
+    # 注册表上限与空闲过期（测试时可覆盖）
+    max_instances: int = settings.IAM_ROLE_FACTORY_MAX_INSTANCES
+    idle_ttl_seconds: float = settings.IAM_ROLE_FACTORY_IDLE_TTL_SECONDS
+    _clock = staticmethod(time.monotonic)
 
     def __init__(
         self,
@@ -63,6 +92,7 @@ class IAMRoleSessionFactory:
         external_id: str,
         region: str = "us-east-1",
         duration_seconds: int = 3600,
+        refresh_margin_seconds: int | None = None,
     ):
         """初始化 IAM Role Session Factory
 
@@ -72,17 +102,32 @@ class IAMRoleSessionFactory:
             external_id: 组织的 External ID（防止混淆代理人攻击）
             region: AWS 区域
             duration_seconds: 凭证有效期（秒），默认 3600（1小时）
+            refresh_margin_seconds: 提前刷新余量（秒，默认读取配置；最多为有效期的一半，
+                但不低于 botocore mandatory 刷新窗口 + 保留时间）
+
+        Raises:
+            ValueError: duration_seconds 过短，无法留出高于 mandatory 窗口的刷新余量
         """
         self.account_id = account_id
         self.role_arn = role_arn
         self.external_id = external_id
         self.region = region
         self.duration_seconds = duration_seconds
+        margin = (
+            refresh_margin_seconds
+            if refresh_margin_seconds is not None
+            else settings.IAM_ROLE_REFRESH_MARGIN_SECONDS
+        )
+        self.refresh_margin_seconds = effective_refresh_margin(margin, duration_seconds)
 
         # 缓存的 boto3 Session（带自动刷新凭证）
         self._session: boto3.Session | None = None
         self._session_lock = threading.Lock()
 
+        # AssumeRole 凭证源（single-flight，注册到后台刷新器）
+        self._credential_source: AssumeRoleSource | None = None
+        self.last_used_at = self._clock()
+
         logger.info(
             f"🏭 IAMRoleSessionFactory 初始化 - "
             f"Account: {account_id}, Role: {role_arn}, "
@@ -98,9 +143,13 @@ class IAMRoleSessionFactory:
         region: str = "us-east-1",
         duration_seconds: int = 3600,
     ) -> "IAMRoleSessionFactory":
-        """获取指定账号的 SessionFactory 实例（多实例模式）
+        """获取指定账号身份的 SessionFactory 实例（多实例模式）
 
-        每个 account_id 有独立的实例，线程安全。
+        注册表按完整身份 (account_id, role_arn, external_id, region, duration_seconds)
+        索引，线程安全：
+            - 同一账号身份变化（如更换 Role）时替换旧实例，不再返回过期的 Role
+            - 超过 max_instances 时淘汰最久未使用的实例
+            - 空闲超过 idle_ttl_seconds 的实例在下一次访问注册表时淘汰
 
         Args:
             account_id: 账号 ID
@@ -112,32 +161,89 @@ class IAMRoleSessionFactory:
         Returns:
             IAMRoleSessionFactory: 工厂实例
         """
-        if account_id not in cls._instances:
-            with cls._instances_lock:
-                # Double-check locking
-                if account_id not in cls._instances:
-                    cls._instances[account_id] = cls(
-                        account_id=account_id,
-                        role_arn=role_arn,
-                        external_id=external_id,
-                        region=region,
-                        duration_seconds=duration_seconds,
-                    )
-        return cls._instances[account_id]
+        key: RegistryKey = (account_id, role_arn, external_id, region, duration_seconds)
+        now = cls._clock()
+
+        with cls._instances_lock:
+            cls._evict_idle_locked(now)
+
+            instance = cls._instances.get(key)
+            if instance is not None:
+                cls._instances.move_to_end(key)
+                cls._registry_stats["hits"] += 1
+                instance.last_used_at = now
+                return instance
+
+            cls._registry_stats["misses"] += 1
+            previous_key = cls._account_keys.get(account_id)
+            if previous_key is not None:
+                cls._instances.pop(previous_key, None)
+                cls._registry_stats["identity_changes"] += 1
+                logger.info(
+                    f"🔄 账号身份已变化，替换 IAMRoleSessionFactory 实例 - Account: {account_id}"
+                )
+
+            instance = cls(
+                account_id=account_id,
+                role_arn=role_arn,
+                external_id=external_id,
+                region=region,
+                duration_seconds=duration_seconds,
+            )
+            cls._instances[key] = instance
+            cls._account_keys[account_id] = key
+
+            while len(cls._instances) > cls.max_instances:
+                evicted_key, _ = cls._instances.popitem(last=False)
+                cls._account_keys.pop(evicted_key[0], None)
+                cls._registry_stats["evictions_lru"] += 1
+                logger.debug(f"IAMRoleSessionFactory LRU 淘汰 - Account: {evicted_key[0]}")
+
+        return instance
+
+    @classmethod
+    def _evict_idle_locked(cls, now: float) -> None:
+        """淘汰空闲过期的实例（调用方需持有 _instances_lock）"""
+        # LRU 顺序：从最久未使用的一端开始检查
+        while cls._instances:
+            oldest_key, oldest = next(iter(cls._instances.items()))
+            if now - oldest.last_used_at < cls.idle_ttl_seconds:
+                break
+            cls._instances.popitem(last=False)
+            cls._account_keys.pop(oldest_key[0], None)
+            cls._registry_stats["evictions_idle"] += 1
+
+    @classmethod
+    def registry_stats(cls) -> dict[str, int]:
+        """获取注册表统计（命中、淘汰、身份变化、当前大小）"""
+        with cls._instances_lock:
+            return {
+                **cls._registry_stats,
+                "size": len(cls._instances),
+                "max_instances": cls.max_instances,
+            }
 
     @classmethod
     def clear_instance(cls, account_id: str):
         """清除指定账号的实例（用于账号删除或更新）
 
+        同时清除该账号在 CredentialCache 中的解密凭证和 External ID。
+
         Args:
             account_id: 账号 ID
         """
         with cls._instances_lock:
-            if account_id in cls._instances:
+            key = cls._account_keys.pop(account_id, None)
+            if key is not None:
                 logger.info(
                     f"🔄 清除 IAMRoleSessionFactory 实例 - Account: {account_id}"
                 )
-                del cls._instances[account_id]
+                cls._instances.pop(key, None)
+
+        # 同步清除该账号的解密凭证 / External ID 缓存
+        from costq_agents.services.credential_cache import get_credential_cache
+
+        get_credential_cache().invalidate(account_id)
 
     @classmethod
     def clear_all_instances(cls):
@@ -145,6 +251,11 @@ class IAMRoleSessionFactory:
         with cls._instances_lock:
             logger.info("🔄 清除所有 IAMRoleSessionFactory 实例")
             cls._instances.clear()
+            cls._account_keys.clear()
+
+        from costq_agents.services.credential_cache import get_credential_cache
+
+        get_credential_cache().clear()
 
     def _create_refreshable_session(self) -> boto3.Session:
         """创建带自动刷新凭证的 boto3 Session
@@ -174,12 +285,22 @@ class IAMRoleSessionFactory:
 
         # 4. 创建 AssumeRoleCredentialFetcher
         #    这个对象知道如何调用 STS AssumeRole API 并解析响应
+        #    expiry_window_seconds = 提前刷新余量：剩余有效期低于余量时才重新 AssumeRole，
+        #    否则直接返回缓存的凭证（botocore 的 advisory 刷新因此不会阻塞在 STS 上）
         fetcher = botocore.credentials.AssumeRoleCredentialFetcher(
             client_creator=base_session.create_client,
             source_credentials=source_credentials,
             role_arn=self.role_arn,
             extra_args=extra_args,
+            expiry_window_seconds=self.refresh_margin_seconds,
+        )
+        source = AssumeRoleSource(
+            name=f"iam-role:{self.account_id}",
+            fetcher=fetcher,
+            refresh_margin_seconds=self.refresh_margin_seconds,
         )
+        self._credential_source = source
+        get_credential_refresher().register(source)
 
         logger.debug("  ✅ AssumeRoleCredentialFetcher 已创建")
 
@@ -188,7 +309,7 @@ class IAMRoleSessionFactory:
         #    默认在凭证过期前 10 分钟自动刷新
         refreshable_creds = botocore.credentials.DeferredRefreshableCredentials(
             method="assume-role",
-            refresh_using=fetcher.fetch_credentials,  # boto3 自动调用
+            refresh_using=source.fetch_credentials,  # boto3 自动调用（single-flight）
             time_fetcher=lambda: datetime.datetime.now(tzlocal()),
         )
 
@@ -210,6 +331,12 @@ class IAMRoleSessionFactory:
 
         return session
 
+    def seconds_until_expiry(self) -> float | None:
+        """当前凭证剩余有效期（秒），尚未获取凭证时返回 None"""
+        if self._credential_source is None:
+            return None
+        return self._credential_source.seconds_until_expiry()
+
     def get_session(self) -> boto3.Session:
         """获取 boto3 Session（带自动刷新凭证）
 
@@ -275,6 +402,9 @@ class IAMRoleSessionFactory:
         with self._session_lock:
             logger.info(f"🔄 清除缓存的 Session - Account: {self.account_id}")
             self._session = None
+            if self._credential_source is not None:
+                get_credential_refresher().unregister(self._credential_source)
+                self._credential_source = None
 
     def get_client(self, service_name: str, **kwargs):
         """创建 AWS 服务客户端（自动刷新凭证）
@@ -0,0 +1,186 @@
+"""AWS 客户端工厂 - 按 (service, region, identity) 缓存 boto3 客户端
+
+boto3 每创建一个客户端都要解析 endpoint 规则、加载 service model、建立新的
+HTTP 连接池；每创建一个 Session 还要重新走一遍凭证链（容器内为 IMDS / 容器凭证端点）。
+这里在进程内统一缓存：
+
+    - Session：按 profile 缓存（None=默认凭证链 / IAM Role）
+    - 客户端：按 (service, region, profile) 缓存，共享调优后的 botocore Config
+      （连接池大小、TCP keep-alive、重试、超时）
+    - STS 使用区域端点（sts_regional_endpoints=regional）
+
+boto3 客户端线程安全，可跨请求复用；Session 创建不是线程安全的，创建过程加锁。
+"""
+
+import logging
+import threading
+from typing import Any
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 缓存键：(service_name, region_name, profile_name)
+ClientKey = tuple[str, str | None, str | None]
+
+
+def build_client_config() -> Config:
+    """构建共享的 botocore Config（读取配置）"""
+    from costq_agents.config.settings import settings
+
+    return Config(
+        max_pool_connections=settings.AWS_CLIENT_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        connect_timeout=settings.AWS_CLIENT_CONNECT_TIMEOUT,
+        read_timeout=settings.AWS_CLIENT_READ_TIMEOUT,
+        retries={
+            "mode": settings.AWS_CLIENT_RETRY_MODE,
+            "max_attempts": settings.AWS_CLIENT_MAX_ATTEMPTS,
+        },
+    )
+
+
+class AWSClientFactory:
+    """进程级 boto3 Session / 客户端缓存
+
+    Examples:
+        >>> factory = get_aws_client_factory()
+        >>> client = factory.get_client("bedrock-agent", region_name="ap-northeast-1")
+    """
+
+    def __init__(self, config: Config | None = None) -> None:
+        """初始化工厂
+
+        Args:
+            config: 共享 botocore Config（None=按配置构建）
+        """
+        self._config = config or build_client_config()
+        self._sessions: dict[str | None, boto3.Session] = {}
+        self._clients: dict[ClientKey, Any] = {}
+        self._caller_identities: dict[tuple[str | None, str | None], dict] = {}
+        self._lock = threading.Lock()
+        self._stats = {"session_creates": 0, "client_hits": 0, "client_creates": 0}
+
+    @property
+    def config(self) -> Config:
+        """共享的 botocore Config"""
+        return self._config
+
+    def get_session(self, profile_name: str | None = None) -> boto3.Session:
+        """获取缓存的 boto3 Session
+
+        Args:
+            profile_name: AWS Profile（None=默认凭证链 / IAM Role）
+
+        Returns:
+            boto3.Session: 共享 Session
+        """
+        session = self._sessions.get(profile_name)
+        if session is not None:
+            return session
+
+        with self._lock:
+            session = self._sessions.get(profile_name)
+            if session is None:
+                session = boto3.Session(profile_name=profile_name)
+                session._session.set_config_variable("sts_regional_endpoints", "regional")
+                self._sessions[profile_name] = session
+                self._stats["session_creates"] += 1
+                logger.info(
+                    "✅ boto3 Session 已创建并缓存",
+                    extra={"profile": profile_name or "default"},
+                )
+        return session
+
+    def get_client(
+        self,
+        service_name: str,
+        region_name: str | None = None,
+        profile_name: str | None = None,
+    ) -> Any:
+        """获取缓存的 boto3 客户端
+
+        Args:
+            service_name: AWS 服务名（如 bedrock-agent / sts / secretsmanager）
+            region_name: 区域（None=Session 默认区域）
+            profile_name: AWS Profile（None=默认凭证链 / IAM Role）
+
+        Returns:
+            botocore 客户端（线程安全，可跨请求复用）
+        """
+        key: ClientKey = (service_name, region_name, profile_name)
+        client = self._clients.get(key)
+        if client is not None:
+            self._stats["client_hits"] += 1
+            return client
+
+        session = self.get_session(profile_name)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = session.client(service_name, region_name=region_name, config=self._config)
+                self._clients[key] = client
+                self._stats["client_creates"] += 1
+                logger.info(
+                    "✅ AWS 客户端已创建并缓存",
+                    extra={
+                        "service": service_name,
+                        "region": region_name,
+                        "profile": profile_name or "default",
+                    },
+                )
+        return client
+
+    def get_caller_identity(
+        self, region_name: str | None = None, profile_name: str | None = None
+    ) -> dict:
+        """获取当前身份（STS GetCallerIdentity，结果按身份缓存）
+
+        Args:
+            region_name: STS 区域
+            profile_name: AWS Profile（None=默认凭证链 / IAM Role）
+
+        Returns:
+            dict: GetCallerIdentity 响应（Account / Arn / UserId）
+        """
+        key = (region_name, profile_name)
+        identity = self._caller_identities.get(key)
+        if identity is None:
+            sts = self.get_client("sts", region_name=region_name, profile_name=profile_name)
+            identity = sts.get_caller_identity()
+            self._caller_identities[key] = identity
+        return identity
+
+    def clear(self) -> None:
+        """清除所有缓存（凭证或配置变化时使用）"""
+        with self._lock:
+            self._clients.clear()
+            self._sessions.clear()
+            self._caller_identities.clear()
+
+    def stats(self) -> dict[str, int]:
+        """获取缓存统计"""
+        with self._lock:
+            return {
+                **self._stats,
+                "sessions": len(self._sessions),
+                "clients": len(self._clients),
+            }
+
+
+# 全局单例
+_aws_client_factory: AWSClientFactory | None = None
+_aws_client_factory_lock = threading.Lock()
+
+
+def get_aws_client_factory() -> AWSClientFactory:
+    """获取全局 AWS 客户端工厂"""
+    global _aws_client_factory
+
+    if _aws_client_factory is None:
+        with _aws_client_factory_lock:
+            if _aws_client_factory is None:
+                _aws_client_factory = AWSClientFactory()
+
+    return _aws_client_factory
@@ -18,6 +18,12 @@ import botocore.credentials
 import botocore.session
 from dateutil.tz import tzlocal
 
+from costq_agents.utils.credential_refresher import (
+    AssumeRoleSource,
+    effective_refresh_margin,
+    get_credential_refresher,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -31,6 +37,7 @@ class AWSSessionFactory:
     2. boto3 会在凭证过期前自动调用 refresh 方法
     3. 线程安全的单例模式
     4. 支持跨账号 AssumeRole
+    5. 由 CredentialRefresher 提前刷新，并发刷新 single-flight
 
     使用示例:
         factory = AWSSessionFactory.get_instance(
@@ -67,6 +74,9 @@ class AWSSessionFactory:
         self._session: boto3.Session | None = None
         self._session_lock = threading.Lock()
 
+        # AssumeRole 凭证源（single-flight，注册到后台刷新器）
+        self._credential_source: AssumeRoleSource | None = None
+
         logger.info(
             f"🏭 AWSSessionFactory 初始化 - "
             f"Role: {role_arn}, Region: {region}, Duration: {duration_seconds}s"
@@ -129,12 +139,26 @@ class AWSSessionFactory:
 
         # 4. 创建 AssumeRoleCredentialFetcher
         #    这个对象知道如何调用 STS AssumeRole API 并解析响应
+        #    expiry_window_seconds = 提前刷新余量，余量外直接返回缓存凭证
+        from costq_agents.config.settings import settings
+
+        refresh_margin_seconds = effective_refresh_margin(
+            settings.IAM_ROLE_REFRESH_MARGIN_SECONDS, self.duration_seconds
+        )
         fetcher = botocore.credentials.AssumeRoleCredentialFetcher(
             client_creator=base_session.create_client,
             source_credentials=source_credentials,
             role_arn=self.role_arn,
             extra_args=extra_args,
+            expiry_window_seconds=refresh_margin_seconds,
+        )
+        source = AssumeRoleSource(
+            name=f"bedrock:{self.role_session_name}",
+            fetcher=fetcher,
+            refresh_margin_seconds=refresh_margin_seconds,
         )
+        self._credential_source = source
+        get_credential_refresher().register(source)
 
         logger.debug("  ✅ AssumeRoleCredentialFetcher 已创建")
 
@@ -142,7 +166,7 @@ class AWSSessionFactory:
         #    这是核心：boto3 会自动调用 refresh_using 刷新凭证
         refreshable_creds = botocore.credentials.DeferredRefreshableCredentials(
             method="assume-role",
-            refresh_using=fetcher.fetch_credentials,  # 刷新时调用这个方法
+            refresh_using=source.fetch_credentials,  # 刷新时调用这个方法（single-flight）
             time_fetcher=lambda: datetime.datetime.now(tzlocal()),
         )
 
@@ -196,6 +220,9 @@ class AWSSessionFactory:
         with self._session_lock:
             logger.info("🔄 清除缓存的 Session")
             self._session = None
+            if self._credential_source is not None:
+                get_credential_refresher().unregister(self._credential_source)
+                self._credential_source = None
 
     @classmethod
     def clear_instance(cls):
@@ -0,0 +1,262 @@
+"""AssumeRole 凭证后台刷新器
+
+AWSSessionFactory / IAMRoleSessionFactory 使用 DeferredRefreshableCredentials，
+落在 botocore 刷新窗口里的请求会同步调用 STS AssumeRole，并发时多个线程还可能
+同时触发刷新。这里统一处理：
+
+    AssumeRoleSource
+        - 包装 AssumeRoleCredentialFetcher，作为 botocore 的 refresh_using 回调
+        - single-flight：同一角色同一时刻只有一个 AssumeRole 调用，其余调用方等待后命中缓存
+        - fetcher 的 expiry_window_seconds = 刷新余量（大于 botocore 15 分钟 advisory 窗口），
+          余量外直接返回缓存凭证
+
+    CredentialRefresher
+        - 后台线程按间隔扫描所有已注册的 AssumeRoleSource
+        - 剩余有效期低于余量时提前刷新，botocore 进入刷新窗口时直接拿到新凭证
+        - 导出刷新次数、失败次数、AssumeRole 耗时和各角色剩余有效期
+"""
+
+import datetime
+import logging
+import threading
+import time
+import weakref
+from typing import Any
+
+from dateutil.parser import isoparse
+from dateutil.tz import tzlocal
+
+logger = logging.getLogger(__name__)
+
+# botocore RefreshableCredentials 的 mandatory 刷新窗口（秒）：剩余有效期低于该值时
+# 刷新回调返回的凭证若仍在窗口内，botocore 抛出 "refreshed credentials are still expired"
+BOTOCORE_MANDATORY_REFRESH_SECONDS = 600
+# 刷新余量在 mandatory 窗口之上额外保留的时间（秒）
+REFRESH_MARGIN_SLACK_SECONDS = 60
+
+
+def effective_refresh_margin(margin_seconds: int, duration_seconds: int) -> int:
+    """计算实际使用的提前刷新余量
+
+    余量最多为有效期的一半，但不低于 mandatory 窗口 + 余量保留时间，保证 fetcher
+    在 botocore 进入 mandatory 窗口之前就已换到新凭证。
+
+    Args:
+        margin_seconds: 配置的提前刷新余量（秒）
+        duration_seconds: AssumeRole 凭证有效期（秒）
+
+    Returns:
+        int: 实际刷新余量（秒）
+
+    Raises:
+        ValueError: 有效期过短，无法留出高于 mandatory 窗口的余量
+    """
+    floor = BOTOCORE_MANDATORY_REFRESH_SECONDS + REFRESH_MARGIN_SLACK_SECONDS
+    if duration_seconds <= floor:
+        raise ValueError(
+            f"AssumeRole 有效期 {duration_seconds}s 过短：刷新余量至少需要 {floor}s"
+            f"（botocore mandatory 刷新窗口 {BOTOCORE_MANDATORY_REFRESH_SECONDS}s）"
+        )
+    return max(min(margin_seconds, duration_seconds // 2), floor)
+
+
+class AssumeRoleSource:
+    """单个角色的 AssumeRole 凭证源（single-flight）
+
+    Attributes:
+        name: 角色标识（日志与指标使用）
+        refresh_margin_seconds: 提前刷新余量（秒）
+    """
+
+    def __init__(self, name: str, fetcher: Any, refresh_margin_seconds: float) -> None:
+        """初始化凭证源
+
+        Args:
+            name: 角色标识
+            fetcher: AssumeRoleCredentialFetcher（expiry_window_seconds 应等于刷新余量）
+            refresh_margin_seconds: 提前刷新余量（秒）
+        """
+        self.name = name
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._fetcher = fetcher
+        self._fetch_lock = threading.Lock()
+        self._expiry_time: datetime.datetime | None = None
+        self.assume_role_count = 0
+        self.last_assume_role_seconds: float | None = None
+
+    def fetch_credentials(self) -> dict:
+        """获取凭证（botocore refresh_using 回调）
+
+        串行化调用：等待中的线程拿到锁时，fetcher 缓存中已是新凭证，不会重复 AssumeRole。
+
+        Returns:
+            dict: access_key / secret_key / token / expiry_time
+        """
+        with self._fetch_lock:
+            previous_expiry = self._expiry_time
+            start = time.monotonic()
+            credentials = self._fetcher.fetch_credentials()
+            duration = time.monotonic() - start
+            self._expiry_time = isoparse(credentials["expiry_time"])
+            if self._expiry_time != previous_expiry:
+                # 过期时间变化 = 实际调用了 STS AssumeRole
+                self.assume_role_count += 1
+                self.last_assume_role_seconds = duration
+                logger.debug(
+                    f"📋 AssumeRole 完成 - Role: {self.name}, "
+                    f"Expiry: {credentials['expiry_time']}, Duration: {duration:.3f}s"
+                )
+            return credentials
+
+    def seconds_until_expiry(self) -> float | None:
+        """当前凭证剩余有效期（秒），尚未获取凭证时返回 None"""
+        if self._expiry_time is None:
+            return None
+        return (self._expiry_time - datetime.datetime.now(tzlocal())).total_seconds()
+
+    def needs_refresh(self) -> bool:
+        """是否已进入提前刷新余量（尚未获取过凭证的角色不主动刷新）"""
+        remaining = self.seconds_until_expiry()
+        return remaining is not None and remaining < self.refresh_margin_seconds
+
+
+class CredentialRefresher:
+    """后台凭证刷新器
+
+    Examples:
+        >>> refresher = get_credential_refresher()
+        >>> refresher.register(source)
+        >>> refresher.stats()["refreshes"]
+    """
+
+    def __init__(self, interval_seconds: float = 60.0) -> None:
+        """初始化刷新器
+
+        Args:
+            interval_seconds: 扫描间隔（秒），需明显小于刷新余量与 botocore 窗口之差
+        """
+        self.interval_seconds = interval_seconds
+        # 弱引用：工厂实例被淘汰后其凭证源自动退出刷新
+        self._sources: "weakref.WeakSet[AssumeRoleSource]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._stats = {
+            "scans": 0,
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "refresh_seconds_total": 0.0,
+            "refresh_seconds_max": 0.0,
+        }
+
+    def register(self, source: AssumeRoleSource) -> None:
+        """注册凭证源（首次注册时启动后台线程）"""
+        with self._lock:
+            self._sources.add(source)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop_event.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="credential-refresher", daemon=True
+                )
+                self._thread.start()
+
+    def unregister(self, source: AssumeRoleSource) -> None:
+        """注销凭证源"""
+        with self._lock:
+            self._sources.discard(source)
+
+    def refresh_due(self) -> int:
+        """刷新所有进入余量的凭证源
+
+        Returns:
+            int: 本轮刷新成功的数量
+        """
+        with self._lock:
+            sources = list(self._sources)
+            self._stats["scans"] += 1
+
+        refreshed = 0
+        for source in sources:
+            if not source.needs_refresh():
+                continue
+            start = time.monotonic()
+            try:
+                source.fetch_credentials()
+            except Exception as e:
+                with self._lock:
+                    self._stats["refresh_failures"] += 1
+                # 刷新失败不影响请求：botocore 到期前仍会同步刷新
+                logger.warning(
+                    "⚠️ AssumeRole 凭证提前刷新失败",
+                    extra={"role": source.name, "error_type": type(e).__name__, "error": str(e)},
+                )
+                continue
+            duration = time.monotonic() - start
+            refreshed += 1
+            with self._lock:
+                self._stats["refreshes"] += 1
+                self._stats["refresh_seconds_total"] += duration
+                self._stats["refresh_seconds_max"] = max(
+                    self._stats["refresh_seconds_max"], duration
+                )
+            logger.info(
+                "🔄 AssumeRole 凭证已提前刷新",
+                extra={
+                    "role": source.name,
+                    "duration_seconds": round(duration, 3),
+                    "seconds_until_expiry": int(source.seconds_until_expiry() or 0),
+                },
+            )
+        return refreshed
+
+    def _run(self) -> None:
+        """后台扫描循环"""
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                self.refresh_due()
+            except Exception:
+                logger.exception("凭证刷新器扫描异常")
+
+    def stop(self) -> None:
+        """停止后台线程"""
+        self._stop_event.set()
+
+    def stats(self) -> dict[str, Any]:
+        """获取刷新指标
+
+        Returns:
+            dict: 扫描/刷新/失败次数、AssumeRole 耗时（总计、最大）及各角色剩余有效期
+        """
+        with self._lock:
+            sources = list(self._sources)
+            stats = dict(self._stats)
+        stats["sources"] = {
+            source.name: {
+                "seconds_until_expiry": source.seconds_until_expiry(),
+                "assume_role_count": source.assume_role_count,
+                "last_assume_role_seconds": source.last_assume_role_seconds,
+            }
+            for source in sources
+        }
+        return stats
+
+
+# 全局单例
+_credential_refresher: CredentialRefresher | None = None
+_credential_refresher_lock = threading.Lock()
+
+
+def get_credential_refresher() -> CredentialRefresher:
+    """获取全局凭证刷新器"""
+    global _credential_refresher
+
+    if _credential_refresher is None:
+        with _credential_refresher_lock:
+            if _credential_refresher is None:
+                from costq_agents.config.settings import settings
+
+                _credential_refresher = CredentialRefresher(
+                    interval_seconds=settings.CREDENTIAL_REFRESH_INTERVAL_SECONDS
+                )
+
+    return _credential_refresher
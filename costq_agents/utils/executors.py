@@ -0,0 +1,220 @@
+"""运行时共享的有界线程池注册表
+
+invoke() 以前在每个对话请求中新建 ThreadPoolExecutor(max_workers=1) 包装
+create_agent_with_memory，超时后 shutdown(wait=False) 会留下无人管理的线程；其余
+阻塞调用（数据库、STS、Fernet 解密、MCP 租用）要么直接跑在事件循环上，要么走
+asyncio.to_thread 的默认线程池，彼此抢占且没有任何指标。
+
+    - 按工作类型命名的线程池（db / aws / memory / cpu / mcp），进程内共享、按需创建
+    - 线程数有上限，排队任务数超过 EXECUTOR_MAX_QUEUE 时拒绝（ExecutorSaturatedError）
+    - 记录队列深度、排队等待时间、执行时间
+    - run_blocking() 复制 contextvars（与 asyncio.to_thread 一致，OTel span 上下文不丢）
+    - 进程退出时统一关闭
+
+Examples:
+    >>> agent = await run_blocking("memory", manager.create_agent_with_memory, tools=tools)
+    >>> executor_stats()["memory"]["wait_seconds_max"]
+"""
+
+import asyncio
+import atexit
+import contextvars
+import functools
+import logging
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 未在 EXECUTOR_POOL_WORKERS 中配置的线程池默认线程数
+DEFAULT_POOL_WORKERS = 4
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """线程池排队任务数已达上限"""
+
+
+class BoundedExecutor:
+    """带指标的有界线程池
+
+    Attributes:
+        name: 线程池名称
+        max_workers: 最大线程数
+        max_queue: 最大排队任务数（0=不限制）
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int = 0) -> None:
+        """初始化线程池
+
+        Args:
+            name: 线程池名称（同时作为线程名前缀）
+            max_workers: 最大线程数
+            max_queue: 最大排队任务数（0=不限制）
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"costq-{name}"
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "run_seconds_total": 0.0,
+            "run_seconds_max": 0.0,
+        }
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        """提交任务
+
+        Args:
+            fn: 阻塞函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+
+        Returns:
+            Future: 任务结果
+
+        Raises:
+            ExecutorSaturatedError: 排队任务数已达上限
+        """
+        with self._lock:
+            if self.max_queue and self._queued >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise ExecutorSaturatedError(
+                    f"Executor '{self.name}' saturated ({self._queued} tasks queued)"
+                )
+            self._queued += 1
+            self._stats["submitted"] += 1
+        try:
+            return self._executor.submit(self._run, time.monotonic(), fn, args, kwargs)
+        except RuntimeError:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+    def _run(self, enqueued_at: float, fn: Callable[..., T], args: tuple, kwargs: dict) -> T:
+        """在工作线程中执行任务并记录等待 / 执行时间"""
+        start = time.monotonic()
+        wait = start - enqueued_at
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._stats["wait_seconds_total"] += wait
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], wait)
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            duration = time.monotonic() - start
+            with self._lock:
+                self._running -= 1
+                self._stats["failed" if failed else "completed"] += 1
+                self._stats["run_seconds_total"] += duration
+                self._stats["run_seconds_max"] = max(self._stats["run_seconds_max"], duration)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭线程池（取消尚未开始的任务）"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> dict[str, Any]:
+        """获取指标（当前队列深度、运行中任务数、等待 / 执行时间）"""
+        with self._lock:
+            stats: dict[str, Any] = dict(self._stats)
+            stats["queue_depth"] = self._queued
+            stats["running"] = self._running
+        stats["max_workers"] = self.max_workers
+        started = stats["completed"] + stats["failed"] + stats["running"]
+        stats["wait_seconds_avg"] = (
+            round(stats["wait_seconds_total"] / started, 4) if started else 0.0
+        )
+        return stats
+
+
+# 全局注册表
+_executors: dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str, max_workers: int | None = None) -> BoundedExecutor:
+    """获取（按需创建）命名线程池
+
+    Args:
+        name: 线程池名称（db / aws / memory / cpu / mcp 等）
+        max_workers: 首次创建时的线程数（默认取 EXECUTOR_POOL_WORKERS[name]）
+
+    Returns:
+        BoundedExecutor: 进程内共享的线程池
+    """
+    executor = _executors.get(name)
+    if executor is not None:
+        return executor
+
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            from costq_agents.config.settings import settings
+
+            workers = max_workers or settings.EXECUTOR_POOL_WORKERS.get(
+                name, DEFAULT_POOL_WORKERS
+            )
+            executor = BoundedExecutor(name, workers, max_queue=settings.EXECUTOR_MAX_QUEUE)
+            _executors[name] = executor
+            logger.info(
+                "🧵 线程池已创建",
+                extra={"executor": name, "max_workers": workers},
+            )
+    return executor
+
+
+async def run_blocking(pool: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在命名线程池中执行阻塞函数并等待结果
+
+    Args:
+        pool: 线程池名称
+        fn: 阻塞函数
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        fn 的返回值
+
+    Notes:
+        - 复制当前 contextvars（OTel span、请求上下文）到工作线程
+        - 调用方取消或 asyncio.wait_for 超时只会放弃等待，已开始的任务在共享线程池中跑完
+    """
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await asyncio.wrap_future(get_executor(pool).submit(call))
+
+
+def executor_stats() -> dict[str, dict[str, Any]]:
+    """获取所有线程池的指标"""
+    return {name: executor.stats() for name, executor in list(_executors.items())}
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    """关闭所有线程池（进程退出时调用）"""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
+
+
+atexit.register(shutdown_executors)
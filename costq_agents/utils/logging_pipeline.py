@@ -0,0 +1,271 @@
+"""低开销结构化日志管道
+
+每次 invoke 会产生数十条 logger.info(..., extra={...})，extra 字典和 f-string 在
+调用方同步构建，StreamHandler 的格式化与写 stderr 也发生在事件循环线程上。
+
+    configure_logging()
+        - 根 logger 的流/文件 handler 移到 QueueListener 后台线程，调用方只做入队
+        - OpenTelemetry handler（opentelemetry-instrument 注入）保留在根 logger 上：
+          其导出本身已是批量异步，且需要在调用线程读取当前 span 上下文
+        - 队列满时丢弃记录并计数，不阻塞事件循环
+
+    log_event()
+        - 先判断级别与采样，通过后才调用 payload 工厂构建 extra（惰性求值）
+
+    EventSampler
+        - 按 event_type 配置采样率（LOG_SAMPLE_RATES，如 {"tool_result": 0.2}）
+        - SamplingFilter 对直接使用 extra={"event_type": ...} 的记录同样生效
+
+    JsonFormatter
+        - 单行 JSON，优先使用 orjson
+"""
+
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+from collections.abc import Callable, Mapping
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 依赖缺失时回退标准库
+    orjson = None
+
+# LogRecord 的标准属性（其余属性视为 extra）
+_RECORD_ATTRS = frozenset(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", None, None)).keys()
+) | {"message", "asctime", "_sampled"}
+
+
+def _json_default(obj: Any) -> str:
+    return str(obj)
+
+
+def _dumps(payload: dict) -> str:
+    """序列化为单行 JSON 字符串"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, default=_json_default).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(payload, ensure_ascii=False, default=_json_default)
+
+
+class JsonFormatter(logging.Formatter):
+    """单行 JSON 格式化（timestamp / level / logger / message + extra 字段）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key not in payload:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return _dumps(payload)
+
+
+class EventSampler:
+    """按 event_type 采样（线程安全，未配置的类型全部保留）
+
+    Examples:
+        >>> sampler = EventSampler({"tool_result": 0.2})
+        >>> sampler.should_log("tool_result")
+    """
+
+    def __init__(
+        self,
+        rates: Mapping[str, float] | None = None,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        """初始化采样器
+
+        Args:
+            rates: event_type → 采样率（0~1）
+            rng: 随机数函数（测试时可注入）
+        """
+        self.rates = dict(rates or {})
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def should_log(self, event_type: str | None) -> bool:
+        """判断该类型的本条日志是否保留"""
+        rate = self.rates.get(event_type) if event_type else None
+        if rate is None:
+            return True
+        keep = rate >= 1.0 or (rate > 0.0 and self._rng() < rate)
+        with self._lock:
+            counters = self._stats.setdefault(event_type, {"kept": 0, "dropped": 0})
+            counters["kept" if keep else "dropped"] += 1
+        return keep
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """获取各类型保留 / 丢弃计数"""
+        with self._lock:
+            return {key: dict(value) for key, value in self._stats.items()}
+
+
+class SamplingFilter(logging.Filter):
+    """对带 event_type 的记录采样（log_event 已采样的记录直接放行）"""
+
+    def __init__(self, sampler: EventSampler) -> None:
+        super().__init__()
+        self.sampler = sampler
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # 同一条记录经过多个 handler 时只采样一次
+        sampled = getattr(record, "_sampled", None)
+        if sampled is None:
+            sampled = self.sampler.should_log(getattr(record, "event_type", None))
+            record._sampled = sampled
+        return sampled
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃记录的 QueueHandler（不阻塞调用方，不打印异常）"""
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# 全局状态
+_sampler = EventSampler()
+_listener: logging.handlers.QueueListener | None = None
+_queue_handler: DroppingQueueHandler | None = None
+
+
+def get_event_sampler() -> EventSampler:
+    """获取全局采样器"""
+    return _sampler
+
+
+def log_event(
+    target: logging.Logger,
+    level: int,
+    msg: str,
+    event_type: str,
+    payload: Callable[[], dict[str, Any]] | None = None,
+) -> None:
+    """惰性结构化日志
+
+    级别未启用或被采样丢弃时，payload 工厂不会被调用。
+
+    Args:
+        target: logger
+        level: 日志级别
+        msg: 消息
+        event_type: 事件类型（采样键，同时写入 extra）
+        payload: 返回 extra 字典的工厂
+
+    Examples:
+        >>> log_event(logger, logging.INFO, "✅ TOOL RESULT", "tool_result",
+        ...           lambda: {"tool_id": tool_id, "tool_result": preview(result)})
+    """
+    if not target.isEnabledFor(level) or not _sampler.should_log(event_type):
+        return
+    extra = payload() if payload is not None else {}
+    extra["event_type"] = event_type
+    extra["_sampled"] = True
+    target.log(level, msg, extra=extra, stacklevel=2)
+
+
+def _is_otel_handler(handler: logging.Handler) -> bool:
+    return type(handler).__module__.startswith("opentelemetry")
+
+
+def configure_logging(
+    level: str = "INFO",
+    json_format: bool = True,
+    sample_rates: Mapping[str, float] | None = None,
+    queue_size: int = 10000,
+) -> None:
+    """配置根 logger 的队列化日志管道（可重复调用，后一次覆盖前一次）
+
+    Args:
+        level: 根 logger 级别
+        json_format: 是否使用 JsonFormatter（False=文本格式）
+        sample_rates: event_type → 采样率
+        queue_size: 队列容量（满时丢弃）
+    """
+    global _listener, _queue_handler
+
+    shutdown_logging()
+    _sampler.rates = dict(sample_rates or {})
+
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+
+    formatter: logging.Formatter = (
+        JsonFormatter()
+        if json_format
+        else logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    downstream = [h for h in root.handlers if not _is_otel_handler(h)]
+    if not downstream:
+        downstream = [logging.StreamHandler(sys.stderr)]
+    for handler in downstream:
+        root.removeHandler(handler)
+        handler.setFormatter(formatter)
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _queue_handler.addFilter(SamplingFilter(_sampler))
+    root.addHandler(_queue_handler)
+    for handler in root.handlers:
+        if _is_otel_handler(handler) and not any(
+            isinstance(f, SamplingFilter) for f in handler.filters
+        ):
+            handler.addFilter(SamplingFilter(_sampler))
+
+    _listener = logging.handlers.QueueListener(
+        _queue_handler.queue, *downstream, respect_handler_level=True
+    )
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """停止后台线程并把下游 handler 还给根 logger（写完队列中剩余记录）"""
+    global _listener, _queue_handler
+
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
+    _queue_handler = None
+
+
+def logging_stats() -> dict[str, Any]:
+    """获取日志管道统计（队列长度、丢弃数、采样计数）"""
+    return {
+        "queue_size": _queue_handler.queue.qsize() if _queue_handler else 0,
+        "queue_dropped": _queue_handler.dropped if _queue_handler else 0,
+        "sampling": _sampler.stats(),
+    }
+
+
+atexit.register(shutdown_logging)
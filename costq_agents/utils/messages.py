@@ -0,0 +1,18 @@
+"""对话消息工具函数（Agent 缓存与 Memory 历史加载共用）"""
+
+from typing import Any
+
+
+def estimate_messages_bytes(messages: Any) -> int:
+    """估算对话消息占用（字符串 / 字节内容长度之和，忽略容器开销）"""
+    total = 0
+    stack = [messages]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, (str, bytes, bytearray)):
+            total += len(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+    return total
@@ -0,0 +1,59 @@
+"""Agent 缓存测试"""
+
+from types import SimpleNamespace
+
+from costq_agents.agent.agent_cache import AgentCache, tool_catalog_hash
+
+
+def _agent(text: str = "hi") -> SimpleNamespace:
+    return SimpleNamespace(messages=[{"role": "user", "content": [{"text": text}]}])
+
+
+def _key(session_id: str) -> tuple[str, str, str, str, str]:
+    return (session_id, "u1", "model", "1:abc", "hash")
+
+
+def test_checkout_is_exclusive_and_expires_after_idle_ttl(clock):
+    cache = AgentCache(idle_ttl_seconds=60, clock=clock)
+    agent = _agent()
+
+    assert cache.checkout(_key("s1")) is None
+    cache.checkin(_key("s1"), agent)
+    assert cache.checkout(_key("s1")) is agent
+    # 取出后独占：并发的同会话请求未命中
+    assert cache.checkout(_key("s1")) is None
+
+    cache.checkin(_key("s1"), agent)
+    clock.now = 61
+    assert cache.checkout(_key("s1")) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 3 and stats["expired"] == 1
+    assert stats["entries"] == 0 and stats["bytes"] == 0
+
+
+def test_lru_eviction_by_bytes():
+    cache = AgentCache(max_entries=10, max_bytes=20)
+    cache.checkin(_key("s1"), _agent("aaaa"))
+    cache.checkin(_key("s2"), _agent("bbbb"))
+    assert cache.checkout(_key("s1")) is not None
+    cache.checkin(_key("s1"), _agent("aaaa"))
+
+    # s2 最久未使用：体积超限时先淘汰
+    cache.checkin(_key("s3"), _agent("cccc"))
+    assert cache.checkout(_key("s2")) is None
+    assert cache.stats()["evictions"] == 1
+
+    # 单个 Agent 超过总上限时不缓存
+    cache.checkin(_key("s4"), _agent("x" * 20))
+    assert cache.checkout(_key("s4")) is None
+    assert cache.stats()["oversized"] == 1
+
+
+def test_tool_catalog_hash_ignores_order_and_tracks_specs():
+    a = SimpleNamespace(tool_spec={"name": "a", "description": "A"})
+    b = SimpleNamespace(tool_spec={"name": "b", "description": "B"})
+    changed = SimpleNamespace(tool_spec={"name": "b", "description": "B v2"})
+
+    assert tool_catalog_hash([a, b]) == tool_catalog_hash([b, a])
+    assert tool_catalog_hash([a, b]) != tool_catalog_hash([a, changed])
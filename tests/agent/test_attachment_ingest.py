@@ -0,0 +1,63 @@
+"""附件摄入测试"""
+
+import base64
+import tracemalloc
+
+from costq_agents.agent.attachment_ingest import (
+    decode_base64_chunked,
+    estimate_decoded_size,
+    ingest_attachments,
+)
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def test_chunked_decode_matches_stdlib():
+    data = bytes(range(256)) * 37 + b"tail"
+    encoded = base64.b64encode(data).decode()
+
+    assert decode_base64_chunked(encoded, chunk_chars=10) == data
+    # 带换行的 MIME 风格 base64
+    wrapped = base64.encodebytes(data).decode()
+    assert decode_base64_chunked(wrapped, chunk_chars=64) == data
+    assert estimate_decoded_size(encoded) == len(data)
+
+
+def test_chunked_decode_does_not_double_buffer():
+    data = bytes(range(256)) * 16384
+    encoded = base64.b64encode(data).decode()
+
+    tracemalloc.start()
+    try:
+        decoded = decode_base64_chunked(encoded, chunk_chars=64 * 1024)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert decoded == data
+    # 预分配缓冲区 + 一个解码块；拼接全部块的实现峰值约为 2 倍解码大小
+    assert peak < len(data) * 1.2
+
+
+def test_ingest_enforces_budgets_and_releases_source():
+    small = base64.b64encode(b"x" * 100).decode()
+    large = base64.b64encode(b"y" * 5000).decode()
+    images = [{"file_name": "a.png", "mime_type": "image/png", "base64_data": small}]
+    files = [
+        {"file_name": "账单 2024.xlsx", "mime_type": XLSX, "base64_data": small},
+        {"file_name": "big.xlsx", "mime_type": XLSX, "base64_data": large},
+        {"file_name": "x.exe", "mime_type": "application/x-msdownload", "base64_data": small},
+        {"file_name": "c.csv", "mime_type": "text/csv", "base64_data": small},
+    ]
+
+    result = ingest_attachments(images, files, max_file_bytes=1000, max_total_bytes=250)
+
+    assert result.blocks[0] == {"image": {"format": "png", "source": {"bytes": b"x" * 100}}}
+    assert result.blocks[1]["document"]["format"] == "xlsx"
+    assert result.blocks[1]["document"]["name"] == "_2024"
+    # big 超单文件上限，exe 不支持，c.csv 超总量
+    assert [s["file_name"] for s in result.skipped] == ["big.xlsx", "x.exe", "c.csv"]
+    assert result.stats["files"] == 2 and result.stats["total_bytes"] == 200
+    assert result.stats["estimated_peak_bytes"] > 0
+    # base64 源已从 payload 中取出
+    assert all("base64_data" not in item for item in images + files)
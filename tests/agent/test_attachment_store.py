@@ -0,0 +1,114 @@
+"""附件内容寻址存储测试"""
+
+import hashlib
+
+from costq_agents.agent.attachment_store import (
+    AttachmentStore,
+    dehydrate_history,
+    dehydrate_message,
+    rehydrate_message,
+)
+
+
+def test_dehydrate_replaces_bytes_with_hash_reference():
+    store = AttachmentStore()
+    image = b"\x89PNG" + b"0" * 1024
+    text_block = {"text": "这张图里的成本是多少？"}
+    message = {
+        "role": "user",
+        "content": [
+            text_block,
+            {"image": {"format": "png", "source": {"bytes": image}}},
+            {"document": {"format": "xlsx", "name": "bill", "source": {"bytes": b"PK.."}}},
+        ],
+    }
+
+    dehydrated = dehydrate_message(message, store)
+
+    digest = hashlib.sha256(image).hexdigest()
+    assert dehydrated is not message
+    assert dehydrated["content"][0] is text_block
+    assert dehydrated["content"][1] == {
+        "text": f"[attachment image format=png name= sha256={digest}]"
+    }
+    assert "name=bill" in dehydrated["content"][2]["text"]
+    # 原消息（本轮运行时上下文）不受影响
+    assert message["content"][1]["image"]["source"]["bytes"] is image
+    assert store.get(digest) == image
+
+
+def test_dehydrate_without_attachments_returns_original():
+    message = {"role": "user", "content": [{"text": "hi"}]}
+    assert dehydrate_message(message, AttachmentStore()) is message
+
+
+def test_store_deduplicates_and_evicts_lru():
+    store = AttachmentStore(max_bytes=10)
+    first = store.put(b"aaaa")
+    assert store.put(b"aaaa") == first
+    store.put(b"bbbb")
+    store.get(first)
+    store.put(b"cccc")
+
+    stats = store.stats()
+    assert stats["dedup_hits"] == 1
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 8
+    assert store.get(first) == b"aaaa"
+    assert store.get(hashlib.sha256(b"bbbb").hexdigest()) is None
+
+
+def test_turn_two_agent_gets_attachment_bytes_back():
+    store = AttachmentStore()
+    image = b"\x89PNG" + b"1" * 512
+    document = b"%PDF-1.7" + b"2" * 512
+    turn_one = {
+        "role": "user",
+        "content": [
+            {"text": "分析这张账单"},
+            {"image": {"format": "png", "source": {"bytes": image}}},
+            {"document": {"format": "pdf", "name": "bill_2024", "source": {"bytes": document}}},
+        ],
+    }
+
+    # 第一轮结束：持久化历史 / 缓存的 Agent 只保留哈希引用
+    persisted = dehydrate_message(turn_one, store)
+    # 显式引用该附件时还原
+    history = [rehydrate_message(persisted, store)]
+
+    content = history[0]["content"]
+    assert content[0] is persisted["content"][0]
+    assert content[1] == {"image": {"format": "png", "source": {"bytes": image}}}
+    assert content[2] == {
+        "document": {"format": "pdf", "name": "bill_2024", "source": {"bytes": document}}
+    }
+    assert dehydrate_message(history[0], store) == persisted
+
+
+def test_rehydrate_keeps_reference_when_bytes_evicted():
+    persisted = dehydrate_message(
+        {"role": "user", "content": [{"image": {"format": "png", "source": {"bytes": b"x"}}}]},
+        AttachmentStore(),
+    )
+    assert rehydrate_message(persisted, AttachmentStore()) is persisted
+
+
+def test_only_latest_turn_carries_bytes():
+    store = AttachmentStore()
+    turn_one = {
+        "role": "user",
+        "content": [{"image": {"format": "png", "source": {"bytes": b"\x89PNG-1"}}}],
+    }
+    reply = {"role": "assistant", "content": [{"text": "这是一张账单"}]}
+    turn_two = {
+        "role": "user",
+        "content": [{"image": {"format": "png", "source": {"bytes": b"\x89PNG-2"}}}],
+    }
+
+    history = dehydrate_history([turn_one, reply], store)
+    history.append(turn_two)
+
+    with_bytes = [m for m in history if any("image" in block for block in m["content"])]
+    assert with_bytes == [turn_two]
+    assert history[0]["content"][0]["text"].startswith("[attachment image format=png")
+    assert history[1] is reply
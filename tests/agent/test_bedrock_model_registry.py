@@ -0,0 +1,44 @@
+import pytest
+
+from costq_agents.agent import manager as manager_module
+from costq_agents.agent.manager import (
+    AgentManager,
+    clear_bedrock_model_registry,
+    get_bedrock_model_registry_stats,
+)
+
+
+@pytest.fixture
+def created_models(monkeypatch):
+    created = []
+
+    def fake_create(self, cache_config=None):
+        model = object()
+        created.append((self.model_id, model))
+        return model
+
+    monkeypatch.setattr(AgentManager, "_create_bedrock_model", fake_create)
+    clear_bedrock_model_registry()
+    yield created
+    clear_bedrock_model_registry()
+
+
+def test_model_shared_across_prompts(created_models):
+    dialog = AgentManager(system_prompt="dialog", model_id="model-a")
+    alert = AgentManager(system_prompt="alert", model_id="model-a")
+
+    assert dialog.bedrock_model is alert.bedrock_model
+    assert dialog.system_prompt != alert.system_prompt
+    assert len(created_models) == 1
+    assert get_bedrock_model_registry_stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_model_keyed_by_model_id_and_region(created_models, monkeypatch):
+    first = AgentManager(system_prompt="dialog", model_id="model-a")
+    other_model = AgentManager(system_prompt="dialog", model_id="model-b")
+    assert first.bedrock_model is not other_model.bedrock_model
+
+    monkeypatch.setattr(manager_module.settings, "BEDROCK_REGION", "eu-central-1")
+    other_region = AgentManager(system_prompt="dialog", model_id="model-a")
+    assert other_region.bedrock_model is not first.bedrock_model
+    assert len(created_models) == 3
@@ -0,0 +1,73 @@
+"""SSE 事件投影测试"""
+
+import json
+from types import SimpleNamespace
+
+from costq_agents.agent.event_projector import (
+    SSEFrame,
+    SSEPassthroughApp,
+    encode_sse,
+    project_and_encode,
+    project_event,
+)
+
+
+def _decode(frame: bytes) -> dict:
+    assert frame.startswith(b"data: ") and frame.endswith(b"\n\n")
+    return json.loads(frame[len(b"data: ") : -2])
+
+
+def test_projection_keeps_only_consumed_fields():
+    agent = object()
+    delta = {"contentBlockDelta": {"delta": {"text": "你好"}, "contentBlockIndex": 0}}
+    assert project_event({"event": delta, "agent": agent, "request_state": {}}) == {"event": delta}
+
+    tool_start = {
+        "contentBlockStart": {
+            "start": {"toolUse": {"toolUseId": "t1", "name": "get_cost", "input": {}}}
+        }
+    }
+    tool_use = {"toolUseId": "t1", "name": "get_cost"}
+    assert project_event({"event": tool_start, "agent": agent}) == {
+        "event": {"contentBlockStart": {"start": {"toolUse": tool_use}}}
+    }
+
+    # 非工具的 contentBlockStart、data/delta 重复文本、生命周期事件不下发
+    assert project_event({"event": {"contentBlockStart": {"start": {}}}}) is None
+    assert project_event({"data": "你好", "delta": {"text": "你好"}, "agent": agent}) is None
+    assert project_event({"init_event_loop": True}) is None
+    assert project_and_encode({"start": True}) is None
+
+
+def test_result_projected_to_metrics_and_frame_round_trips():
+    result = SimpleNamespace(
+        stop_reason="end_turn",
+        message={"role": "assistant", "content": []},
+        metrics=SimpleNamespace(
+            accumulated_usage={"inputTokens": 10, "outputTokens": 5, "totalTokens": 15},
+            accumulated_metrics={"latencyMs": 120},
+            traces=[object()],
+        ),
+        state=object(),
+    )
+    frame = project_and_encode({"result": result, "agent": object()})
+
+    assert isinstance(frame, SSEFrame)
+    assert _decode(frame) == {
+        "result": {
+            "stop_reason": "end_turn",
+            "metrics": {
+                "accumulated_usage": {"inputTokens": 10, "outputTokens": 5, "totalTokens": 15},
+                "accumulated_metrics": {"latencyMs": 120},
+            },
+        }
+    }
+
+
+def test_app_passes_frames_through_and_serializes_dicts():
+    app = SSEPassthroughApp()
+    frame = encode_sse({"message": {"role": "user", "content": [{"image": b"\x89PNG"}]}})
+
+    assert app._convert_to_sse(frame) is frame
+    assert _decode(frame)["message"]["content"][0]["image"] == "<4 bytes>"
+    assert _decode(app._convert_to_sse({"type": "token_usage"})) == {"type": "token_usage"}
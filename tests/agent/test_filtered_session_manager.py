@@ -1,6 +1,15 @@
 import copy
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from bedrock_agentcore.memory.integrations.strands.bedrock_converter import (
+    AgentCoreMemoryConverter,
+)
+from strands.types.session import SessionMessage
 
 from costq_agents.agent.filtered_session_manager import FilteredMemorySessionManager
+from costq_agents.agent.memory_write_behind import MemoryWriteBehind, PendingEvent, build_payload
 
 
 def test_strip_tool_results_replaces_content_and_keeps_ids_status():
@@ -62,3 +71,53 @@ def test_strip_tool_results_skips_invalid_tool_result_structure():
     assert filtered["content"][1]["toolResult"]["content"] == [
         {"text": "TOOL_RESULT_STRIPPED"}
     ]
+
+
+def test_strip_tool_results_shares_untouched_blocks():
+    text_block = {"text": "see attached"}
+    image_block = {"image": {"format": "png", "source": {"bytes": b"\x89PNG"}}}
+    tool_block = {
+        "toolResult": {"toolUseId": "t1", "status": "success", "content": [{"text": "x" * 1000}]}
+    }
+    original = {"role": "user", "content": [text_block, tool_block, image_block]}
+
+    filtered = FilteredMemorySessionManager._strip_tool_results(original)
+
+    assert filtered["content"][0] is text_block
+    assert filtered["content"][2] is image_block
+    assert filtered["content"][1] is not tool_block
+    assert tool_block["toolResult"]["content"] == [{"text": "x" * 1000}]
+
+
+def test_redacts_message_still_in_write_behind_queue():
+    sent: list[PendingEvent] = []
+    manager = FilteredMemorySessionManager.__new__(FilteredMemorySessionManager)
+    manager.config = SimpleNamespace(session_id="s1")
+    manager.converter = AgentCoreMemoryConverter
+    manager._write_behind = MemoryWriteBehind(send=sent.extend, submit_task=lambda task: None)
+    for role, text in (("user", "my card is 4111"), ("assistant", "noted")):
+        message = {"role": role, "content": [{"text": text}]}
+        payload = build_payload(
+            AgentCoreMemoryConverter.message_to_payload(SessionMessage.from_message(message, 0)),
+            is_blob=False,
+        )
+        manager._write_behind.submit(
+            PendingEvent(payload, datetime.now(timezone.utc), None, time.monotonic())
+        )
+
+    queued = SessionMessage.from_message(
+        {"role": "user", "content": [{"text": "my card is 4111"}]}, None
+    )
+    queued.redact_message = {"role": "user", "content": [{"text": "[REDACTED]"}]}
+    manager.update_message("s1", "default", queued)
+
+    manager._write_behind._drain()
+    restored = [
+        AgentCoreMemoryConverter.events_to_messages(
+            [{"payload": event.payload, "eventId": "e"}]
+        )[0].to_message()
+        for event in sent
+    ]
+    assert restored[0]["content"] == [{"text": "[REDACTED]"}]
+    assert restored[1]["content"] == [{"text": "noted"}]
+    assert "4111" not in sent[0].payload[0]["conversational"]["content"]["text"]
@@ -0,0 +1,69 @@
+"""短期历史窗口加载测试"""
+
+from strands.types.session import SessionMessage
+
+from costq_agents.agent.memory_history import load_recent_messages, trim_history
+
+
+def _msg(index: int, role: str = "user", block: dict | None = None) -> SessionMessage:
+    content = [block or {"text": f"m{index}"}]
+    return SessionMessage(message={"role": role, "content": content}, message_id=index)
+
+
+def _pages(total: int, page_size: int) -> dict[str | None, dict]:
+    """按时间倒序分页的假 ListEvents 响应（每个事件一条消息）"""
+    newest_first = list(range(total - 1, -1, -1))
+    pages: dict[str | None, dict] = {}
+    token = None
+    for start in range(0, total, page_size):
+        next_token = f"t{start + page_size}" if start + page_size < total else None
+        pages[token] = {
+            "events": [{"index": i} for i in newest_first[start : start + page_size]],
+            "nextToken": next_token,
+        }
+        token = next_token
+    return pages
+
+
+def _to_messages(events: list[dict]) -> list[SessionMessage]:
+    return [
+        _msg(e["index"], "user" if e["index"] % 2 == 0 else "assistant") for e in reversed(events)
+    ]
+
+
+def test_stops_paging_once_window_is_filled():
+    pages = _pages(total=500, page_size=20)
+    requested = []
+
+    def list_page(token):
+        requested.append(token)
+        return pages[token]
+
+    messages, exhausted = load_recent_messages(list_page, _to_messages, 40, float("inf"))
+
+    assert len(requested) == 2
+    assert not exhausted
+    assert [m.message_id for m in messages] == list(range(460, 500))
+
+
+def test_short_session_is_exhausted():
+    pages = _pages(total=5, page_size=20)
+    messages, exhausted = load_recent_messages(pages.__getitem__, _to_messages, 40, 1000)
+    assert exhausted
+    assert [m.message_id for m in messages] == [0, 1, 2, 3, 4]
+
+
+def test_trim_history_respects_budget_and_starts_with_user_turn():
+    messages = [
+        _msg(0),
+        _msg(1, "assistant", {"toolUse": {"toolUseId": "t1"}}),
+        _msg(2, "user", {"toolResult": {"toolUseId": "t1"}}),
+        _msg(3, "assistant"),
+        _msg(4),
+        _msg(5, "assistant"),
+    ]
+    # 窗口 4 条会以 toolResult 开头，需跳到下一条用户消息
+    assert [m.message_id for m in trim_history(messages, 4, float("inf"))] == [4, 5]
+    assert [m.message_id for m in trim_history(messages, 10, float("inf"))] == list(range(6))
+    # Token 预算只够最后两条
+    assert [m.message_id for m in trim_history(messages, 10, 5)] == [4, 5]
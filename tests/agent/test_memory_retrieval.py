@@ -0,0 +1,53 @@
+"""长期记忆检索测试"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from costq_agents.agent.memory_retrieval import MemoryRetriever, RetrievalCache
+
+
+def _memories(*texts: str) -> list[dict]:
+    return [{"content": {"text": text}, "score": 0.9} for text in texts]
+
+
+def test_concurrent_retrieval_keeps_namespace_order_and_caches(clock):
+    retriever = MemoryRetriever(
+        RetrievalCache(ttl_seconds=60, clock=clock), executor=ThreadPoolExecutor(max_workers=2)
+    )
+    gate = threading.Barrier(2, timeout=2)
+    calls = []
+
+    def fetch(namespace: str, top_k: int):
+        calls.append(namespace)
+        # 两个 namespace 必须同时在途才能通过栅栏
+        gate.wait()
+        return _memories(f"{namespace}-{top_k}")
+
+    namespaces = [("/prefs", 5, None), ("/semantic", 3, None)]
+    first = retriever.retrieve("u1", "上个月成本", namespaces, fetch)
+    second = retriever.retrieve("u1", "上个月成本", namespaces, fetch)
+
+    assert first == second == ["/prefs-5", "/semantic-3"]
+    assert sorted(calls) == ["/prefs", "/semantic"]
+    stats = retriever.cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2 and stats["hit_rate"] == 0.5
+
+    # 过期后重新检索
+    gate.reset()
+    clock.now = 61
+    retriever.retrieve("u1", "上个月成本", namespaces, fetch)
+    assert len(calls) == 4
+
+
+def test_failed_namespace_is_skipped():
+    retriever = MemoryRetriever(RetrievalCache(), executor=ThreadPoolExecutor(max_workers=2))
+
+    def fetch(namespace: str, top_k: int):
+        if namespace == "/bad":
+            raise RuntimeError("throttled")
+        return _memories("ok", "  ")
+
+    items = retriever.retrieve("u1", "q", [("/bad", 3, None), ("/good", 3, None)], fetch)
+
+    assert items == ["ok"]
+    assert retriever.cache.stats()["entries"] == 1
@@ -0,0 +1,84 @@
+"""MemoryWriteBehind 测试"""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+from costq_agents.agent.memory_write_behind import MemoryWriteBehind, PendingEvent, build_payload
+
+
+def _event(text: str, metadata=None) -> PendingEvent:
+    return PendingEvent(
+        payload=build_payload([(text, "user")], is_blob=False),
+        timestamp=datetime.now(timezone.utc),
+        metadata=metadata,
+        enqueued_at=time.monotonic(),
+    )
+
+
+def _texts(batch: list[PendingEvent]) -> list[str]:
+    return [event.payload[0]["conversational"]["content"]["text"] for event in batch]
+
+
+def _start_thread(task) -> None:
+    threading.Thread(target=task, daemon=True).start()
+
+
+def test_batches_in_order_and_splits_on_metadata():
+    sent: list[list[str]] = []
+    writer = MemoryWriteBehind(
+        send=lambda batch: sent.append(_texts(batch)),
+        max_batch=2,
+        linger_seconds=5,
+        submit_task=_start_thread,
+    )
+
+    for text in ("a", "b", "c"):
+        writer.submit(_event(text))
+    writer.submit(_event("d", metadata={"k": "v"}))
+
+    assert writer.flush(timeout=2)
+    assert sent == [["a", "b"], ["c"], ["d"]]
+    assert writer.depth() == 0
+
+
+def test_retries_with_backoff_and_never_sends_past_a_failed_batch():
+    attempts = {"a": 0}
+    state = {"poison": True}
+    sent: list[list[str]] = []
+    sleeps: list[float] = []
+
+    def send(batch):
+        texts = _texts(batch)
+        if texts == ["a"] and attempts["a"] < 2:
+            attempts["a"] += 1
+            raise RuntimeError("throttled")
+        if texts == ["poison"] and state["poison"]:
+            raise RuntimeError("bad payload")
+        sent.append(texts)
+
+    writer = MemoryWriteBehind(
+        send=send,
+        max_batch=1,
+        linger_seconds=0,
+        max_retries=2,
+        backoff_seconds=0.1,
+        submit_task=lambda task: None,
+        sleep=sleeps.append,
+    )
+    for text in ("a", "poison", "b"):
+        writer.submit(_event(text))
+    writer._drain()
+
+    # 重试耗尽的批次留在队首，后续消息不越过缺口
+    assert sent == [["a"]]
+    assert len(sleeps) == 4
+    assert sleeps[1] > sleeps[0]
+    assert writer.stalled and writer.depth() == 2
+    assert writer.flush(timeout=0) is False
+
+    # 下次 drain（入队或 flush 触发）从失败的批次重新开始
+    state["poison"] = False
+    writer._drain()
+    assert sent == [["a"], ["poison"], ["b"]]
+    assert not writer.stalled and writer.flush(timeout=0)
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import pytest
+
+from costq_agents.agent.prompt_registry import PromptRegistry, parse_prompt_arn
+
+ARN = "arn:aws:bedrock:ap-northeast-1:123456789012:prompt/ABCDEF:3"
+
+
+def test_parse_prompt_arn():
+    assert parse_prompt_arn(ARN) == ("ABCDEF", "3")
+    with pytest.raises(ValueError):
+        parse_prompt_arn("")
+    with pytest.raises(ValueError):
+        parse_prompt_arn("not-an-arn")
+
+
+def test_get_hits_cache_within_ttl(clock):
+    calls = []
+    registry = PromptRegistry(
+        loader=lambda arn: calls.append(arn) or "prompt-v1", ttl_seconds=60, clock=clock
+    )
+
+    assert registry.get(ARN) == "prompt-v1"
+    clock.now = 30
+    assert registry.get(ARN) == "prompt-v1"
+
+    assert len(calls) == 1
+    stats = registry.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_stale_value_served_while_refreshing(clock):
+    texts = iter(["prompt-v1", "prompt-v2"])
+    refreshed = threading.Event()
+
+    def loader(arn):
+        text = next(texts)
+        if text == "prompt-v2":
+            refreshed.set()
+        return text
+
+    registry = PromptRegistry(loader=loader, ttl_seconds=60, max_stale_seconds=600, clock=clock)
+    registry.get(ARN)
+
+    clock.now = 120
+    assert registry.get(ARN) == "prompt-v1"
+    assert refreshed.wait(timeout=2)
+
+    for _ in range(100):
+        if registry.stats()["refreshes"] == 1:
+            break
+        threading.Event().wait(0.01)
+    assert registry.get(ARN) == "prompt-v2"
+    assert registry.stats()["stale_hits"] == 1
+
+
+def test_refresh_failure_keeps_old_value(clock):
+    state = {"fail": False}
+
+    def loader(arn):
+        if state["fail"]:
+            raise RuntimeError("GetPrompt throttled")
+        return "prompt-v1"
+
+    registry = PromptRegistry(loader=loader, ttl_seconds=60, max_stale_seconds=600, clock=clock)
+    registry.get(ARN)
+
+    state["fail"] = True
+    clock.now = 120
+    assert registry.get(ARN) == "prompt-v1"
+
+    for _ in range(100):
+        if registry.stats()["refresh_failures"] == 1:
+            break
+        threading.Event().wait(0.01)
+    assert registry.stats()["refresh_failures"] == 1
+    assert registry.get(ARN) == "prompt-v1"
+
+
+def test_expired_beyond_max_stale_reloads_synchronously(clock):
+    texts = iter(["prompt-v1", "prompt-v2"])
+    registry = PromptRegistry(
+        loader=lambda arn: next(texts), ttl_seconds=60, max_stale_seconds=600, clock=clock
+    )
+    registry.get(ARN)
+    version_v1 = registry.get_version(ARN)
+
+    clock.now = 1000
+    assert registry.get(ARN) == "prompt-v2"
+    assert registry.stats()["misses"] == 2
+    assert registry.get_version(ARN) != version_v1
+    assert registry.get_version(ARN).startswith("3:")
+
+
+def test_concurrent_cold_misses_load_once(clock):
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def loader(arn):
+        calls.append(arn)
+        started.set()
+        release.wait(timeout=2)
+        return "prompt-v1"
+
+    registry = PromptRegistry(loader=loader, ttl_seconds=60, clock=clock)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get(ARN))) for _ in range(4)]
+    threads[0].start()
+    assert started.wait(timeout=2)
+    for thread in threads[1:]:
+        thread.start()
+    # 4 个未命中都已发生，再放行第一次加载
+    for _ in range(200):
+        if registry.stats()["misses"] == 4:
+            break
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=2)
+
+    assert results == ["prompt-v1"] * 4
+    assert len(calls) == 1
+    # 事件循环版本：命中直接返回
+    assert asyncio.run(registry.aget(ARN)) == "prompt-v1"
+    assert asyncio.run(registry.aget_version(ARN)).startswith("3:")
@@ -0,0 +1,131 @@
+"""表格附件本地摘要测试"""
+
+import base64
+import io
+import zipfile
+
+from costq_agents.agent.attachment_ingest import ingest_attachments
+from costq_agents.agent.spreadsheet_digest import (
+    GROUP_MAX_KEYS,
+    OTHER_GROUP,
+    SAMPLE_ROWS,
+    digest_spreadsheet,
+    digest_to_text,
+)
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+CSV = (
+    "service,region,usage_type,unblended_cost\n"
+    "EC2,us-east-1,BoxUsage,120.5\n"
+    "S3,us-east-1,TimedStorage,\"1,030.25\"\n"
+    "EC2,ap-northeast-1,BoxUsage,80\n"
+    "Lambda,us-east-1,Request,0.75\n"
+    "EC2,us-east-1,EBS,40\n"
+).encode()
+
+
+def _xlsx(rows: list[list[object]]) -> bytes:
+    """构造最小 XLSX（共享字符串 + 第一个工作表）"""
+    ns = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    rel_ns = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    strings: list[str] = []
+    sheet_rows = []
+    for r, row in enumerate(rows, start=1):
+        cells = []
+        for c, value in enumerate(row):
+            ref = f"{chr(65 + c)}{r}"
+            if isinstance(value, str):
+                strings.append(value)
+                cells.append(f'<c r="{ref}" t="s"><v>{len(strings) - 1}</v></c>')
+            else:
+                cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        sheet_rows.append(f'<row r="{r}">{"".join(cells)}</row>')
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr(
+            "xl/workbook.xml",
+            f'<workbook xmlns="{ns}" xmlns:r="{rel_ns}">'
+            '<sheets><sheet name="Bill" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        )
+        archive.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/bill.xml"/></Relationships>',
+        )
+        archive.writestr(
+            "xl/sharedStrings.xml",
+            f'<sst xmlns="{ns}">' + "".join(f"<si><t>{s}</t></si>" for s in strings) + "</sst>",
+        )
+        archive.writestr(
+            "xl/worksheets/bill.xml",
+            f'<worksheet xmlns="{ns}"><sheetData>{"".join(sheet_rows)}</sheetData></worksheet>',
+        )
+    return buffer.getvalue()
+
+
+def test_csv_digest_groups_and_top_rows():
+    digest = digest_spreadsheet(CSV, "csv", "cur.csv")
+
+    assert digest["rows"] == 5 and digest["truncated"] is False
+    assert digest["metric"] == "unblended_cost"
+    assert digest["group_totals"]["service"][:2] == [["S3", 1030.25], ["EC2", 240.5]]
+    assert digest["top_rows"][0]["service"] == "S3"
+    assert len(digest["top_rows"]) == 5
+    cost = next(c for c in digest["columns"] if c["name"] == "unblended_cost")
+    assert cost["type"] == "number" and cost["max"] == 1030.25
+
+    truncated = digest_spreadsheet(CSV, "csv", max_rows=2)
+    assert truncated["rows"] == 2 and truncated["truncated"] is True
+
+
+def test_xlsx_digest_streams_first_sheet():
+    data = _xlsx([["账户", "费用"], ["prod", 10], ["dev", 2.5], ["prod", 7]])
+
+    digest = digest_spreadsheet(data, "xlsx", "bill.xlsx")
+
+    assert digest["rows"] == 3
+    assert digest["metric"] == "费用"
+    assert digest["group_totals"]["账户"] == [["prod", 17.0], ["dev", 2.5]]
+    assert digest_to_text(digest).startswith('<spreadsheet_digest name="bill.xlsx">')
+
+
+def test_ingest_replaces_spreadsheet_and_appends_original_on_request():
+    encoded = base64.b64encode(CSV).decode()
+    files = [
+        {"file_name": "cur.csv", "mime_type": "text/csv", "base64_data": encoded},
+        {
+            "file_name": "raw.csv",
+            "mime_type": "text/csv",
+            "base64_data": encoded,
+            "include_original": True,
+        },
+        {"file_name": "broken.xlsx", "mime_type": XLSX, "base64_data": encoded},
+    ]
+
+    result = ingest_attachments(
+        None, files, max_file_bytes=10_000, max_total_bytes=100_000, digest_spreadsheets=True
+    )
+
+    assert "<spreadsheet_digest" in result.blocks[0]["text"]
+    # include_original：摘要之后附上原文件
+    assert '<spreadsheet_digest name="raw.csv">' in result.blocks[1]["text"]
+    assert result.blocks[2]["document"]["source"]["bytes"] == CSV
+    # 摘要失败（不是合法 XLSX）时回退为原文件
+    assert result.blocks[3]["document"]["format"] == "xlsx"
+    assert len(result.blocks) == 4
+    assert result.stats["digested"] == 2
+
+
+def test_group_keys_are_capped_with_other_bucket():
+    # 样本行基数低，之后每行一个新取值：分组字典不能随行数增长
+    rows = ["team,cost"]
+    rows += [f"t{i % 2},1" for i in range(SAMPLE_ROWS)]
+    rows += [f"user-{i},1" for i in range(GROUP_MAX_KEYS * 2)]
+
+    digest = digest_spreadsheet("\n".join(rows).encode(), "csv")
+
+    totals = dict(digest["group_totals"]["team"])
+    # 样本中的 2 个取值 + 998 个新取值占满上限，其余 1002 行并入 OTHER_GROUP
+    assert totals[OTHER_GROUP] == GROUP_MAX_KEYS * 2 - (GROUP_MAX_KEYS - 2)
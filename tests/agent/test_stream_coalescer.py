@@ -0,0 +1,51 @@
+"""DeltaCoalescer 测试"""
+
+from costq_agents.agent.stream_coalescer import DeltaCoalescer
+
+
+def _delta(text: str, index: int = 0) -> dict:
+    return {"event": {"contentBlockDelta": {"delta": {"text": text}, "contentBlockIndex": index}}}
+
+
+def _texts(frames: list[dict]) -> list[str]:
+    return [f["event"]["contentBlockDelta"]["delta"]["text"] for f in frames]
+
+
+def test_merges_until_byte_window_and_flushes_on_boundaries(clock):
+    coalescer = DeltaCoalescer(max_bytes=6, max_delay_seconds=10, clock=clock)
+
+    assert coalescer.push(_delta("ab")) == []
+    assert coalescer.push(_delta("cd")) == []
+    assert _texts(coalescer.push(_delta("ef"))) == ["abcdef"]
+
+    # 工具调用开始：先输出缓冲，再原样输出
+    tool_start = {"event": {"contentBlockStart": {"start": {"toolUse": {"name": "t"}}}}}
+    coalescer.push(_delta("g"))
+    out = coalescer.push(tool_start)
+    assert _texts(out[:1]) == ["g"] and out[1] is tool_start
+
+    # contentBlockIndex 变化
+    coalescer.push(_delta("h", index=0))
+    assert _texts(coalescer.push(_delta("i", index=1))) == ["h"]
+    assert _texts(coalescer.flush()) == ["i"]
+    assert coalescer.flush() == []
+
+    stats = coalescer.stats()
+    assert stats["text_deltas"] == 6
+    assert stats["frames"] == 5
+    assert stats["flush_size"] == 1
+
+
+def test_time_window_flushes_on_push_and_tick(clock):
+    coalescer = DeltaCoalescer(max_bytes=1024, max_delay_seconds=0.05, clock=clock)
+
+    coalescer.push(_delta("a"))
+    clock.now = 0.01
+    assert coalescer.tick() == []
+    clock.now = 0.06
+    assert _texts(coalescer.tick()) == ["a"]
+
+    coalescer.push(_delta("b"))
+    clock.now = 0.2
+    assert _texts(coalescer.push(_delta("c"))) == ["bc"]
+    assert coalescer.stats()["flush_time"] == 2
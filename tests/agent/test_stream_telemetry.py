@@ -0,0 +1,83 @@
+"""StreamTelemetry 测试"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from costq_agents.agent import stream_telemetry
+from costq_agents.agent.stream_telemetry import StreamTelemetry, bounded_json_preview
+
+
+def test_bounded_preview_stops_at_limit(monkeypatch):
+    encoded = []
+
+    def default(obj):
+        encoded.append(obj)
+        return obj.i
+
+    monkeypatch.setattr(stream_telemetry, "_preview_encoder", json.JSONEncoder(default=default))
+    big = [SimpleNamespace(i=i) for i in range(10_000)]
+    preview = bounded_json_preview(big, limit=50)
+
+    assert len(preview) == 50
+    assert preview.startswith("[0, 1, 2")
+    assert len(encoded) < 100
+
+
+def test_bounded_preview_keeps_short_values_intact():
+    assert bounded_json_preview({"a": "成本"}) == '{"a": "成本"}'
+
+
+def _tool_events():
+    start = {
+        "event": {
+            "contentBlockStart": {"start": {"toolUse": {"toolUseId": "t1", "name": "get_cost"}}}
+        }
+    }
+    result_message = {
+        "message": {
+            "role": "user",
+            "content": [{"toolResult": {"toolUseId": "t1", "content": [{"text": "ok"}]}}],
+        }
+    }
+    result = SimpleNamespace(
+        metrics=SimpleNamespace(
+            accumulated_usage={"inputTokens": 30, "outputTokens": 7, "cacheReadInputTokens": 70}
+        )
+    )
+    return start, result_message, {"result": result}
+
+
+def test_consumer_processes_tool_events_and_token_usage():
+    async def run():
+        telemetry = StreamTelemetry(max_queue_size=8)
+        telemetry.start()
+        start, result_message, result = _tool_events()
+        delta = {"event": {"contentBlockDelta": {"delta": {"text": "a"}}}}
+        for event in (start, delta, result_message, result):
+            telemetry.submit(event)
+        await telemetry.aclose()
+        return telemetry
+
+    telemetry = asyncio.run(run())
+    assert telemetry.stats() == {"submitted": 3, "processed": 3, "dropped": 0, "inline": 0}
+    assert telemetry.token_usage["input_tokens"] == 30
+    assert telemetry.token_usage["input_cache_hit_rate"] == 70.0
+    assert telemetry._tool_spans == {}
+
+
+def test_full_queue_drops_tool_events_but_keeps_result():
+    async def run():
+        telemetry = StreamTelemetry(max_queue_size=1)
+        start, result_message, result = _tool_events()
+        # 未启动消费：第二个事件起队列已满
+        telemetry.submit(start)
+        telemetry.submit(result_message)
+        telemetry.submit(result)
+        telemetry.cancel()
+        return telemetry
+
+    telemetry = asyncio.run(run())
+    assert telemetry.stats()["dropped"] == 1
+    assert telemetry.stats()["inline"] == 1
+    assert telemetry.token_usage["output_tokens"] == 7
@@ -0,0 +1,19 @@
+"""测试公共夹具"""
+
+import pytest
+
+
+class FakeClock:
+    """可手动推进的时钟（替代 time.monotonic）"""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    """从 0 开始的假时钟，测试中通过 clock.now 推进"""
+    return FakeClock()
@@ -0,0 +1,122 @@
+import asyncio
+from decimal import Decimal
+
+from costq_agents.database.account_repository import AsyncAccountRepository
+from costq_agents.database.connection import to_async_database_url
+
+AWS_COLUMNS = (
+    "id",
+    "account_id",
+    "role_arn",
+    "org_id",
+    "region",
+    "auth_type",
+    "access_key_id",
+    "secret_access_key_encrypted",
+    "updated_at",
+    "org_external_id",
+    "org_updated_at",
+    "session_age_seconds",
+    "session_found",
+)
+
+
+class FakeRow:
+    def __init__(self, **values):
+        self._mapping = values
+
+
+def aws_row(**overrides):
+    values = dict.fromkeys(AWS_COLUMNS)
+    values["session_found"] = False
+    values.update(overrides)
+    return FakeRow(**values)
+
+
+class FakeConnection:
+    def __init__(self, engine):
+        self._engine = engine
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params):
+        self._engine.calls.append(params)
+        outcome = self._engine.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return self
+
+    def fetchone(self):
+        return self._engine.row
+
+
+class FakeEngine:
+    def __init__(self, row, outcomes=None):
+        self.row = row
+        self.outcomes = outcomes or [None]
+        self.calls = []
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+def test_to_async_database_url():
+    assert (
+        to_async_database_url("postgresql://u:p@db:5432/costq?sslmode=require")
+        == "postgresql+asyncpg://u:p@db:5432/costq?ssl=require"
+    )
+    assert to_async_database_url("sqlite:///test.db") == "sqlite+aiosqlite:///test.db"
+
+
+def test_resolve_returns_account_org_and_session_in_one_query():
+    engine = FakeEngine(
+        aws_row(
+            id="uuid-1",
+            account_id="123456789012",
+            role_arn="arn:aws:iam::123456789012:role/CostQ",
+            org_id="org-1",
+            auth_type="iam_role",
+            org_external_id="org-org-1",
+            session_age_seconds=Decimal("3600.5"),
+            session_found=True,
+        )
+    )
+    repo = AsyncAccountRepository(engine_factory=lambda: engine)
+
+    resolution = asyncio.run(repo.resolve("uuid-1", "aws", session_id="session-1"))
+
+    assert len(engine.calls) == 1
+    assert resolution.account_found
+    assert resolution.org_external_id == "org-org-1"
+    assert resolution.region == "us-east-1"
+    assert resolution.session_found
+    assert resolution.session_age_seconds == 3600.5
+
+
+def test_missing_account_still_reports_session():
+    engine = FakeEngine(aws_row(session_found=False))
+    repo = AsyncAccountRepository(engine_factory=lambda: engine)
+
+    resolution = asyncio.run(repo.resolve("uuid-1", "aws", session_id="session-1"))
+
+    assert not resolution.account_found
+    assert resolution.session_checked
+    assert not resolution.session_found
+
+
+def test_session_failure_retries_without_session():
+    engine = FakeEngine(
+        aws_row(id="uuid-1", account_id="123456789012"),
+        outcomes=[ValueError("invalid input syntax for type uuid"), None],
+    )
+    repo = AsyncAccountRepository(engine_factory=lambda: engine)
+
+    resolution = asyncio.run(repo.resolve("uuid-1", "aws", session_id="not-a-uuid"))
+
+    assert [call["session_id"] for call in engine.calls] == ["not-a-uuid", None]
+    assert resolution.account_found
+    assert isinstance(resolution.session_error, ValueError)
@@ -0,0 +1,138 @@
+import pytest
+
+from costq_agents.mcp.connection_pool import MCPConnectionPool, MCPWorkerPool
+from costq_agents.mcp.credential_control import CONTROL_TOOL_NAME
+
+
+class FakeTool:
+    def __init__(self, tool_name):
+        self.tool_name = tool_name
+
+
+class FakeClient:
+    def __init__(self, name):
+        self.name = name
+        self.active = True
+        self.closed = False
+        self.env = {}
+        self.fail_control = False
+
+    def list_tools_sync(self):
+        return [FakeTool(f"{self.name}-tool"), FakeTool(CONTROL_TOOL_NAME)]
+
+    def call_tool_sync(self, tool_use_id, name, arguments):
+        assert name == CONTROL_TOOL_NAME
+        if self.fail_control or arguments["token_value"] != f"token-{self.name}":
+            return {"status": "error", "toolUseId": tool_use_id, "content": []}
+        self.env = dict(arguments["env"])
+        return {"status": "success", "toolUseId": tool_use_id, "content": []}
+
+    def _is_session_active(self):
+        return self.active
+
+    def __exit__(self, *args):
+        self.closed = True
+        self.active = False
+
+
+def make_pool(**kwargs):
+    spawned = []
+
+    def spawn():
+        client = FakeClient(f"w{len(spawned)}")
+        spawned.append(client)
+        return client, f"token-{client.name}"
+
+    return MCPWorkerPool("common-tools", spawn, **kwargs), spawned
+
+
+def test_worker_is_reused_across_leases():
+    pool, spawned = make_pool(min_size=1, max_size=2)
+    assert pool.warm_up() == 1
+
+    worker = pool.acquire()
+    assert [t.tool_name for t in worker.tools] == ["w0-tool"]
+    pool.release(worker)
+    assert pool.acquire() is worker
+
+    assert len(spawned) == 1
+    assert pool.stats()["acquired"] == 2
+
+
+def test_max_uses_recycles_worker():
+    pool, spawned = make_pool(min_size=0, max_size=1, max_uses=1)
+
+    worker = pool.acquire()
+    pool.release(worker)
+
+    assert spawned[0].closed
+    assert pool.stats()["recycled"] == 1
+    assert pool.acquire().client is spawned[1]
+
+
+def test_dead_worker_is_replaced_on_acquire():
+    pool, spawned = make_pool(min_size=0, max_size=2)
+    worker = pool.acquire()
+    pool.release(worker)
+
+    spawned[0].active = False
+    replacement = pool.acquire()
+
+    assert replacement.client is spawned[1]
+    assert pool.stats()["health_check_failures"] == 1
+
+
+def test_acquire_times_out_when_exhausted():
+    pool, _ = make_pool(min_size=0, max_size=1)
+    pool.acquire()
+
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+
+
+def test_connection_pool_skips_unpooled_and_failed_types():
+    pool, _ = make_pool(min_size=0, max_size=1)
+    connection_pool = MCPConnectionPool({"common-tools": pool}, acquire_timeout=0.05)
+
+    lease = connection_pool.acquire(["common-tools", "send-email"])
+    assert list(lease.clients) == ["common-tools"]
+
+    second = connection_pool.acquire(["common-tools"])
+    assert second.clients == {}
+
+    lease.release()
+    lease.release()
+    assert pool.stats()["idle"] == 1
+
+
+def test_credentials_injected_on_acquire_and_cleared_on_release():
+    pool, spawned = make_pool(min_size=0, max_size=1)
+    connection_pool = MCPConnectionPool({"common-tools": pool})
+    additional_env = {
+        "AWS_ACCESS_KEY_ID": "AKIA-TENANT",
+        "AWS_SECRET_ACCESS_KEY": "secret",
+        "AWS_REGION": "us-east-1",
+        "PLATFORM_AWS_PROFILE": "3532",
+    }
+
+    lease = connection_pool.acquire(["common-tools"], additional_env=additional_env)
+    assert spawned[0].env == {
+        "AWS_ACCESS_KEY_ID": "AKIA-TENANT",
+        "AWS_SECRET_ACCESS_KEY": "secret",
+        "AWS_REGION": "us-east-1",
+    }
+
+    lease.release()
+    assert spawned[0].env == {}
+    assert pool.stats()["idle"] == 1
+
+
+def test_worker_recycled_when_clear_fails():
+    pool, spawned = make_pool(min_size=0, max_size=1)
+    worker = pool.acquire(credentials={"AWS_ACCESS_KEY_ID": "AKIA-TENANT"})
+
+    spawned[0].fail_control = True
+    pool.release(worker)
+
+    assert spawned[0].closed
+    assert pool.stats()["idle"] == 0
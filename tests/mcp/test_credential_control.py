@@ -0,0 +1,45 @@
+"""池化 worker 凭证控制测试"""
+
+from costq_agents.mcp import credential_control
+from costq_agents.mcp.credential_control import CONTROL_TOKEN_ENV, register_credential_control
+from costq_agents.mcp.send_email_mcp_server.utils import ses_client
+
+
+class FakeServer:
+    def __init__(self):
+        self.tools = {}
+
+    def tool(self, name, description):
+        def decorator(fn):
+            self.tools[name] = fn
+            return fn
+
+        return decorator
+
+
+def test_second_lease_gets_fresh_ses_client(monkeypatch):
+    monkeypatch.setenv(CONTROL_TOKEN_ENV, "token")
+    monkeypatch.setattr(credential_control, "_control_token", None)
+    monkeypatch.setenv("DOCKER_CONTAINER", "1")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setattr(ses_client, "_ses_client", None)
+    server = FakeServer()
+    assert register_credential_control(server)
+    control = server.tools[credential_control.CONTROL_TOOL_NAME]
+
+    tenant_a = {"AWS_ACCESS_KEY_ID": "AKIA-A", "AWS_SECRET_ACCESS_KEY": "secret-a"}
+    tenant_b = {"AWS_ACCESS_KEY_ID": "AKIA-B", "AWS_SECRET_ACCESS_KEY": "secret-b"}
+
+    # 租约 1
+    control("token", tenant_a)
+    first = ses_client.get_ses_client()
+    assert ses_client.get_ses_client() is first
+    control("token", {})
+
+    # 租约 2：同一 worker，换了租户
+    control("token", tenant_b)
+    second = ses_client.get_ses_client()
+    control("token", {})
+
+    assert second is not first
+    assert ses_client._ses_client is None
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+from costq_agents.mcp.mcp_manager import MCPManager
+
+
+class FakeClient:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def __exit__(self, *args):
+        self.closed = True
+
+
+class SlowManager(MCPManager):
+    def __init__(self, delays, failures=()):
+        super().__init__()
+        self.delays = delays
+        self.failures = set(failures)
+        self.created = {}
+
+    def _load_client(self, name, additional_env):
+        time.sleep(self.delays.get(name, 0))
+        if name in self.failures:
+            raise RuntimeError(f"{name} failed")
+        client = FakeClient(name)
+        self.created[name] = client
+        return client, [f"{name}-tool"]
+
+
+def test_clients_load_concurrently():
+    manager = SlowManager({"common-tools": 0.2, "alert": 0.2, "gateway": 0.2})
+
+    start = time.time()
+    result = asyncio.run(manager.load_clients_async(["common-tools", "alert", "gateway"]))
+
+    assert time.time() - start < 0.5
+    assert set(result.clients) == {"common-tools", "alert", "gateway"}
+    assert result.tools["gateway"] == ["gateway-tool"]
+
+
+def test_failure_and_deadline_are_isolated():
+    manager = SlowManager({"gateway": 1.0}, failures={"alert"})
+
+    result = asyncio.run(
+        manager.load_clients_async(
+            ["common-tools", "alert", "gateway"], deadlines={"gateway": 0.1}
+        )
+    )
+
+    assert set(result.clients) == {"common-tools"}
+    assert "alert failed" in result.errors["alert"]
+    assert result.errors["gateway"].startswith("Timeout")
+
+
+def test_returns_after_critical_and_closes_stragglers():
+    manager = SlowManager({"send-email": 0.5})
+
+    async def run():
+        result = await manager.load_clients_async(
+            ["common-tools", "send-email"], critical={"common-tools"}, grace_seconds=0.05
+        )
+        await asyncio.sleep(0.8)
+        return result
+
+    start = time.time()
+    result = asyncio.run(run())
+
+    assert result.detached == ["send-email"]
+    assert "send-email" not in result.clients
+    assert manager.created["send-email"].closed
+    assert not manager.created["common-tools"].closed
+    assert time.time() - start < 1.2
+
+
+def test_late_client_close_does_not_block_event_loop():
+    class SlowExitClient(FakeClient):
+        def __exit__(self, *args):
+            time.sleep(0.3)
+            super().__exit__(*args)
+
+    class SlowExitManager(SlowManager):
+        def _load_client(self, name, additional_env):
+            time.sleep(self.delays.get(name, 0))
+            client = SlowExitClient(name)
+            self.created[name] = client
+            return client, [f"{name}-tool"]
+
+    manager = SlowExitManager({"send-email": 0.2})
+
+    async def run():
+        await manager.load_clients_async(
+            ["common-tools", "send-email"], critical={"common-tools"}, grace_seconds=0.05
+        )
+        # 关闭在线程池中执行：事件循环的每个 tick 都远小于 __exit__ 的耗时
+        longest_tick = 0.0
+        for _ in range(20):
+            tick = time.time()
+            await asyncio.sleep(0.03)
+            longest_tick = max(longest_tick, time.time() - tick)
+        return longest_tick
+
+    assert asyncio.run(run()) < 0.2
+    assert manager.created["send-email"].closed
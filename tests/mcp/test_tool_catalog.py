@@ -0,0 +1,56 @@
+from mcp.types import Tool
+
+from costq_agents.mcp.tool_catalog import (
+    GatewayToolCatalog,
+    LazyMCPClient,
+    build_agent_tools,
+    compute_catalog_hash,
+)
+
+URL = "https://example.gateway.bedrock-agentcore.ap-northeast-1.amazonaws.com/mcp"
+
+
+def make_tool(name, description="desc"):
+    return Tool(name=name, description=description, inputSchema={"type": "object"})
+
+
+def test_build_agent_tools_truncates_long_names():
+    long_name = "target___" + "x" * 80
+    tools = build_agent_tools([make_tool("short"), make_tool(long_name)], client=None)
+
+    assert [t.tool_name for t in tools] == ["short", long_name[:64]]
+    assert tools[1].mcp_tool.name == long_name
+
+
+def test_catalog_hit_within_ttl_and_expires(clock):
+    catalog = GatewayToolCatalog(ttl_seconds=60, clock=clock)
+
+    assert catalog.lookup(URL) is None
+    catalog.store(URL, [make_tool("a")])
+    assert [s.name for s in catalog.lookup(URL).specs] == ["a"]
+
+    clock.now = 61
+    assert catalog.lookup(URL) is None
+    assert catalog.stats()["hits"] == 1
+
+
+def test_catalog_detects_content_change():
+    catalog = GatewayToolCatalog(ttl_seconds=60)
+    catalog.store(URL, [make_tool("a"), make_tool("b")])
+    first_hash = catalog.content_hash(URL)
+
+    assert catalog.store(URL, [make_tool("b"), make_tool("a")]) is False
+    assert catalog.store(URL, [make_tool("a", "new desc"), make_tool("b")]) is True
+    assert catalog.content_hash(URL) != first_hash
+    assert catalog.stats()["changes"] == 1
+    assert compute_catalog_hash([make_tool("a")]) == compute_catalog_hash([make_tool("a")])
+
+
+def test_lazy_client_does_not_connect_until_used():
+    def transport():
+        raise AssertionError("transport must not be opened")
+
+    client = LazyMCPClient(transport)
+    with client:
+        pass
+    assert not client._is_session_active()
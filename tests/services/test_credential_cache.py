@@ -0,0 +1,61 @@
+from costq_agents.services import credential_cache as cache_module
+from costq_agents.services.credential_cache import CredentialCache
+from costq_agents.services.iam_role_session_factory import IAMRoleSessionFactory
+
+
+def test_secret_cached_per_version(clock):
+    calls = []
+    cache = CredentialCache(clock=clock)
+
+    def loader():
+        calls.append(1)
+        return f"secret-{len(calls)}"
+
+    assert cache.get_secret("acct-1", "v1", loader) == "secret-1"
+    assert cache.get_secret("acct-1", "v1", loader) == "secret-1"
+    assert cache.get_secret("acct-1", "v2", loader) == "secret-2"
+    assert len(calls) == 2
+
+
+def test_secret_expires_after_ttl(clock):
+    cache = CredentialCache(ttl_seconds=60, clock=clock)
+    cache.get_secret("acct-1", "v1", lambda: "old")
+
+    clock.now = 61
+    assert cache.get_secret("acct-1", "v1", lambda: "new") == "new"
+
+
+def test_evicted_and_invalidated_secrets_are_zeroed(clock):
+    cache = CredentialCache(max_entries=1, clock=clock)
+    cache.get_secret("acct-1", "v1", lambda: "secret-a")
+    first_buffer = cache._secrets["acct-1"].secret
+
+    cache.get_secret("acct-2", "v1", lambda: "secret-b")
+    assert first_buffer == bytearray(len("secret-a"))
+    assert cache.stats()["evictions"] == 1
+
+    second_buffer = cache._secrets["acct-2"].secret
+    cache.invalidate("acct-2")
+    assert second_buffer == bytearray(len("secret-b"))
+    assert cache.stats()["secrets"] == 0
+
+
+def test_clear_instance_invalidates_cache(clock, monkeypatch):
+    cache = CredentialCache(clock=clock)
+    monkeypatch.setattr(cache_module, "_credential_cache", cache)
+    cache.get_secret("acct-1", "v1", lambda: "secret-a")
+    cache.get_external_id("acct-1", "org-v1", lambda: "org-1")
+
+    IAMRoleSessionFactory.clear_instance("acct-1")
+
+    assert cache.stats()["secrets"] == 0
+    assert cache.stats()["external_ids"] == 0
+
+
+def test_external_id_versioned_by_org_updated_at(clock):
+    cache = CredentialCache(clock=clock)
+
+    assert cache.get_external_id("acct-1", "org-v1", lambda: "ext-old") == "ext-old"
+    assert cache.get_external_id("acct-1", "org-v1", lambda: "ext-new") == "ext-old"
+    # 组织轮换 External ID（updated_at 变化）后立即失效，不等 TTL
+    assert cache.get_external_id("acct-1", "org-v2", lambda: "ext-new") == "ext-new"
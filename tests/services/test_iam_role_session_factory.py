@@ -0,0 +1,49 @@
+import pytest
+
+from costq_agents.services.iam_role_session_factory import IAMRoleSessionFactory
+
+ROLE = "arn:aws:iam::123456789012:role/CostQRole"
+
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+    """把公共假时钟注入工厂，并清空实例注册表"""
+    monkeypatch.setattr(IAMRoleSessionFactory, "_clock", staticmethod(clock))
+    stats = dict.fromkeys(IAMRoleSessionFactory._registry_stats, 0)
+    monkeypatch.setattr(IAMRoleSessionFactory, "_registry_stats", stats)
+    IAMRoleSessionFactory.clear_all_instances()
+    yield clock
+    IAMRoleSessionFactory.clear_all_instances()
+
+
+def test_identity_change_replaces_instance(clock):
+    first = IAMRoleSessionFactory.get_instance("acct-1", ROLE, "ext-1")
+    assert IAMRoleSessionFactory.get_instance("acct-1", ROLE, "ext-1") is first
+
+    rotated = IAMRoleSessionFactory.get_instance("acct-1", ROLE + "-v2", "ext-1")
+    assert rotated is not first
+    assert rotated.role_arn == ROLE + "-v2"
+
+    stats = IAMRoleSessionFactory.registry_stats()
+    assert stats["identity_changes"] == 1
+    assert stats["size"] == 1
+
+
+def test_lru_and_idle_eviction(clock, monkeypatch):
+    monkeypatch.setattr(IAMRoleSessionFactory, "max_instances", 2)
+    monkeypatch.setattr(IAMRoleSessionFactory, "idle_ttl_seconds", 100)
+
+    a = IAMRoleSessionFactory.get_instance("acct-a", ROLE, "ext")
+    IAMRoleSessionFactory.get_instance("acct-b", ROLE, "ext")
+    IAMRoleSessionFactory.get_instance("acct-a", ROLE, "ext")
+    IAMRoleSessionFactory.get_instance("acct-c", ROLE, "ext")
+
+    assert IAMRoleSessionFactory.get_instance("acct-a", ROLE, "ext") is a
+    assert IAMRoleSessionFactory.registry_stats()["evictions_lru"] == 1
+
+    clock.now = 500
+    IAMRoleSessionFactory.get_instance("acct-d", ROLE, "ext")
+    stats = IAMRoleSessionFactory.registry_stats()
+    assert stats["evictions_idle"] == 2
+    assert stats["size"] == 1
+
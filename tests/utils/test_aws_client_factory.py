@@ -0,0 +1,33 @@
+"""AWSClientFactory 缓存测试"""
+
+from botocore.config import Config
+
+from costq_agents.utils.aws_client_factory import AWSClientFactory
+
+
+def _factory() -> AWSClientFactory:
+    return AWSClientFactory(config=Config(max_pool_connections=5, retries={"mode": "standard"}))
+
+
+def test_clients_cached_per_service_region_and_profile(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+    factory = _factory()
+
+    first = factory.get_client("sts", region_name="ap-northeast-1")
+    assert factory.get_client("sts", region_name="ap-northeast-1") is first
+    assert factory.get_client("sts", region_name="us-west-2") is not first
+    assert factory.get_client("secretsmanager", region_name="ap-northeast-1") is not first
+
+    stats = factory.stats()
+    assert stats["session_creates"] == 1
+    assert stats["client_creates"] == 3
+    assert stats["client_hits"] == 1
+
+    # 共享 Config 与区域 STS 端点
+    assert first.meta.config.max_pool_connections == 5
+    assert "ap-northeast-1" in first.meta.endpoint_url
+
+    factory.clear()
+    assert factory.get_client("sts", region_name="ap-northeast-1") is not first
@@ -0,0 +1,91 @@
+import datetime
+import threading
+import time
+
+import pytest
+from dateutil.tz import tzlocal
+
+from costq_agents.utils.credential_refresher import (
+    BOTOCORE_MANDATORY_REFRESH_SECONDS,
+    REFRESH_MARGIN_SLACK_SECONDS,
+    AssumeRoleSource,
+    CredentialRefresher,
+    effective_refresh_margin,
+)
+
+
+class FakeFetcher:
+    """Mimics AssumeRoleCredentialFetcher: cached until inside the expiry window."""
+
+    def __init__(self, lifetime_seconds, expiry_window_seconds, delay=0.0):
+        self.lifetime_seconds = lifetime_seconds
+        self.expiry_window_seconds = expiry_window_seconds
+        self.delay = delay
+        self.calls = 0
+        self._expiry = None
+
+    def fetch_credentials(self):
+        now = datetime.datetime.now(tzlocal())
+        remaining = None if self._expiry is None else (self._expiry - now).total_seconds()
+        if remaining is None or remaining < self.expiry_window_seconds:
+            time.sleep(self.delay)
+            self.calls += 1
+            self._expiry = now + datetime.timedelta(seconds=self.lifetime_seconds)
+        return {
+            "access_key": "AKIA",
+            "secret_key": "secret",
+            "token": f"token-{self.calls}",
+            "expiry_time": self._expiry.isoformat(),
+        }
+
+
+def test_concurrent_fetches_are_single_flight():
+    fetcher = FakeFetcher(lifetime_seconds=3600, expiry_window_seconds=1200, delay=0.1)
+    source = AssumeRoleSource("role-a", fetcher, refresh_margin_seconds=1200)
+
+    threads = [threading.Thread(target=source.fetch_credentials) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fetcher.calls == 1
+    assert source.assume_role_count == 1
+
+
+def test_refresh_due_only_renews_sources_inside_margin():
+    fresh = AssumeRoleSource(
+        "fresh", FakeFetcher(3600, expiry_window_seconds=1200), refresh_margin_seconds=1200
+    )
+    expiring_fetcher = FakeFetcher(600, expiry_window_seconds=1200)
+    expiring = AssumeRoleSource("expiring", expiring_fetcher, refresh_margin_seconds=1200)
+    never_used = AssumeRoleSource(
+        "never-used", FakeFetcher(3600, expiry_window_seconds=1200), refresh_margin_seconds=1200
+    )
+    fresh.fetch_credentials()
+    expiring.fetch_credentials()
+
+    refresher = CredentialRefresher(interval_seconds=3600)
+    for source in (fresh, expiring, never_used):
+        refresher.register(source)
+    try:
+        assert refresher.refresh_due() == 1
+    finally:
+        refresher.stop()
+
+    assert expiring_fetcher.calls == 2
+    stats = refresher.stats()
+    assert stats["refreshes"] == 1
+    assert stats["sources"]["expiring"]["assume_role_count"] == 2
+    assert stats["sources"]["never-used"]["seconds_until_expiry"] is None
+
+
+def test_refresh_margin_stays_above_botocore_mandatory_window():
+    floor = BOTOCORE_MANDATORY_REFRESH_SECONDS + REFRESH_MARGIN_SLACK_SECONDS
+
+    assert effective_refresh_margin(1200, 3600) == 1200
+    # 短有效期：有效期的一半低于 mandatory 窗口时抬高到下限
+    assert effective_refresh_margin(1200, 900) == floor
+    assert effective_refresh_margin(100, 3600) == floor
+    with pytest.raises(ValueError):
+        effective_refresh_margin(1200, floor)
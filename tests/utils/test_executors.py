@@ -0,0 +1,84 @@
+"""共享线程池注册表测试"""
+
+import asyncio
+import contextvars
+import threading
+
+import pytest
+
+from costq_agents.utils.executors import (
+    BoundedExecutor,
+    ExecutorSaturatedError,
+    executor_stats,
+    get_executor,
+    run_blocking,
+    shutdown_executors,
+)
+
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="")
+
+
+def test_queue_depth_and_rejection():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    running = executor.submit(blocker)
+    assert started.wait(5)
+    queued = executor.submit(lambda: "queued")
+    assert executor.stats()["queue_depth"] == 1
+    assert executor.stats()["running"] == 1
+
+    with pytest.raises(ExecutorSaturatedError):
+        executor.submit(lambda: "rejected")
+
+    release.set()
+    assert running.result(5) == "done"
+    assert queued.result(5) == "queued"
+
+    stats = executor.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["completed"] == 2
+    assert stats["rejected"] == 1
+    assert stats["wait_seconds_max"] > 0
+    executor.shutdown()
+
+
+def test_run_blocking_uses_named_pool_and_copies_context():
+    async def main():
+        request_id.set("req-1")
+
+        def work(x, *, y):
+            return threading.current_thread().name, request_id.get(), x + y
+
+        return await run_blocking("db", work, 1, y=2)
+
+    try:
+        thread_name, seen_request_id, value = asyncio.run(main())
+        assert thread_name.startswith("costq-db")
+        assert seen_request_id == "req-1"
+        assert value == 3
+        assert get_executor("db") is get_executor("db")
+        assert executor_stats()["db"]["completed"] == 1
+    finally:
+        shutdown_executors()
+
+
+def test_failures_are_counted():
+    async def main():
+        def boom():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            await run_blocking("cpu", boom)
+
+    try:
+        asyncio.run(main())
+        assert executor_stats()["cpu"]["failed"] == 1
+    finally:
+        shutdown_executors()
@@ -0,0 +1,78 @@
+"""日志管道测试"""
+
+import json
+import logging
+
+from costq_agents.utils import logging_pipeline
+from costq_agents.utils.logging_pipeline import (
+    EventSampler,
+    JsonFormatter,
+    configure_logging,
+    log_event,
+    shutdown_logging,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.lines: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append(self.format(record))
+
+
+def test_payload_not_built_when_disabled_or_sampled_out(monkeypatch):
+    sampler = EventSampler({"tool_result": 0.5}, rng=iter([0.9, 0.1]).__next__)
+    monkeypatch.setattr(logging_pipeline, "_sampler", sampler)
+    calls = []
+    target = logging.getLogger("tests.logging_pipeline.lazy")
+    target.setLevel(logging.INFO)
+
+    def payload():
+        calls.append(1)
+        return {"tool_id": "t1"}
+
+    log_event(target, logging.DEBUG, "debug", "tool_result", payload)
+    log_event(target, logging.INFO, "dropped", "tool_result", payload)
+    log_event(target, logging.INFO, "kept", "tool_result", payload)
+
+    assert len(calls) == 1
+    assert sampler.stats() == {"tool_result": {"kept": 1, "dropped": 1}}
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.LogRecord("costq", logging.INFO, __file__, 1, "成本 %s", ("ok",), None)
+    record.tool_id = "t1"
+    record._sampled = True
+
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["message"] == "成本 ok"
+    assert payload["level"] == "INFO"
+    assert payload["tool_id"] == "t1"
+    assert "_sampled" not in payload
+
+
+def test_records_flow_through_queue_listener():
+    root = logging.getLogger()
+    original_level = root.level
+    sink = ListHandler()
+    root.addHandler(sink)
+    try:
+        configure_logging(level="INFO", sample_rates={"long_interval": 0.0})
+        assert sink not in root.handlers
+
+        target = logging.getLogger("tests.logging_pipeline.queue")
+        target.info("hello", extra={"request_id": "r1"})
+        target.warning("skipped", extra={"event_type": "long_interval"})
+        log_event(target, logging.WARNING, "skipped", "long_interval", lambda: {})
+    finally:
+        shutdown_logging()
+        logging_pipeline.get_event_sampler().rates = {}
+        root.removeHandler(sink)
+        root.setLevel(original_level)
+
+    lines = [json.loads(line) for line in sink.lines]
+    assert [line["message"] for line in lines] == ["hello"]
+    assert lines[0]["request_id"] == "r1"